@@ -1,7 +1,10 @@
 import os
+import importlib
+import pkgutil
 from flask import Flask, jsonify, request
 from app.models.db import db
 from app.models.image_log import ImageLog
+from app.models.rendition import Rendition
 from sqlalchemy import text
 from flask_restx import Api
 from flask_cors import CORS
@@ -13,8 +16,16 @@ api = Api(
     doc="/docs"
 )
 
+def preload_services():
+    """Import every app.services module (cv2, NumPy, SciPy) up front."""
+    from app import services
+    for module in pkgutil.iter_modules(services.__path__):
+        importlib.import_module(f"app.services.{module.name}")
+
+
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
+    app.config.from_object('app.config')
     
     # Enable CORS
     CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
@@ -25,12 +36,32 @@ def create_app():
     os.makedirs(app.instance_path, exist_ok=True)
     db.init_app(app)
 
-    with app.app_context():
-        db.create_all()
-        
+    # Uploads, processed outputs and FFT data live in the configured store
+    from app.services.storage import init_storage
+    init_storage(app)
+
+    if app.config['ADMISSION_CONTROL']:
+        from app.services.admission import init_admission
+        init_admission(app)
+
+    # Share the cores between admitted requests instead of letting
+    # OpenCV, the FFTs and every request each assume they own all of them
+    # (before any preload, so the BLAS settings apply)
+    from app.services.compute_budget import init_compute_budget
+    init_compute_budget(app)
+
+    # Idle scratch buffers kept between overlapping requests
+    from app.services.buffer_pool import init_buffer_pool
+    init_buffer_pool(app)
+
+    # Tables are created by init_db.py rather than on every start, and the
+    # image services load on first use unless PRELOAD_SERVICES is set
+    if app.config['PRELOAD_SERVICES']:
+        preload_services()
+
     api.init_app(app)
 
-    from .routes import fft, filters, histogram, mask, noise, upload, adjust
+    from .routes import fft, filters, histogram, mask, noise, upload, adjust, export
 
     api.add_namespace(fft.fft_ns, path='/fft')
     api.add_namespace(filters.filters_ns, path='/filters')
@@ -39,6 +70,7 @@ def create_app():
     api.add_namespace(noise.noise_ns, path='/noise')
     api.add_namespace(upload.upload_ns, path='/upload')
     api.add_namespace(adjust.adjust_ns, path='/adjust')
+    api.add_namespace(export.export_ns, path='/export')
 
     @app.route('/')
     def index():
@@ -47,6 +79,13 @@ def create_app():
             "endpoints": {
                 "test_db": "/test-db",
                 "upload": "/upload",
+                "rendition": "/upload/rendition/<filename>/<size>",
+                "chunked_upload": {
+                    "create": "/upload/chunked",
+                    "status": "/upload/chunked/<upload_id>",
+                    "append": "/upload/chunked/<upload_id> (PATCH with Upload-Offset)",
+                    "finalize": "/upload/chunked/<upload_id>/finalize"
+                },
                 "noise": {
                     "add": "/noise/add",
                     "remove": "/noise/remove"
@@ -56,14 +95,22 @@ def create_app():
                     "equalize": "/histogram/equalize"
                 },
                 "filters": "/filters",
+                "mask": {
+                    "apply": "/mask/apply"
+                },
                 "fft": {
                     "apply": "/fft/apply",
                     "inverse": "/fft/inverse",
-                    "magnitude": "/fft/magnitude"
+                    "magnitude": "/fft/magnitude",
+                    "filter": "/fft/filter"
                 },
                 "adjust": {
-                    "apply": "/adjust/apply"
+                    "apply": "/adjust/apply",
+                    "lut": "/adjust/lut"
                 },
+                "export": "/export",
+                "admission": "/admission",
+                "compute": "/compute",
                 "image_logs": "/image-logs"
             }
         })
@@ -106,13 +153,25 @@ def create_app():
             })
         return jsonify(result)
 
+    @app.route('/admission')
+    def admission_stats():
+        controller = app.extensions.get('admission')
+        if controller is None:
+            return jsonify({"enabled": False})
+        return jsonify({"enabled": True, **controller.stats()})
+
+    @app.route('/compute')
+    def compute_stats():
+        return jsonify(app.extensions['compute_budget'].stats())
+
     @app.route('/fft-info')
     def fft_info():
         return jsonify({
             "fft_endpoints": {
                 "apply_fft": "/fft/apply (POST with image file)",
                 "inverse_fft": "/fft/inverse (POST with image file)",
-                "magnitude_spectrum": "/fft/magnitude (POST with image file)"
+                "magnitude_spectrum": "/fft/magnitude (POST with image file)",
+                "frequency_filter": "/fft/filter (POST with image file, filter, band, cutoff, width, order)"
             }
         })
 
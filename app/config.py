@@ -0,0 +1,79 @@
+import os
+
+# Upper bound on idle scratch buffers kept by app.services.buffer_pool (per
+# process) while requests overlap; they are freed once none is in flight
+BUFFER_POOL_MAX_BYTES = int(os.environ.get('BUFFER_POOL_MAX_BYTES', 32 * 1024 * 1024))
+
+# Folder of .cube colour-grading presets served by /adjust/lut; the default,
+# app/luts, ships 'warm' and 'mono'. Add files there or point this elsewhere.
+LUT_PRESET_DIR = os.environ.get('LUT_PRESET_DIR', os.path.join(os.path.dirname(__file__), 'luts'))
+
+# Import every image service in create_app instead of on first use. Worth it
+# for pre-forking servers (e.g. gunicorn --preload) that share the loaded
+# modules; autoscaled single workers start faster without it.
+PRELOAD_SERVICES = os.environ.get('PRELOAD_SERVICES', '').lower() in ('1', 'true', 'yes')
+
+# Let the front-end server (Apache mod_xsendfile, lighttpd) send stored
+# files itself: downloads return an X-Sendfile header instead of the body
+USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+# Admission control in front of the image endpoints (app.services.admission):
+# requests are costed from their pixel count and operation, heavy operations
+# run at most ADMISSION_HEAVY_CONCURRENCY at a time each, and all of them
+# share a memory budget. A request that does not fit waits up to
+# ADMISSION_QUEUE_TIMEOUT seconds, then gets 429 with Retry-After.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '1').lower() in ('1', 'true', 'yes')
+ADMISSION_MEMORY_BUDGET = int(os.environ.get('ADMISSION_MEMORY_BUDGET', 1024 * 1024 * 1024))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 2.0))
+ADMISSION_MAX_QUEUED = int(os.environ.get('ADMISSION_MAX_QUEUED', 16))
+ADMISSION_HEAVY_CONCURRENCY = int(os.environ.get('ADMISSION_HEAVY_CONCURRENCY', max(1, (os.cpu_count() or 1) // 2)))
+
+# Cores shared by concurrent image requests (app.services.compute_budget):
+# OpenCV threads, FFT workers and stripe pools per request are this divided
+# by the number of requests in flight. 0 uses the process's CPU affinity.
+COMPUTE_THREADS = int(os.environ.get('COMPUTE_THREADS', 0))
+
+# Share decoded uploads and FFT spectra between worker processes through
+# POSIX shared memory (app.services.shared_store) instead of every worker
+# caching its own copy. Segments live in /dev/shm, which must be large
+# enough for SHARED_STORE_MAX_BYTES; SHARED_STORE_NAME must be unique per
+# deployment on a host. POSIX hosts only.
+SHARED_STORE = os.environ.get('SHARED_STORE', '').lower() in ('1', 'true', 'yes')
+SHARED_STORE_NAME = os.environ.get('SHARED_STORE_NAME', 'photo_editor')
+SHARED_STORE_MAX_BYTES = int(os.environ.get('SHARED_STORE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Where uploads, processed outputs and FFT data are stored
+# (app.services.storage): 'local' keeps them in STORAGE_ROOT (default
+# app/static/uploads); 's3' in STORAGE_BUCKET under STORAGE_PREFIX, so
+# workers on several nodes share them (needs boto3; STORAGE_ENDPOINT_URL
+# for S3-compatible stores); 'memory' is an in-process stand-in for 's3'.
+# Remote reads go through a local cache of STORAGE_CACHE_BYTES in
+# STORAGE_CACHE_DIR (default instance/storage_cache), and large writes are
+# uploaded in STORAGE_PART_SIZE parts, STORAGE_UPLOAD_WORKERS at a time.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+STORAGE_ROOT = os.environ.get('STORAGE_ROOT', '')
+STORAGE_BUCKET = os.environ.get('STORAGE_BUCKET', 'photo-editor')
+STORAGE_PREFIX = os.environ.get('STORAGE_PREFIX', '')
+STORAGE_ENDPOINT_URL = os.environ.get('STORAGE_ENDPOINT_URL', '')
+STORAGE_CACHE_DIR = os.environ.get('STORAGE_CACHE_DIR', '')
+STORAGE_CACHE_BYTES = int(os.environ.get('STORAGE_CACHE_BYTES', 1024 * 1024 * 1024))
+STORAGE_PART_SIZE = int(os.environ.get('STORAGE_PART_SIZE', 8 * 1024 * 1024))
+STORAGE_UPLOAD_WORKERS = int(os.environ.get('STORAGE_UPLOAD_WORKERS', 4))
+
+# Partial files of resumable /upload/chunked uploads (default
+# instance/upload_sessions). Every worker that may receive a session's
+# chunks needs this folder, so behind a load balancer either share it or
+# route an upload's requests to one node.
+UPLOAD_SESSION_DIR = os.environ.get('UPLOAD_SESSION_DIR', '')
+
+# Downscaled copies of every upload served by /upload/rendition/<filename>/<size>
+# for galleries and previews: RENDITION_SIZES px on the longer side, in each
+# of RENDITION_FORMATS (webp, jpeg; the client's Accept header picks one),
+# generated by RENDITION_WORKERS background threads after the upload returns.
+RENDITION_SIZES = tuple(int(size) for size in os.environ.get('RENDITION_SIZES', '256,1024,2048').split(','))
+RENDITION_FORMATS = tuple(os.environ.get('RENDITION_FORMATS', 'webp,jpeg').split(','))
+RENDITION_WORKERS = int(os.environ.get('RENDITION_WORKERS', 1))
+# Seconds browsers and CDNs reuse a rendition without asking; the URL stays
+# the same when an image is re-uploaded, so this bounds how long they may
+# show the old one before revalidating its ETag.
+RENDITION_MAX_AGE = int(os.environ.get('RENDITION_MAX_AGE', 3600))
@@ -0,0 +1,14 @@
+from app.models.db import db
+
+class Rendition(db.Model):
+    # One row per size and format of an upload, however many workers build it
+    __table_args__ = (db.UniqueConstraint('image_log_id', 'size', 'format'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    image_log_id = db.Column(db.Integer, db.ForeignKey('image_log.id'), nullable=False, index=True)
+    size = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(8), nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
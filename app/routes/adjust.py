@@ -1,11 +1,11 @@
 from flask_restx import Namespace, Resource, fields, reqparse
 from flask import request
-import cv2
-import numpy as np
-from app.services.image_io import get_image_from_request, save_processed_image
 from app.models.db import db
 from app.models.image_log import ImageLog
 
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
+
 adjust_ns = Namespace('adjust', description='Image adjustment operations')
 
 file_upload_parser = reqparse.RequestParser()
@@ -19,10 +19,20 @@ adjust_model = adjust_ns.model('Adjust', {
     'saturation': fields.Float(required=True, description='Saturation adjustment (-100 to 100)')
 })
 
+lut_model = adjust_ns.model('Lut', {
+    'preset': fields.String(description='Name of a preset .cube file (or upload one as the lut file)'),
+    'method': fields.String(description='baked (fast, default), tetrahedral or trilinear'),
+    'strength': fields.Float(description='Blend with the original, 0 to 1 (default 1)')
+})
+
 @adjust_ns.route('/apply')
 class ApplyAdjustments(Resource):
     @adjust_ns.expect(file_upload_parser, adjust_model)
     def post(self):
+        from app.services.image_io import get_image_from_request, save_processed_image
+        from app.services.adjustments import apply_adjustments
+        from app.services.buffer_pool import pool
+
         try:
             image = get_image_from_request(request)
             if image is None:
@@ -33,25 +43,9 @@ class ApplyAdjustments(Resource):
             contrast = data.get('contrast', 0)
             saturation = data.get('saturation', 0)
 
-            # Convert brightness and contrast to OpenCV format
-            brightness = 1 + (brightness / 100.0)  # Convert to multiplier
-            contrast = 1 + (contrast / 100.0)  # Convert to multiplier
-
-            # Apply brightness and contrast
-            adjusted = cv2.convertScaleAbs(image, alpha=contrast, beta=brightness)
-
-            # Apply saturation
-            if saturation != 0:
-                # Convert to HSV
-                hsv = cv2.cvtColor(adjusted, cv2.COLOR_BGR2HSV).astype(np.float32)
-                # Adjust saturation
-                hsv[:, :, 1] = hsv[:, :, 1] * (1 + saturation / 100.0)
-                # Clip values
-                hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
-                # Convert back to BGR
-                adjusted = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-
-            processed_image_path = save_processed_image(adjusted)
+            with pool.borrow(image.shape, image.dtype) as out:
+                adjusted = apply_adjustments(image, brightness, contrast, saturation, out=out)
+                processed_image_path = save_processed_image(adjusted)
 
             # Get the original filename from the request
             original_filename = request.files['file'].filename
@@ -73,4 +67,58 @@ class ApplyAdjustments(Resource):
             }
 
         except Exception as e:
-            return {"error": str(e)}, 500 
\ No newline at end of file
+            return {"error": str(e)}, 500
+
+
+@adjust_ns.route('/lut')
+class ApplyLut(Resource):
+    def get(self):
+        from app.services.lut_utils import list_presets
+        return {"presets": list_presets()}
+
+    @adjust_ns.expect(lut_model)
+    def post(self):
+        from app.services.image_io import get_image_from_request, save_processed_image
+        from app.services.lut_utils import apply_lut, load_cube, load_preset
+
+        try:
+            image = get_image_from_request(request)
+            if image is None:
+                return {"error": "No image provided"}, 400
+
+            try:
+                if 'lut' in request.files:
+                    lut = load_cube(request.files['lut'].read())
+                elif request.form.get('preset'):
+                    lut = load_preset(request.form['preset'])
+                else:
+                    return {"error": "No LUT provided"}, 400
+                graded = apply_lut(
+                    image,
+                    lut,
+                    request.form.get('method', 'baked'),
+                    float(request.form.get('strength', 1.0))
+                )
+            except ValueError as ve:
+                return {"error": str(ve)}, 400
+
+            processed_image_filename = save_processed_image(graded)
+
+            original_filename = request.files['file'].filename
+            existing_log = ImageLog.query.filter_by(filename=original_filename).first()
+            if existing_log:
+                existing_log.processed = True
+                db.session.commit()
+            else:
+                new_log = ImageLog(filename=original_filename, processed=True)
+                db.session.add(new_log)
+                db.session.commit()
+
+            return {
+                "message": "LUT applied successfully",
+                "processed_image": processed_image_filename,
+                "title": lut.title
+            }
+
+        except Exception as e:
+            return {"error": str(e)}, 500
@@ -0,0 +1,96 @@
+import base64
+import fnmatch
+from functools import partial
+from flask import current_app, request, stream_with_context
+from flask_restx import Namespace, Resource, fields
+from werkzeug.utils import secure_filename
+from app.models.db import db
+from app.models.image_log import ImageLog
+
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
+
+export_ns = Namespace('export', description='Bulk export of stored images')
+
+export_model = export_ns.model('Export', {
+    'filenames': fields.List(fields.String, description='Stored files to include'),
+    'pattern': fields.String(description='Glob over stored files, e.g. "processed_*.png"'),
+    'filter': fields.Raw(description='ImageLog filter: {"processed": true, "filename": "*.png"}'),
+    'name': fields.String(description='Archive name (default export.zip)')
+})
+
+
+def _load_logged(log_id):
+    def load():
+        return base64.b64decode(db.session.get(ImageLog, log_id).image_data)
+    return load
+
+
+@export_ns.route('/')
+class Export(Resource):
+    @export_ns.expect(export_model)
+    def post(self):
+        from app.services.export_utils import stream_zip
+        from app.services.storage import get_storage
+
+        try:
+            data = request.get_json(silent=True) or {}
+            filenames = data.get('filenames') or []
+            pattern = data.get('pattern')
+            log_filter = data.get('filter')
+            if (not isinstance(filenames, list) or not all(isinstance(name, str) for name in filenames)
+                    or (log_filter is not None and not isinstance(log_filter, dict))):
+                return {"error": "Invalid parameters format"}, 400
+            if not filenames and not pattern and log_filter is None:
+                return {"error": "Provide filenames, a pattern or a filter"}, 400
+
+            storage = get_storage()
+            names = list(filenames)
+            # Listed names are known to be stored; only the others are looked up
+            listed = set(storage.names(pattern)) if pattern else set()
+            names += sorted(listed)
+            if log_filter is not None:
+                # Only names are read here; image data is loaded per file while streaming
+                query = db.session.query(ImageLog.filename)
+                if 'processed' in log_filter:
+                    query = query.filter(ImageLog.processed == bool(log_filter['processed']))
+                logged = [name for (name,) in query.distinct()]
+                names += fnmatch.filter(logged, log_filter.get('filename', '*'))
+
+            # Resolve every file before the first byte is sent: storage first, then the database copy
+            entries, missing, seen = [], [], set()
+            for name in names:
+                if name in seen:
+                    continue
+                seen.add(name)
+                try:
+                    stored = name in listed or storage.exists(name)
+                except ValueError:
+                    stored = False
+                if stored:
+                    entries.append((name, partial(storage.stream, name)))
+                    continue
+                # Older uploads were logged with '' instead of their data
+                image_log = (db.session.query(ImageLog.id).filter(ImageLog.filename == name,
+                                                                  ImageLog.image_data.isnot(None),
+                                                                  ImageLog.image_data != '').first())
+                if image_log:
+                    entries.append((name, _load_logged(image_log.id)))
+                elif name in filenames:
+                    missing.append(name)
+            if missing:
+                return {"error": "Images not found", "missing": missing}, 404
+            if not entries:
+                return {"error": "No images matched"}, 404
+
+            archive_name = secure_filename(data.get('name') or 'export.zip')
+            if not archive_name.lower().endswith('.zip'):
+                archive_name += '.zip'
+            response = current_app.response_class(stream_with_context(stream_zip(entries)),
+                                                  mimetype='application/zip')
+            response.headers['Content-Disposition'] = f'attachment; filename="{archive_name}"'
+            response.headers['X-Export-Count'] = str(len(entries))
+            return response
+
+        except Exception as e:
+            return {"error": str(e)}, 500
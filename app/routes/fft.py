@@ -1,94 +1,145 @@
 from flask_restx import Namespace, Resource, fields, reqparse
-from flask import request, current_app
-from app.services.fft_utils import apply_fft, apply_ifft, magnitude_spectrum
-from app.services.image_io import get_image_from_request, save_processed_image
-import numpy as np
-import cv2
+from flask import request
 import base64
+import io
 import os
-import pickle
+
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
 
 fft_ns = Namespace('fft', description='FFT related operations')
 
+frequency_filter_model = fft_ns.model('FrequencyFilter', {
+    'filter': fields.String(description='ideal, butterworth or gaussian'),
+    'band': fields.String(description='lowpass, highpass, bandpass or bandreject'),
+    'cutoff': fields.Float(description='Cutoff distance from the spectrum centre'),
+    'width': fields.Float(description='Band width (bandpass / bandreject)'),
+    'order': fields.Integer(description='Butterworth order'),
+    'color_mode': fields.String(description='rgb, luma or gray')
+})
+
 def encode_image_to_base64(img_array):
+    import cv2
+    import numpy as np
     _, buffer = cv2.imencode('.png', img_array.astype(np.uint8))
     encoded = base64.b64encode(buffer).decode('utf-8')
     return encoded
 
+def dump_fft_data(fshift, color_mode):
+    """An .npz archive of a spectrum and its colour mode, readable without pickle."""
+    import numpy as np
+    buffer = io.BytesIO()
+    np.savez(buffer, spectrum=fshift, color_mode=np.array(color_mode))
+    return buffer.getbuffer()
+
+
+def load_fft_data(name):
+    """
+    (spectrum, color_mode) saved by /fft/apply under `name`, or None. The
+    object is read with allow_pickle=False, as anyone can upload under a
+    fft_data_* name; anything else is a ValueError. With the shared store
+    enabled the spectrum is published under the stored object's content
+    tag and colour mode, so workers parse it once rather than on every
+    /fft/inverse.
+    """
+    import numpy as np
+    from app.services.fft_utils import COLOR_MODES
+    from app.services.shared_store import get_store
+    from app.services.storage import get_storage
+
+    storage = get_storage()
+    store = get_store()
+    etag = storage.etag(name) if store is not None else None
+    if etag is not None:
+        for color_mode in COLOR_MODES:
+            fshift = store.get(('fft_data', etag, color_mode))
+            if fshift is not None:
+                return fshift, color_mode
+
+    data = storage.get(name)
+    if data is None:
+        return None
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            fshift, color_mode = archive['spectrum'], str(archive['color_mode'])
+    except Exception:
+        raise ValueError("Invalid FFT data") from None
+    if color_mode not in COLOR_MODES or fshift.dtype.kind != 'c' or fshift.ndim not in (2, 3):
+        raise ValueError("Invalid FFT data")
+    if etag is not None:
+        fshift = store.put(('fft_data', etag, color_mode), fshift)
+    return fshift, color_mode
+
 @fft_ns.route('/apply')
 class FFTApply(Resource):
     def post(self):
+        import cv2
+        from app.services.fft_utils import forward_spectrum, spectrum_image
+        from app.services.image_io import get_image_from_request
+        from app.services.storage import get_storage
+
         try:
             # Get image from request using the utility function
             image = get_image_from_request(request)
             if image is None:
                 return {"error": "No image provided"}, 400
 
-            # Convert to grayscale if needed
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image.copy()
-            
+            # 'rgb' keeps one spectrum per channel, 'luma' / 'gray' transform luminance only
+            color_mode = request.form.get('color_mode', 'rgb')
+
             # Apply FFT and get magnitude spectrum
-            fshift = apply_fft(gray)
-            mag_spec = magnitude_spectrum(fshift)
-            mag_spec_norm = cv2.normalize(mag_spec, None, 0, 255, cv2.NORM_MINMAX)
-            
-            # Save the FFT image (magnitude spectrum for visualization)
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            os.makedirs(upload_folder, exist_ok=True)
+            fshift = forward_spectrum(image, color_mode)
+            mag_spec_norm = spectrum_image(fshift)
             
             # Generate filenames
             original_filename = request.files['file'].filename
             fft_filename = f"fft_{original_filename}"
             fft_data_filename = f"fft_data_{original_filename}"
+            storage = get_storage()
             
-            # Save magnitude spectrum image
-            filepath = os.path.join(upload_folder, fft_filename)
-            cv2.imwrite(filepath, mag_spec_norm)
+            # Save the FFT image (magnitude spectrum for visualization)
+            success, encoded = cv2.imencode(os.path.splitext(fft_filename)[1] or '.png', mag_spec_norm)
+            if not success:
+                return {"error": f"Failed to encode {fft_filename}"}, 500
+            storage.put(fft_filename, encoded)
             
             # Save actual FFT data
-            fft_data_path = os.path.join(upload_folder, fft_data_filename)
-            with open(fft_data_path, 'wb') as f:
-                pickle.dump(fshift, f)
+            storage.put(fft_data_filename, dump_fft_data(fshift, color_mode))
             
             return {
                 "message": "FFT generated successfully",
                 "fft_image": fft_filename,
                 "fft_data": fft_data_filename
             }
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except Exception as e:
             return {"error": str(e)}, 500
 
 @fft_ns.route('/inverse')
 class FFTInverse(Resource):
     def post(self):
+        from app.services.fft_utils import inverse_spectrum
+        from app.services.image_io import get_image_from_request, save_processed_image
+
         try:
             # Get image from request using the utility function
             image = get_image_from_request(request)
             if image is None:
                 return {"error": "No image provided"}, 400
 
-            # Convert to grayscale if needed
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image.copy()
-            
             # Get the original filename to find the FFT data
             original_filename = request.files['file'].filename
             fft_data_filename = f"fft_data_{original_filename}"
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            fft_data_path = os.path.join(upload_folder, fft_data_filename)
             
-            # Load the FFT data
-            with open(fft_data_path, 'rb') as f:
-                fshift = pickle.load(f)
+            # Load the FFT data (shared between workers when the store is on)
+            fft_data = load_fft_data(fft_data_filename)
+            if fft_data is None:
+                return {"error": "FFT data not found"}, 404
+            fshift, color_mode = fft_data
             
-            # Apply inverse FFT
-            processed_img = apply_ifft(fshift)
-            processed_img = cv2.normalize(processed_img, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+            # Apply inverse FFT; the uploaded image supplies chroma in 'luma' mode
+            processed_img = inverse_spectrum(fshift, image, color_mode)
             
             # Save the processed image
             processed_filename = save_processed_image(processed_img)
@@ -97,27 +148,63 @@ class FFTInverse(Resource):
                 "message": "Inverse FFT applied successfully",
                 "processed_image": processed_filename
             }
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except Exception as e:
             return {"error": str(e)}, 500
 
 @fft_ns.route('/magnitude')
 class FFTMagnitude(Resource):
     def post(self):
+        from app.services.fft_utils import forward_spectrum, spectrum_image
+        from app.services.image_io import get_image_from_request
+
         try:
             # Get image from request using the utility function
             image = get_image_from_request(request)
             if image is None:
                 return {"error": "No image provided"}, 400
 
-            # Convert to grayscale if needed
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image.copy()
-            
-            mag_spec = magnitude_spectrum(gray)
-            mag_spec_norm = cv2.normalize(mag_spec, None, 0, 255, cv2.NORM_MINMAX)
+            color_mode = request.form.get('color_mode', 'rgb')
+            mag_spec_norm = spectrum_image(forward_spectrum(image, color_mode))
             encoded_img = encode_image_to_base64(mag_spec_norm)
             return {"magnitude_spectrum": encoded_img}
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
+@fft_ns.route('/filter')
+class FFTFilter(Resource):
+    @fft_ns.expect(frequency_filter_model)
+    def post(self):
+        from app.services.frequency_utils import frequency_filter
+        from app.services.image_io import get_image_from_request, save_processed_image
+
+        try:
+            image = get_image_from_request(request)
+            if image is None:
+                return {"error": "No image provided"}, 400
+
+            try:
+                filtered = frequency_filter(
+                    image,
+                    request.form.get('filter', 'gaussian'),
+                    request.form.get('band', 'lowpass'),
+                    float(request.form.get('cutoff', 30)),
+                    float(request.form.get('width', 10)),
+                    int(request.form.get('order', 2)),
+                    request.form.get('color_mode', 'rgb')
+                )
+            except ValueError as ve:
+                return {"error": str(ve)}, 400
+
+            processed_filename = save_processed_image(filtered)
+
+            return {
+                "message": "Frequency filter applied successfully",
+                "processed_image": processed_filename
+            }
         except Exception as e:
             return {"error": str(e)}, 500
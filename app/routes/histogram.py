@@ -1,14 +1,14 @@
 from flask_restx import Namespace, Resource, fields, reqparse
 from flask import request, current_app
-import cv2
-import numpy as np
-from app.services.image_io import get_image_from_request, save_processed_image, load_image
 from app.models.db import db
 from app.models.image_log import ImageLog
 import logging
 import os
 import imghdr
 
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
+
 hist_ns = Namespace('histogram', description='Histogram related operations')
 
 file_upload_parser = reqparse.RequestParser()
@@ -22,6 +22,7 @@ histogram_model = hist_ns.model('Histogram', {
 histogram_response_model = hist_ns.model('HistogramResponse', {
     'histograms': fields.Nested(histogram_model),
     'cumulative_histograms': fields.Nested(histogram_model),
+    'scale': fields.Integer(description='Decode downscale factor (1 = full resolution)'),
     'message': fields.String
 })
 
@@ -30,9 +31,27 @@ equalize_response_model = hist_ns.model('EqualizeResponse', {
     'original_image': fields.String,
     'equalized_image': fields.String,
     'original_histograms': fields.Nested(histogram_model),
-    'equalized_histograms': fields.Nested(histogram_model)
+    'equalized_histograms': fields.Nested(histogram_model),
+    'scale': fields.Integer(description='Decode downscale factor (1 = full resolution)')
 })
 
+# Longest side an approximate request decodes at (rounded up to a 1/2, 1/4
+# or 1/8 reduction of the stored image)
+APPROXIMATE_MAX_DIMENSION = 512
+
+
+def approximate_size(data):
+    """
+    max_dimension for a request body's `approximate` / `max_dimension`
+    options; ValueError unless max_dimension is a positive integer.
+    """
+    if not data.get('approximate'):
+        return None
+    value = data.get('max_dimension', APPROXIMATE_MAX_DIMENSION)
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit() or int(value) < 1:
+        raise ValueError("max_dimension must be a positive integer")
+    return int(value)
+
 def validate_image_file(filepath):
     """Validate if the file exists and is a valid image."""
     if not os.path.exists(filepath):
@@ -71,6 +90,11 @@ class GetHistogram(Resource):
     # @hist_ns.expect(file_upload_parser)
     @hist_ns.marshal_with(histogram_response_model)
     def post(self):
+        import cv2
+        import numpy as np
+        from app.services.image_io import read_image
+        from app.services.storage import get_storage
+
         try:
             # Get the request data
             data = request.get_json()
@@ -79,24 +103,32 @@ class GetHistogram(Resource):
 
             filename = data['filename']
             current_app.logger.info(f"Loading image from filename: {filename}")
+            try:
+                max_dimension = approximate_size(data)
+            except ValueError as ve:
+                return {"error": str(ve)}, 400
 
-            # Get the full path to the uploads directory
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            filepath = os.path.join(upload_folder, filename)
-            current_app.logger.info(f"Full filepath: {filepath}")
+            # A local copy of the stored file (fetched if the store is remote)
+            try:
+                with get_storage().local_path(filename) as filepath:
+                    current_app.logger.info(f"Full filepath: {filepath}")
 
-            if not os.path.exists(filepath):
-                current_app.logger.error(f"File not found: {filepath}")
-                return {"error": "Image file not found"}, 404
+                    if filepath is None:
+                        current_app.logger.error(f"File not found: {filename}")
+                        return {"error": "Image file not found"}, 404
 
-            # Load and process the image
-            image = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)  # Load as grayscale
+                    # Load as grayscale; approximate requests decode at reduced size
+                    image, scale = read_image(filepath, max_dimension, grayscale=True)
+            except ValueError as ve:
+                return {"error": str(ve)}, 400
             if image is None:
                 current_app.logger.error("Failed to load image")
                 return {"error": "Failed to load image"}, 400
 
-            # Calculate histograms
+            # Calculate histograms, scaled back to full-resolution pixel counts
             hist = cv2.calcHist([image], [0], None, [256], [0, 256])
+            if scale > 1:
+                hist *= scale * scale
             histograms = {'gray': hist.flatten().tolist()}
 
             cumulative_histograms = {'gray': np.cumsum(hist.flatten()).tolist()}
@@ -104,6 +136,7 @@ class GetHistogram(Resource):
             return {
                 "histograms": histograms,
                 "cumulative_histograms": cumulative_histograms,
+                "scale": scale,
                 "message": "Histogram data retrieved successfully"
             }
         except Exception as e:
@@ -114,6 +147,11 @@ class GetHistogram(Resource):
 class EqualizeHistogram(Resource):
     @hist_ns.marshal_with(equalize_response_model)
     def post(self):
+        import cv2
+        from app.services.image_io import save_processed_image, read_image
+        from app.services.histogram_utils import equalize, working_channel
+        from app.services.storage import get_storage
+
         try:
             # Get and validate request data
             data = request.get_json()
@@ -129,51 +167,61 @@ class EqualizeHistogram(Resource):
                 
             # Sanitize filename to prevent directory traversal
             filename = os.path.basename(filename)
-            
-            # Get the full path to the uploads directory
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            filepath = os.path.join(upload_folder, filename)
-            current_app.logger.info(f"Processing image: {filepath}")
 
             try:
-                # Validate the image file
-                validate_image_file(filepath)
+                max_dimension = approximate_size(data)
             except ValueError as ve:
-                current_app.logger.error(f"Image validation error: {str(ve)}")
                 return {"error": str(ve)}, 400
+            
+            # 'gray' equalizes intensity; 'lab' / 'ycrcb' equalize lightness and keep colour
+            method = data.get('method', 'clahe')
+            color_mode = data.get('color_mode', 'gray')
 
+            # A local copy of the stored file, kept in place while it is read
             try:
-                # Load and validate image content
-                image = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)
-                validate_image_content(image)
+                with get_storage().local_path(filename) as filepath:
+                    try:
+                        if filepath is None:
+                            raise ValueError("Image file not found")
+                        current_app.logger.info(f"Processing image: {filepath}")
+                        validate_image_file(filepath)
+                    except ValueError as ve:
+                        current_app.logger.error(f"Image validation error: {str(ve)}")
+                        return {"error": str(ve)}, 400
+
+                    try:
+                        # Load and validate image content; an approximate request
+                        # decodes, equalizes and returns a reduced preview
+                        image, scale = read_image(filepath, max_dimension, grayscale=color_mode == 'gray')
+                        validate_image_content(image)
+                    except ValueError as ve:
+                        current_app.logger.error(f"Image content error: {str(ve)}")
+                        return {"error": str(ve)}, 400
             except ValueError as ve:
-                current_app.logger.error(f"Image content error: {str(ve)}")
+                # An invalid storage name
                 return {"error": str(ve)}, 400
 
-            # Calculate initial histogram
-            hist = cv2.calcHist([image], [0], None, [256], [0, 256])
-            if hist is None or len(hist) == 0:
-                current_app.logger.error("Histogram calculation failed")
-                return {"error": "Failed to calculate image histogram"}, 400
-
             try:
-                # Apply CLAHE equalization
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-                equalized = clahe.apply(image)
-                
-                if equalized is None or equalized.size == 0:
-                    raise ValueError("Histogram equalization failed")
-
-                # Calculate histograms
-                original_hist = cv2.calcHist([image], [0], None, [256], [0, 256])
-                equalized_hist = cv2.calcHist([equalized], [0], None, [256], [0, 256])
+                equalized = equalize(
+                    image,
+                    method,
+                    color_mode,
+                    float(data.get('clip_limit', 2.0)),
+                    int(data.get('tile_size', 8))
+                )
+
+                # Histograms of the channel that was equalized
+                original_hist = cv2.calcHist([working_channel(image, color_mode)], [0], None, [256], [0, 256])
+                equalized_hist = cv2.calcHist([working_channel(equalized, color_mode)], [0], None, [256], [0, 256])
+                if scale > 1:
+                    original_hist *= scale * scale
+                    equalized_hist *= scale * scale
 
                 original_histograms = {'gray': original_hist.flatten().tolist()}
                 equalized_histograms = {'gray': equalized_hist.flatten().tolist()}
 
-                # Save processed images
+                # The original is already stored, only the result is written
                 try:
-                    original_path = save_processed_image(image)
                     equalized_path = save_processed_image(equalized)
                 except Exception as e:
                     current_app.logger.error(f"Failed to save processed images: {str(e)}")
@@ -181,10 +229,11 @@ class EqualizeHistogram(Resource):
 
                 return {
                     "message": "Histogram equalization completed successfully",
-                    "original_image": original_path,
+                    "original_image": filename,
                     "equalized_image": equalized_path,
                     "original_histograms": original_histograms,
-                    "equalized_histograms": equalized_histograms
+                    "equalized_histograms": equalized_histograms,
+                    "scale": scale
                 }
                 
             except Exception as e:
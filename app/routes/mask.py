@@ -1,9 +1,79 @@
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, fields
+from flask import request
+from app.models.db import db
+from app.models.image_log import ImageLog
+import json
+
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
 
 mask_ns = Namespace('mask', description='Mask operations')
 
+mask_model = mask_ns.model('MaskApply', {
+    'operation': fields.String(required=True, description='Filter type (gaussian, median, sobel, ...) or "adjust"'),
+    'params': fields.Raw(description='Parameters for the filter or adjustment'),
+    'mask': fields.Raw(description='Mask spec: {"type": "rectangle|ellipse|polygon|bitmap", ..., "feather": sigma}')
+})
+
+
 @mask_ns.route('/apply')
 class ApplyMask(Resource):
+    @mask_ns.expect(mask_model)
     def post(self):
-        
-        return {"message": "Mask applied (placeholder)"}
+        import cv2
+        import numpy as np
+        from app.services.image_io import get_image_from_request, save_processed_image
+        from app.services.mask_utils import rasterize_mask, resolve_operation, apply_masked_operation
+
+        try:
+            image = get_image_from_request(request)
+            if image is None:
+                return {"error": "No image provided"}, 400
+
+            operation = request.form.get('operation', 'gaussian')
+            try:
+                params = json.loads(request.form.get('params', '{}'))
+                spec = json.loads(request.form.get('mask', '{}'))
+            except json.JSONDecodeError:
+                return {"error": "Invalid parameters format"}, 400
+
+            bitmap = None
+            if spec.get('type') == 'bitmap':
+                mask_file = request.files.get('mask')
+                if mask_file is None or mask_file.filename == '':
+                    return {"error": "No mask image provided"}, 400
+                bitmap = cv2.imdecode(np.frombuffer(mask_file.read(), np.uint8), cv2.IMREAD_GRAYSCALE)
+                if bitmap is None:
+                    return {"error": "Invalid mask image format"}, 400
+
+            try:
+                run, halo = resolve_operation(operation, params)
+                alpha, box = rasterize_mask(image.shape, spec, bitmap)
+            except (KeyError, TypeError, ValueError) as e:
+                return {"error": f"Invalid mask request: {str(e)}"}, 400
+
+            masked = apply_masked_operation(image, alpha, box, run, halo)
+
+            processed_image_filename = save_processed_image(masked)
+
+            # Get the original filename from the request
+            original_filename = request.files['file'].filename
+
+            # Update the existing log entry instead of creating a new one
+            existing_log = ImageLog.query.filter_by(filename=original_filename).first()
+            if existing_log:
+                existing_log.processed = True
+                db.session.commit()
+            else:
+                new_log = ImageLog(filename=original_filename, processed=True)
+                db.session.add(new_log)
+                db.session.commit()
+
+            return {
+                "message": f"{operation} applied inside mask successfully",
+                "processed_image": processed_image_filename,
+                "region": list(box) if box else None
+            }
+
+        except Exception as e:
+            return {"error": str(e)}, 500
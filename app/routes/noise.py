@@ -1,19 +1,12 @@
 from flask_restx import Namespace, Resource, fields, reqparse
 from flask import request, current_app
-from app.services.image_io import get_image_from_request, save_processed_image
-from app.services.noise_utils import (
-    add_salt_pepper_noise, add_gaussian_noise, add_periodic_noise
-)
-from app.services.filters import (
-    apply_median_filter, apply_gaussian_filter, apply_bilateral_filter,
-    apply_notch_filter, apply_band_reject_filter
-)
 from app.models.db import db
 from app.models.image_log import ImageLog
 import json
 import os
-import numpy as np
-import cv2
+
+# Services (and with them cv2, NumPy and SciPy) are imported inside the
+# handlers so that create_app stays cheap; see benchmarks/bench_startup.py
 
 noise_ns = Namespace('noise', description='Noise addition and removal operations')
 
@@ -28,7 +21,8 @@ add_noise_model = noise_ns.model('AddNoise', {
 
 
 remove_noise_model = noise_ns.model('RemoveNoise', {
-    'type': fields.String(required=True, description='Filter type (median, gaussian, bilateral, notch, band_reject)'),
+    'type': fields.String(required=True, description='Filter type (median, gaussian, bilateral, notch, band_reject, nlm, wavelet, guided); '
+                                                       'notch takes points or mode=auto, the denoisers take tier (fast, balanced, quality) and sigma'),
     'params': params_field
 })
 
@@ -37,6 +31,10 @@ remove_noise_model = noise_ns.model('RemoveNoise', {
 class AddNoise(Resource):
     @noise_ns.expect(add_noise_model)
     def post(self):
+        from app.services.image_io import get_image_from_request, save_processed_image
+        from app.services.buffer_pool import pool
+        from app.services.noise_utils import add_salt_pepper_noise, add_gaussian_noise, add_periodic_noise
+
         try:
             image = get_image_from_request(request)
             if image is None:
@@ -50,25 +48,33 @@ class AddNoise(Resource):
             except json.JSONDecodeError:
                 return {"error": "Invalid parameters format"}, 400
 
-            if noise_type == 'salt_pepper':
-                noisy = add_salt_pepper_noise(image, params.get('density', 0.05))
-            elif noise_type == 'gaussian':
-                noisy = add_gaussian_noise(image, params.get('mean', 0), params.get('sigma', 25))
-            elif noise_type == 'periodic':
-                noisy = add_periodic_noise(
-                    image,
-                    params.get('frequency', 20),
-                    params.get('amplitude', 50),
-                    params.get('pattern', 'sine')
-                )
-            else:
+            if noise_type not in ('salt_pepper', 'gaussian', 'periodic'):
                 return {"error": "Invalid noise type"}, 400
 
+            # The noisy frame only lives until it is encoded, so it is drawn from the pool
+            with pool.borrow(image.shape, image.dtype) as out:
+                if noise_type == 'salt_pepper':
+                    noisy = add_salt_pepper_noise(
+                        image, params.get('density', 0.05), seed=params.get('seed'), out=out
+                    )
+                elif noise_type == 'gaussian':
+                    noisy = add_gaussian_noise(
+                        image, params.get('mean', 0), params.get('sigma', 25), seed=params.get('seed'), out=out
+                    )
+                else:
+                    noisy = add_periodic_noise(
+                        image,
+                        params.get('frequency', 20),
+                        params.get('amplitude', 50),
+                        params.get('pattern', 'sine'),
+                        out=out
+                    )
+
+                # Save the noisy image with a unique filename
+                processed_image_filename = save_processed_image(noisy)
+
             # Get the original filename from the request
             original_filename = request.files['file'].filename
-            
-            # Save the noisy image with a unique filename
-            processed_image_filename = save_processed_image(noisy)
 
             # Update the existing log entry instead of creating a new one
             existing_log = ImageLog.query.filter_by(filename=original_filename).first()
@@ -90,14 +96,14 @@ class AddNoise(Resource):
 
 @noise_ns.route('/remove')
 class RemoveNoise(Resource):
+    @noise_ns.expect(remove_noise_model)
     def post(self):
-        if 'file' not in request.files:
-            return {'error': 'No file provided'}, 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return {'error': 'No file selected'}, 400
-        
+        from app.services.image_io import get_image_from_request, save_processed_image
+        from app.services.filters import (
+            apply_filter, apply_median_filter, apply_notch_filter, apply_band_reject_filter, remove_periodic_noise
+        )
+        from app.services.denoise_utils import denoise, DENOISERS
+
         filter_type = request.form.get('type')
         params_str = request.form.get('params', '{}')
         
@@ -107,27 +113,47 @@ class RemoveNoise(Resource):
             return {'error': 'Invalid parameters format'}, 400
         
         try:
-            # Read the image
-            img_array = np.frombuffer(file.read(), np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            
+            img = get_image_from_request(request)
             if img is None:
-                return {'error': 'Invalid image format'}, 400
+                return {'error': 'No image provided'}, 400
+            file = request.files['file']
             
             # Apply the selected filter
+            detected_points = None
             if filter_type == 'median':
-                kernel_size = params.get('kernel_size', 3)
-                filtered_img = apply_median_filter(img, kernel_size)
+                kernel_size = int(params.get('kernel_size', 3))
+                filtered_img = apply_median_filter(
+                    img, kernel_size, params.get('kernel_height'), params.get('weights'),
+                    int(params.get('center_weight', 1))
+                )
+            elif filter_type in DENOISERS:
+                sigma = params.get('sigma')
+                filtered_img = denoise(
+                    img, filter_type, params.get('tier', 'balanced'),
+                    float(sigma) if sigma is not None else None
+                )
+            elif filter_type == 'notch' and params.get('mode') == 'auto':
+                filtered_img, detected_points = remove_periodic_noise(
+                    img,
+                    int(params.get('max_peaks', 8)),
+                    float(params.get('threshold', 2.0)),
+                    int(params.get('radius', 2)),
+                    color_mode=params.get('color_mode', 'rgb')
+                )
             elif filter_type == 'notch':
                 points = params.get('points', [])
                 # Convert points to list of tuples if they exist
                 if points:
                     points = [(float(p['x']), float(p['y'])) for p in points]
-                filtered_img = apply_notch_filter(img, points)
+                filtered_img = apply_notch_filter(img, points, color_mode=params.get('color_mode', 'rgb'))
             elif filter_type == 'band_reject':
                 cutoff_freq = params.get('cutoff_freq', 30)
                 width = params.get('width', 10)
-                filtered_img = apply_band_reject_filter(img, cutoff_freq, width)
+                filtered_img = apply_band_reject_filter(
+                    img, cutoff_freq, width, color_mode=params.get('color_mode', 'rgb')
+                )
+            elif filter_type in ('gaussian', 'bilateral'):
+                filtered_img = apply_filter(img, filter_type, params)
             else:
                 return {'error': 'Invalid filter type'}, 400
             
@@ -140,11 +166,16 @@ class RemoveNoise(Resource):
                 log_entry.processed = True
                 db.session.commit()
             
-            return {
+            response = {
                 'message': 'Noise removed successfully',
                 'processed_image': processed_filename
             }
+            if detected_points is not None:
+                response['points'] = detected_points
+            return response
             
+        except ValueError as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             print(f"Error in RemoveNoise: {str(e)}")
             return {'error': str(e)}, 500
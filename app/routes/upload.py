@@ -1,11 +1,10 @@
-import os
-from flask import current_app, request, send_file
+from flask import request
 from flask_restx import Namespace, Resource, reqparse, fields
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from app.models.db import db
 from app.models.image_log import ImageLog
 import base64
-from io import BytesIO
 
 upload_ns = Namespace('upload', description='Image upload operations')
 
@@ -24,6 +23,16 @@ upload_response = upload_ns.model('UploadResponse', {
 })
 
 
+chunked_create = upload_ns.model('ChunkedUploadCreate', {
+    'filename': fields.String(required=True, description='Name to store the image under'),
+    'size': fields.Integer(description='Total bytes, if known; finalize then checks it')
+})
+
+chunked_finalize = upload_ns.model('ChunkedUploadFinalize', {
+    'checksum': fields.String(description='blake2b-128 hex digest of the whole file, checked if given')
+})
+
+
 log_item = upload_ns.model('LogItem', {
     'id': fields.Integer,
     'filename': fields.String,
@@ -44,17 +53,15 @@ class UploadImage(Resource):
             upload_ns.abort(400, "No selected file")
 
         if file and allowed_file(file.filename):
+            from app.services.storage import get_storage
+
             filename = secure_filename(file.filename)
             
-            # Create uploads directory if it doesn't exist
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            # Save the file to the filesystem
-            filepath = os.path.join(upload_folder, filename)
-            file.save(filepath)
+            # Save the file to the configured storage
+            get_storage().put(filename, file.stream)
             
-            # Read the file content and convert to base64
+            # Read the file content back (put left the stream at its end) and convert to base64
+            file.stream.seek(0)
             file_content = file.read()
             image_data = base64.b64encode(file_content).decode('utf-8')
             
@@ -67,11 +74,114 @@ class UploadImage(Resource):
             db.session.add(new_log)
             db.session.commit()
 
+            # Thumbnails and previews are built after the response is sent
+            from app.services.renditions import schedule_renditions
+            schedule_renditions(filename)
+
             return {"message": "Image uploaded and logged", "filename": filename}, 201
 
         upload_ns.abort(400, "File type not allowed")
 
 
+def _session_response(status, code=200):
+    # The offset is also sent as a header, so a client can resume from a HEAD
+    return status, code, {'Upload-Offset': str(status['offset'])}
+
+
+@upload_ns.route('/chunked')
+class ChunkedUploadCreate(Resource):
+    @upload_ns.expect(chunked_create)
+    def post(self):
+        """Start a resumable upload; chunks are then sent with PATCH."""
+        from app.services.upload_sessions import get_sessions
+
+        try:
+            data = request.get_json(silent=True) or {}
+            filename = secure_filename(data.get('filename') or '')
+            if not filename or not allowed_file(filename):
+                return {"error": "File type not allowed"}, 400
+            return _session_response(get_sessions().create(filename, data.get('size')), 201)
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
+@upload_ns.route('/chunked/<upload_id>')
+class ChunkedUpload(Resource):
+    def get(self, upload_id):
+        """Where an interrupted upload resumes from."""
+        from app.services.upload_sessions import get_sessions
+
+        status = get_sessions().status(upload_id)
+        if status is None:
+            return {"error": "Upload not found"}, 404
+        return _session_response(status)
+
+    def patch(self, upload_id):
+        """
+        Append the request body at the Upload-Offset header. The body is
+        streamed to disk, so a chunk may be any size.
+        """
+        from app.services.upload_sessions import get_sessions, OffsetMismatch, SessionBusy
+
+        try:
+            try:
+                offset = int(request.headers['Upload-Offset'])
+            except (KeyError, ValueError):
+                return {"error": "Upload-Offset header required"}, 400
+            status = get_sessions().append(upload_id, offset, request.stream)
+            if status is None:
+                return {"error": "Upload not found"}, 404
+            return _session_response(status)
+        except OffsetMismatch as om:
+            return {"error": str(om), "offset": om.offset}, 409, {'Upload-Offset': str(om.offset)}
+        except SessionBusy as sb:
+            return {"error": str(sb)}, 409
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+    def delete(self, upload_id):
+        """Abandon an upload and drop what it received."""
+        from app.services.upload_sessions import get_sessions
+
+        if not get_sessions().discard(upload_id):
+            return {"error": "Upload not found"}, 404
+        return {"message": "Upload discarded"}, 200
+
+
+@upload_ns.route('/chunked/<upload_id>/finalize')
+class ChunkedUploadFinalize(Resource):
+    @upload_ns.expect(chunked_finalize)
+    def post(self, upload_id):
+        """Check the size and hash of a complete upload, store it and log it."""
+        from app.services.renditions import schedule_renditions
+        from app.services.storage import get_storage
+        from app.services.upload_sessions import get_sessions, OffsetMismatch, SessionBusy
+
+        try:
+            data = request.get_json(silent=True) or {}
+            result = get_sessions().finish(upload_id, get_storage().put, data.get('checksum'))
+            if result is None:
+                return {"error": "Upload not found"}, 404
+
+            # Served from storage; the database keeps no base64 copy of large uploads
+            db.session.add(ImageLog(filename=result['filename'], processed=False))
+            db.session.commit()
+            schedule_renditions(result['filename'])
+            return {"message": "Image uploaded and logged", **result}, 201
+        except OffsetMismatch as om:
+            return {"error": f"Upload is incomplete: {om}", "offset": om.offset}, 409
+        except SessionBusy as sb:
+            return {"error": str(sb)}, 409
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
 @upload_ns.route('/logs')
 class UploadLogs(Resource):
     @upload_ns.marshal_list_with(log_item)
@@ -115,47 +225,85 @@ class UpdateImage(Resource):
 @upload_ns.route('/download/<filename>')
 class DownloadImage(Resource):
     def get(self, filename):
+        from app.services.file_serving import send_stored_file, send_stored_bytes, data_etag, not_modified
+        from app.services.storage import get_storage
+
         try:
-            # Check if the image exists in the database
+            # Every stored artifact (uploads, processed outputs, FFT images)
+            # is served from a local copy, without a database lookup
+            try:
+                with get_storage().local_path(filename) as image_path:
+                    if image_path is not None:
+                        return send_stored_file(image_path, filename)
+            except ValueError:
+                pass
+
+            # Otherwise fall back to the copy kept in the database
             image_log = ImageLog.query.filter_by(filename=filename).first()
             if not image_log:
                 return {"error": "Image not found"}, 404
-
-            # Get the processed image path
-            upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-            image_path = os.path.join(upload_folder, filename)
-            
-            # If the file exists in uploads folder (processed image), send that
-            if os.path.exists(image_path):
-                return send_file(
-                    image_path,
-                    as_attachment=True,
-                    download_name=filename
-                )
-            
-            # If no processed file exists, check the database
             if not image_log.image_data:
                 return {"error": "Image data not found"}, 404
 
+            # Tag the stored base64 text so a matching revalidation skips decoding it
+            etag = data_etag(image_log.image_data.encode())
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+
             try:
                 # Convert base64 to bytes
                 image_bytes = base64.b64decode(image_log.image_data)
             except Exception as e:
                 return {"error": f"Failed to decode image data: {str(e)}"}, 500
             
-            # Create a BytesIO object
-            image_io = BytesIO(image_bytes)
-            
             # Determine the mimetype based on the file extension
-            ext = filename.rsplit('.', 1)[1].lower()
+            ext = filename.rsplit('.', 1)[-1].lower()
             mimetype = f'image/{ext}' if ext in ['png', 'jpg', 'jpeg', 'gif'] else 'image/png'
             
-            return send_file(
-                image_io,
-                mimetype=mimetype,
-                as_attachment=True,
-                download_name=filename
-            )
+            return send_stored_bytes(image_bytes, filename, mimetype, etag)
+
+        except HTTPException:
+            # e.g. 416 for an unsatisfiable Range
+            raise
+        except Exception as e:
+            return {"error": f"Server error: {str(e)}"}, 500
+
+
+@upload_ns.route('/rendition/<filename>/<int:size>')
+class ImageRendition(Resource):
+    def get(self, filename, size):
+        """
+        A downscaled copy of an uploaded image for galleries and previews,
+        WebP for clients that accept it and JPEG otherwise.
+        """
+        from flask import current_app
+        from app.services.file_serving import send_stored_file
+        from app.services.renditions import FORMATS, find_rendition
+        from app.services.storage import get_storage
+
+        try:
+            sizes = current_app.config['RENDITION_SIZES']
+            if size not in sizes:
+                return {"error": f"Rendition sizes are {', '.join(map(str, sizes))}"}, 404
+            renditions = find_rendition(filename, size)
+            if not renditions:
+                return {"error": "Image not found"}, 404
 
+            # WebP only for clients that name it: older ones send image/* without supporting it
+            accepted = set(request.accept_mimetypes.values())
+            formats = [fmt for fmt in renditions if FORMATS[fmt][1] in accepted] or ['jpeg']
+            rendition = renditions.get(formats[0]) or next(iter(renditions.values()))
+            # send_file opens the file, so it outlives the cached copy's pin
+            with get_storage().local_path(rendition.filename) as path:
+                if path is None:
+                    return {"error": "Rendition not found"}, 404
+                response = send_stored_file(path, rendition.filename, as_attachment=False,
+                                            max_age=current_app.config['RENDITION_MAX_AGE'])
+            response.vary.add('Accept')
+            return response
+        except HTTPException:
+            raise
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
         except Exception as e:
             return {"error": f"Server error: {str(e)}"}, 500
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+from app.services.buffer_pool import pool
+
+
+def _saturation_lut(factor):
+    # Identity on H and V, scaled and clipped S; same truncation as the float path
+    lut = np.repeat(np.arange(256, dtype=np.uint8)[None, :, None], 3, axis=2)
+    lut[0, :, 1] = np.clip(np.arange(256, dtype=np.float32) * factor, 0, 255).astype(np.uint8)
+    return lut
+
+
+def apply_adjustments(image, brightness=0, contrast=0, saturation=0, out=None):
+    """
+    Brightness/contrast via convertScaleAbs, then saturation scaled through a
+    uint8 lookup table on a pooled HSV buffer. `out` may be a reusable buffer
+    of the image's shape.
+    """
+    # Convert brightness and contrast to OpenCV format
+    brightness = 1 + (brightness / 100.0)  # Convert to multiplier
+    contrast = 1 + (contrast / 100.0)  # Convert to multiplier
+
+    # Apply brightness and contrast
+    adjusted = cv2.convertScaleAbs(image, out, alpha=contrast, beta=brightness)
+
+    # Apply saturation
+    if saturation != 0 and len(adjusted.shape) == 3:
+        lut = _saturation_lut(1 + saturation / 100.0)
+        with pool.borrow(adjusted.shape, np.uint8) as hsv:
+            cv2.cvtColor(adjusted, cv2.COLOR_BGR2HSV, dst=hsv)
+            cv2.LUT(hsv, lut, dst=hsv)
+            cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=adjusted)
+
+    return adjusted
@@ -0,0 +1,266 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from flask import g, jsonify, request
+
+# Cost of an operation per megapixel of input, calibrated on one core with
+# `python -m benchmarks.bench_admission --calibrate`:
+# (milliseconds, peak working memory in MB). tracemalloc only sees NumPy
+# buffers, so memory for OpenCV's internal temporaries is added by hand.
+COSTS = {
+    'filter:sobel': (5, 20),
+    'filter:scharr': (5, 20),
+    'filter:laplace': (3, 20),
+    'filter:canny': (5, 10),
+    'filter:gaussian': (3, 10),
+    'filter:mean': (2, 10),
+    'filter:median': (5, 10),
+    'filter:bilateral': (175, 30),
+    'filter:sharpen': (4, 10),
+    'filter:emboss': (3, 20),
+    'filter:convolve': (3, 20),
+    'filter:morphology': (2, 10),
+    'filter:lut': (10, 10),
+    'denoise:nlm:fast': (1220, 10),
+    'denoise:nlm:balanced': (1780, 10),
+    'denoise:nlm:quality': (2330, 10),
+    'denoise:wavelet:fast': (180, 80),
+    'denoise:wavelet:balanced': (530, 80),
+    'denoise:wavelet:quality': (1700, 80),
+    'denoise:guided:fast': (40, 60),
+    'denoise:guided:balanced': (50, 70),
+    'denoise:guided:quality': (80, 100),
+    'fft': (75, 40),
+    'fft:auto_notch': (230, 90),
+    'noise:add': (50, 10),
+    'adjust': (9, 6),
+    'histogram': (1, 2),
+    'equalize': (5, 6),
+}
+# Added to every operation: decoding the upload and PNG-encoding the result
+IO_COST = (75, 12)
+# Unknown operations are charged like a mid-weight filter
+DEFAULT_COST = (100, 60)
+# Requests estimated under this many seconds are "cheap": they are never
+# held by a concurrency limit and may use the reserved share of the budget
+CHEAP_SECONDS = 0.1
+# Operations at or above this many ms/MP get a concurrency limit of their own
+HEAVY_MS_PER_MP = 60
+# Share of the memory budget kept free for cheap requests
+CHEAP_RESERVE = 0.25
+# Bytes of an upload read to find the image size in its header
+HEADER_BYTES = 128 * 1024
+
+Ticket = namedtuple('Ticket', 'operation megapixels seconds memory')
+
+
+def estimate(operation, pixels):
+    """A Ticket with the estimated run time (s) and memory (bytes) of an operation."""
+    ms, mb = COSTS.get(operation, DEFAULT_COST)
+    ms, mb = ms + IO_COST[0], mb + IO_COST[1]
+    megapixels = pixels / 1e6
+    return Ticket(operation, megapixels, ms * megapixels / 1000, int(mb * megapixels * 1e6))
+
+
+class AdmissionController:
+    """
+    Admits requests against per-operation concurrency limits and a global
+    memory budget. Heavy operations may run at most heavy_concurrency at a
+    time each and may only use (1 - CHEAP_RESERVE) of the budget, so cheap
+    requests keep flowing when heavy ones pile up. A request that does not
+    fit waits up to queue_timeout in a queue of at most max_queued.
+    """
+
+    def __init__(self, memory_budget, queue_timeout=2.0, max_queued=16, heavy_concurrency=2):
+        self.memory_budget = memory_budget
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.heavy_concurrency = heavy_concurrency
+        self._cond = threading.Condition()
+        self._running = Counter()
+        self._memory = 0
+        self._queued = 0
+        self._counts = Counter()
+
+    def limit(self, operation):
+        """Concurrency limit of an operation, or None if it only shares the budget."""
+        if COSTS.get(operation, DEFAULT_COST)[0] >= HEAVY_MS_PER_MP:
+            return self.heavy_concurrency
+        return None
+
+    def _budget(self, ticket):
+        if ticket.seconds < CHEAP_SECONDS:
+            return self.memory_budget
+        return self.memory_budget * (1 - CHEAP_RESERVE)
+
+    def _charge(self, ticket):
+        # A request bigger than its whole budget is charged the budget, so it runs alone
+        return min(ticket.memory, self._budget(ticket))
+
+    def _fits(self, ticket):
+        limit = self.limit(ticket.operation)
+        if limit is not None and ticket.seconds >= CHEAP_SECONDS and self._running[ticket.operation] >= limit:
+            return False
+        return self._memory + self._charge(ticket) <= self._budget(ticket)
+
+    def admit(self, ticket, timeout=None):
+        """Reserve room for a request, waiting up to `timeout` seconds; True if admitted."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not self._fits(ticket):
+                if self._queued >= self.max_queued:
+                    self._counts['rejected'] += 1
+                    return False
+                self._queued += 1
+                self._counts['queued'] += 1
+                try:
+                    while not self._fits(ticket):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counts['rejected'] += 1
+                            return False
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued -= 1
+            self._running[ticket.operation] += 1
+            self._memory += self._charge(ticket)
+            self._counts['admitted'] += 1
+            return True
+
+    def release(self, ticket):
+        with self._cond:
+            self._running[ticket.operation] -= 1
+            if not self._running[ticket.operation]:
+                del self._running[ticket.operation]
+            self._memory -= self._charge(ticket)
+            self._cond.notify_all()
+
+    def retry_after(self, ticket):
+        """Whole seconds a rejected request should wait before retrying."""
+        return max(1, math.ceil(ticket.seconds))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'running': dict(self._running),
+                'queued': self._queued,
+                'memory_bytes': self._memory,
+                'memory_budget': self.memory_budget,
+                **{name: self._counts[name] for name in ('admitted', 'queued', 'rejected')},
+            }
+
+
+def _params():
+    try:
+        return json.loads(request.form.get('params', '{}'))
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def request_operation(endpoint):
+    """Cost-table key for the request being handled, or None if it is not gated."""
+    form = request.form
+    if endpoint == 'filters_apply_filter':
+        return f"filter:{form.get('type', 'sobel')}"
+    if endpoint == 'filters_convolve_filter':
+        return 'filter:convolve'
+    if endpoint == 'mask_apply_mask':
+        operation = form.get('operation', 'gaussian')
+        return 'adjust' if operation == 'adjust' else f'filter:{operation}'
+    if endpoint == 'noise_remove_noise':
+        kind, params = form.get('type'), _params()
+        if kind in ('nlm', 'wavelet', 'guided'):
+            return f"denoise:{kind}:{params.get('tier', 'balanced')}"
+        if kind == 'notch' and params.get('mode') == 'auto':
+            return 'fft:auto_notch'
+        if kind in ('notch', 'band_reject'):
+            return 'fft'
+        return f'filter:{kind}'
+    if endpoint == 'noise_add_noise':
+        return 'noise:add'
+    if endpoint and endpoint.startswith('fft_'):
+        return 'fft'
+    if endpoint == 'adjust_apply_adjustments':
+        return 'adjust'
+    if endpoint == 'adjust_apply_lut' and request.method == 'POST':
+        return 'filter:lut'
+    if endpoint == 'histogram_get_histogram':
+        return 'histogram'
+    if endpoint == 'histogram_equalize_histogram':
+        return 'equalize'
+    return None
+
+
+def request_pixels():
+    """Pixel count of the request's image, read from its header where possible."""
+    from app.routes.histogram import approximate_size
+    from app.services.image_io import image_size, reduction_factor
+    from app.services.storage import get_storage
+
+    upload = request.files.get('file')
+    if upload is not None:
+        head = upload.stream.read(HEADER_BYTES)
+        upload.stream.seek(0)
+        size = image_size(head)
+        # Without a readable header assume about a byte per pixel
+        return size[0] * size[1] if size else request.content_length or 0
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    if not isinstance(filename, str):
+        return 0
+    storage = get_storage()
+    name = os.path.basename(filename)
+    try:
+        # Only the header is fetched; the handler downloads the image once admitted
+        head = storage.read(name, HEADER_BYTES)
+        if head is None:
+            return 0
+        size = image_size(head)
+        pixels = size[0] * size[1] if size else storage.size(name) or 0
+    except ValueError:
+        return 0
+    try:
+        max_dimension = approximate_size(data)
+    except ValueError:
+        # The handler answers 400 without decoding
+        return 0
+    # Approximate histogram requests decode at the 1/2 to 1/8 scale the handler picks
+    return pixels // reduction_factor(size, max_dimension) ** 2
+
+
+def init_admission(app):
+    """Put an AdmissionController in front of the image endpoints of `app`."""
+    controller = AdmissionController(
+        app.config['ADMISSION_MEMORY_BUDGET'],
+        app.config['ADMISSION_QUEUE_TIMEOUT'],
+        app.config['ADMISSION_MAX_QUEUED'],
+        app.config['ADMISSION_HEAVY_CONCURRENCY'],
+    )
+    app.extensions['admission'] = controller
+
+    @app.before_request
+    def admit_request():
+        operation = request_operation(request.endpoint)
+        if operation is None:
+            return None
+        ticket = estimate(operation, request_pixels())
+        if not controller.admit(ticket):
+            response = jsonify({"error": "Server busy, retry later", "operation": operation})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(controller.retry_after(ticket))
+            return response
+        g.admission_ticket = ticket
+        return None
+
+    @app.teardown_request
+    def release_request(exc=None):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            controller.release(ticket)
+
+    return controller
@@ -0,0 +1,148 @@
+import cv2
+import numpy as np
+from scipy import fft as sfft
+from app.services.parallel import default_workers
+
+# Direct separable convolution costs ~kernel_size per pixel; past this size
+# (sigma ~20) the constant-cost backends win (see benchmarks/bench_blur.py).
+DIRECT_MAX_KERNEL = 121
+# FFT convolution is a little faster than the recursive filter but holds a
+# complex spectrum of the padded frame, so it is capped by frame size.
+FFT_MAX_PIXELS = 4_000_000
+
+
+def gaussian_sigma(kernel_size, sigma):
+    """Resolve (kernel_size, sigma) the way cv2.GaussianBlur does; either may be 0."""
+    if sigma <= 0:
+        if kernel_size <= 0:
+            raise ValueError("Either kernel_size or sigma must be positive")
+        sigma = 0.3 * ((kernel_size - 1) * 0.5 - 1) + 0.8
+    if kernel_size <= 0:
+        kernel_size = int(round(sigma * 6 + 1)) | 1
+    return kernel_size, sigma
+
+
+def _yvv_coefficients(sigma):
+    # Young & van Vliet (1995), recursive Gaussian of order 3
+    if sigma >= 2.5:
+        q = 0.98711 * sigma - 0.96330
+    else:
+        q = 3.97156 - 4.14554 * np.sqrt(1 - 0.26891 * sigma)
+    b0 = 1.57825 + 2.44413 * q + 1.4281 * q ** 2 + 0.422205 * q ** 3
+    b1 = 2.44413 * q + 2.85619 * q ** 2 + 1.26661 * q ** 3
+    b2 = -(1.4281 * q ** 2 + 1.26661 * q ** 3)
+    b3 = 0.422205 * q ** 3
+    gain = 1 - (b1 + b2 + b3) / b0
+    return np.array([gain]), np.array([1, -b1 / b0, -b2 / b0, -b3 / b0])
+
+
+def _recursive_pass(data, b, a):
+    # Causal then anti-causal pass along the last (contiguous) axis, each
+    # started in steady state on the edge value so borders behave like
+    # BORDER_REPLICATE. scipy.signal takes ~0.5 s to import, so it is only
+    # loaded once a blur actually takes the recursive path.
+    from scipy.signal import lfilter, lfilter_zi
+    zi = lfilter_zi(b, a).astype(data.dtype)
+    data, _ = lfilter(b, a, data, axis=-1, zi=zi * data[..., :1])
+    data = data[..., ::-1]
+    data, _ = lfilter(b, a, data, axis=-1, zi=zi * data[..., :1])
+    return data[..., ::-1]
+
+
+def gaussian_blur_iir(image, sigma):
+    """Recursive Gaussian: a fixed number of operations per pixel for any sigma (sigma >= 0.5)."""
+    b, a = _yvv_coefficients(max(sigma, 0.5))
+    data = image.astype(np.float32)
+    if data.ndim == 2:
+        data = data[:, :, None]
+    # lfilter is fastest along a contiguous last axis, so transpose between passes
+    data = np.ascontiguousarray(data.transpose(0, 2, 1))  # rows, channels, cols
+    data = _recursive_pass(data, b, a)
+    data = np.ascontiguousarray(data.transpose(2, 1, 0))  # cols, channels, rows
+    data = _recursive_pass(data, b, a)
+    data = data.transpose(2, 0, 1)  # rows, cols, channels
+    if image.ndim == 2:
+        data = data[:, :, 0]
+    return np.clip(data, 0, 255).round().astype(image.dtype)
+
+
+def gaussian_blur_fft(image, sigma):
+    """Gaussian via multiplication with its analytic transfer function on a reflect-padded frame."""
+    pad = int(np.ceil(3 * sigma))
+    rows, cols = image.shape[:2]
+    padded = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_REFLECT_101).astype(np.float32)
+    prows, pcols = sfft.next_fast_len(padded.shape[0], real=True), sfft.next_fast_len(padded.shape[1], real=True)
+
+    fy = sfft.fftfreq(prows).astype(np.float32)
+    fx = sfft.rfftfreq(pcols).astype(np.float32)
+    # Separable transfer function, broadcast instead of materialising a meshgrid
+    gy = np.exp(-2 * (np.pi * sigma * fy) ** 2)[:, None]
+    gx = np.exp(-2 * (np.pi * sigma * fx) ** 2)[None, :]
+    transfer = gy * gx
+    if padded.ndim == 3:
+        transfer = transfer[:, :, None]
+
+    workers = default_workers()
+    spectrum = sfft.rfft2(padded, s=(prows, pcols), axes=(0, 1), workers=workers)
+    spectrum *= transfer
+    result = sfft.irfft2(spectrum, s=(prows, pcols), axes=(0, 1), workers=workers)
+    result = result[pad:pad + rows, pad:pad + cols]
+    return np.clip(result, 0, 255).round().astype(image.dtype)
+
+
+def select_gaussian_method(shape, kernel_size, sigma):
+    if kernel_size <= DIRECT_MAX_KERNEL:
+        return 'direct'
+    pad = int(np.ceil(3 * sigma))
+    if (shape[0] + 2 * pad) * (shape[1] + 2 * pad) <= FFT_MAX_PIXELS:
+        return 'fft'
+    return 'iir'
+
+
+def gaussian_blur(image, kernel_size=5, sigma=0, method='auto'):
+    """
+    Gaussian blur with a backend picked from the kernel and image size:
+    'direct' (cv2.GaussianBlur, cost ~ kernel_size), 'iir' (recursive,
+    constant cost) or 'fft' (constant per-pixel cost plus a log factor).
+    The recursive and FFT backends use the untruncated Gaussian of `sigma`.
+    """
+    kernel_size, sigma = gaussian_sigma(int(kernel_size), float(sigma))
+    if method == 'auto':
+        method = select_gaussian_method(image.shape, kernel_size, sigma)
+    if method == 'direct':
+        return cv2.GaussianBlur(image, (kernel_size, kernel_size), sigma)
+    if method == 'iir':
+        return gaussian_blur_iir(image, sigma)
+    if method == 'fft':
+        return gaussian_blur_fft(image, sigma)
+    raise ValueError(f"Unsupported blur method: {method}")
+
+
+def integral_box_mean(image, kernel_size):
+    """
+    Box mean from a summed-area table: four lookups per pixel for any size.
+    Borders are reflected (BORDER_REFLECT_101), matching cv2.blur.
+    """
+    kw, kh = kernel_size
+    rows, cols = image.shape[:2]
+    top, left = kh // 2, kw // 2
+    padded = cv2.copyMakeBorder(image, top, kh - 1 - top, left, kw - 1 - left, cv2.BORDER_REFLECT_101)
+    table = cv2.integral(padded, sdepth=cv2.CV_64F)
+    sums = table[kh:kh + rows, kw:kw + cols] - table[:rows, kw:kw + cols]
+    sums -= table[kh:kh + rows, :cols]
+    sums += table[:rows, :cols]
+    sums *= 1.0 / (kw * kh)
+    return np.clip(sums, 0, 255).round().astype(image.dtype)
+
+
+def box_blur(image, kernel_size=5, method='auto'):
+    """
+    Mean filter. 'running' is cv2.blur (running sums), 'integral' uses a
+    summed-area table; both cost the same per pixel regardless of size.
+    """
+    ksize = (kernel_size, kernel_size) if np.isscalar(kernel_size) else tuple(kernel_size)
+    if method in ('auto', 'running'):
+        return cv2.blur(image, ksize)
+    if method == 'integral':
+        return integral_box_mean(image, ksize)
+    raise ValueError(f"Unsupported blur method: {method}")
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# NumPy is imported where arrays are made, so that create_app can size the
+# pool without loading it; see benchmarks/bench_startup.py
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class BufferPool:
+    """
+    Recycles full-frame scratch arrays keyed by (shape, dtype).
+
+    Arrays handed out by `acquire` are uninitialised. Released arrays are
+    kept for the next request of the same shape until `max_bytes` of idle
+    buffers are held; past that the least recently released ones are
+    dropped. Use `borrow` so a buffer always goes back, and never release
+    an array that is still referenced elsewhere.
+
+    The compute budget calls `trim` when the last image request in the
+    process finishes, so idle buffers only cost memory while requests
+    overlap.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._free = OrderedDict()
+        self._held = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.trims = 0
+
+    @staticmethod
+    def _key(shape, dtype):
+        import numpy as np
+        return tuple(int(n) for n in shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype='uint8'):
+        import numpy as np
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                buf = free.pop()
+                if not free:
+                    del self._free[key]
+                self._held -= buf.nbytes
+                self.hits += 1
+                return buf
+            self.misses += 1
+        return np.empty(key[0], key[1])
+
+    def release(self, buf):
+        # Views would keep their base alive and could alias a live array
+        if buf is None or buf.base is not None or not buf.flags.c_contiguous:
+            return
+        key = self._key(buf.shape, buf.dtype)
+        with self._lock:
+            if buf.nbytes > self.max_bytes:
+                return
+            self._free.setdefault(key, []).append(buf)
+            self._free.move_to_end(key)
+            self._held += buf.nbytes
+            while self._held > self.max_bytes:
+                old_key, old = next(iter(self._free.items()))
+                dropped = old.pop(0)
+                if not old:
+                    del self._free[old_key]
+                self._held -= dropped.nbytes
+                self.evictions += 1
+
+    @contextmanager
+    def borrow(self, shape, dtype='uint8'):
+        buf = self.acquire(shape, dtype)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+    def trim(self):
+        """Free every idle buffer."""
+        with self._lock:
+            if self._held:
+                self._free.clear()
+                self._held = 0
+                self.trims += 1
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._held = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "held_bytes": self._held,
+                "idle_buffers": sum(len(v) for v in self._free.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "trims": self.trims,
+            }
+
+
+pool = BufferPool()
+
+
+def init_buffer_pool(app):
+    """Size the process's pool from app.config and register it on `app`."""
+    pool.max_bytes = app.config['BUFFER_POOL_MAX_BYTES']
+    app.extensions['buffer_pool'] = pool
+    return pool
+
@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+
+# Thread pools of the native libraries; BLAS is pinned to one thread, as its
+# only use here is small SVDs while requests parallelise through the budget
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def available_cores():
+    """Cores this process may run on (its CPU affinity where the OS reports it)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ComputeBudget:
+    """
+    Shares `cores` between the image requests in flight.
+
+    Each request may use cores // active threads: run_in_stripes sizes its
+    pool from `threads()`, the SciPy FFTs take it as `workers`, and
+    OpenCV's thread pool is resized whenever the number of requests
+    changes, so concurrent requests together stay within the cores instead
+    of each assuming it owns all of them.
+    """
+
+    def __init__(self, cores):
+        self.cores = max(1, int(cores))
+        self._lock = threading.Lock()
+        self._active = 0
+        self._peak = 0
+        self._opencv_threads = None
+        self._mark = (time.monotonic(), time.process_time())
+
+    def threads(self):
+        """Threads the calling request may use now."""
+        return max(1, self.cores // max(1, self._active))
+
+    def _apply(self):
+        # Only touch OpenCV once something has imported it, to keep startup lazy
+        threads = self.threads()
+        cv2 = sys.modules.get('cv2')
+        if cv2 is not None and threads != self._opencv_threads:
+            cv2.setNumThreads(threads)
+            self._opencv_threads = threads
+
+    def enter(self):
+        with self._lock:
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+            self._apply()
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+            self._apply()
+            idle = not self._active
+        # Scratch buffers pooled for overlapping requests are not kept between them
+        buffer_pool = sys.modules.get('app.services.buffer_pool')
+        if idle and buffer_pool is not None:
+            buffer_pool.pool.trim()
+
+    def stats(self):
+        """Effective settings, and CPU use since the previous call."""
+        now, cpu = time.monotonic(), time.process_time()
+        with self._lock:
+            (then, cpu_then), self._mark = self._mark, (now, cpu)
+            cv2 = sys.modules.get('cv2')
+            stats = {
+                'cores': self.cores,
+                'active_requests': self._active,
+                'peak_requests': self._peak,
+                'threads_per_request': self.threads(),
+                'opencv_threads': cv2.getNumThreads() if cv2 is not None else None,
+                'fft_workers': self.threads(),
+                'blas_threads': {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES},
+                # Share of the cores this process kept busy
+                'cpu_utilisation': round((cpu - cpu_then) / max(now - then, 1e-9) / self.cores, 3),
+            }
+        if hasattr(os, 'getloadavg'):
+            # Runnable threads per core over the last minute; above 1 the machine is oversubscribed
+            stats['load_per_core'] = round(os.getloadavg()[0] / self.cores, 3)
+        return stats
+
+
+# Every core until init_compute_budget applies the app's COMPUTE_THREADS
+budget = ComputeBudget(available_cores())
+
+
+def init_compute_budget(app):
+    """Size the shared budget from app.config and track the image requests of `app`."""
+    from flask import g, request
+    from app.services.admission import request_operation
+
+    budget.cores = max(1, int(app.config['COMPUTE_THREADS'] or available_cores()))
+    for name in BLAS_THREAD_VARIABLES:
+        # Read when NumPy loads its BLAS, which create_app has not done yet
+        os.environ.setdefault(name, '1')
+    app.extensions['compute_budget'] = budget
+
+    @app.before_request
+    def enter_budget():
+        if request_operation(request.endpoint) is not None:
+            budget.enter()
+            g.compute_budget = True
+
+    @app.teardown_request
+    def leave_budget(exc=None):
+        if g.pop('compute_budget', False):
+            budget.leave()
+
+    return budget
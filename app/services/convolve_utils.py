@@ -0,0 +1,144 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from scipy import fft as sfft
+from app.services.parallel import default_workers
+
+MAX_KERNEL_SIZE = 255
+# Relative singular value below which a rank-1 term is treated as noise
+SVD_TOLERANCE = 1e-6
+# Rough per-pixel costs in multiply-adds, for comparison with k*k (direct)
+# and rank*(kh+kw) (separable); see benchmarks/bench_convolve.py. Each
+# separable term also pays for a float intermediate and accumulation.
+FFT_COST = 300
+SEPARABLE_TERM_OVERHEAD = 16
+ANALYSIS_CACHE_SIZE = 256
+
+_analysis_cache = OrderedDict()
+_analysis_lock = threading.Lock()
+
+
+class KernelAnalysis:
+    def __init__(self, kernel, terms, digest):
+        self.kernel = kernel
+        self.terms = terms
+        self.rank = len(terms)
+        self.digest = digest
+
+    def costs(self):
+        kh, kw = self.kernel.shape
+        return {
+            'direct': kh * kw,
+            'separable': self.rank * (kh + kw + SEPARABLE_TERM_OVERHEAD),
+            'fft': FFT_COST,
+        }
+
+    def best_method(self):
+        costs = self.costs()
+        return min(costs, key=costs.get)
+
+
+def _validate_kernel(kernel):
+    kernel = np.asarray(kernel, dtype=np.float32)
+    if kernel.ndim != 2 or kernel.size == 0:
+        raise ValueError("Kernel must be a non-empty 2-D array")
+    if max(kernel.shape) > MAX_KERNEL_SIZE:
+        raise ValueError(f"Kernel is too large (max {MAX_KERNEL_SIZE}x{MAX_KERNEL_SIZE})")
+    if not np.all(np.isfinite(kernel)):
+        raise ValueError("Kernel values must be finite")
+    return kernel
+
+
+def analyze_kernel(kernel):
+    """
+    Split a kernel into rank-1 (column x row) terms via SVD.
+
+    Results are cached by a hash of the kernel's shape and values, so a
+    kernel that is reused across requests is only decomposed once.
+    """
+    kernel = _validate_kernel(kernel)
+    digest = hashlib.sha1(repr(kernel.shape).encode() + kernel.tobytes()).hexdigest()
+
+    with _analysis_lock:
+        analysis = _analysis_cache.get(digest)
+        if analysis is not None:
+            _analysis_cache.move_to_end(digest)
+            return analysis
+
+    u, s, vt = np.linalg.svd(kernel.astype(np.float64))
+    terms = []
+    if s[0] > 0:
+        for i in range(len(s)):
+            if s[i] <= s[0] * SVD_TOLERANCE:
+                break
+            scale = np.sqrt(s[i])
+            terms.append(((u[:, i] * scale).astype(np.float32), (vt[i] * scale).astype(np.float32)))
+    analysis = KernelAnalysis(kernel, terms, digest)
+
+    with _analysis_lock:
+        _analysis_cache[digest] = analysis
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+
+def _separable_correlate(image, terms):
+    result = None
+    for column, row in terms:
+        part = cv2.sepFilter2D(image, cv2.CV_32F, row, column)
+        if result is None:
+            result = part
+        else:
+            result += part
+    if result is None:
+        result = np.zeros(image.shape, np.float32)
+    return result
+
+
+def fft_correlate(image, kernel):
+    """Correlate like cv2.filter2D (BORDER_REFLECT_101) through one batched real FFT."""
+    kh, kw = kernel.shape
+    rows, cols = image.shape[:2]
+    top, left = kh // 2, kw // 2
+    padded = cv2.copyMakeBorder(image, top, kh - 1 - top, left, kw - 1 - left, cv2.BORDER_REFLECT_101)
+    size = (sfft.next_fast_len(padded.shape[0], real=True), sfft.next_fast_len(padded.shape[1], real=True))
+
+    kernel_spectrum = sfft.rfft2(kernel[::-1, ::-1], s=size)
+    if padded.ndim == 3:
+        kernel_spectrum = kernel_spectrum[:, :, None]
+    workers = default_workers()
+    spectrum = sfft.rfft2(padded.astype(np.float32), s=size, axes=(0, 1), workers=workers)
+    spectrum *= kernel_spectrum
+    result = sfft.irfft2(spectrum, s=size, axes=(0, 1), workers=workers)
+    # Circular wrap-around only lands in the first kh-1 rows / kw-1 columns
+    return result[kh - 1:kh - 1 + rows, kw - 1:kw - 1 + cols]
+
+
+def convolve(image, kernel, method='auto'):
+    """
+    Apply a custom kernel with cv2.filter2D semantics (correlation, reflected
+    borders, saturated to the input depth).
+
+    'direct' is cv2.filter2D, 'separable' runs the kernel's SVD terms as
+    1-D passes, 'fft' correlates in the frequency domain. 'auto' picks the
+    cheapest for the kernel's size and rank. `kernel` may also be the
+    KernelAnalysis of one.
+    """
+    analysis = kernel if isinstance(kernel, KernelAnalysis) else analyze_kernel(kernel)
+    if method == 'auto':
+        method = analysis.best_method()
+
+    if method == 'direct':
+        return cv2.filter2D(image, -1, analysis.kernel)
+    if method == 'separable':
+        result = _separable_correlate(image, analysis.terms)
+    elif method == 'fft':
+        result = fft_correlate(image, analysis.kernel)
+    else:
+        raise ValueError(f"Unsupported convolution method: {method}")
+
+    if image.dtype == np.uint8:
+        result = np.clip(np.rint(result), 0, 255).astype(np.uint8)
+    return result
@@ -0,0 +1,189 @@
+import cv2
+import numpy as np
+from app.services.parallel import run_in_stripes
+from app.services.filters import apply_guided_filter
+
+DENOISERS = ('nlm', 'wavelet', 'guided')
+TIERS = ('fast', 'balanced', 'quality')
+
+# Non-local means: (template window, search window, h per unit of noise sigma).
+# Cost grows with search ** 2; tuned by PSNR in benchmarks/bench_denoise.py.
+NLM_TIERS = {
+    'fast': (5, 11, 1.0),
+    'balanced': (5, 15, 0.9),
+    'quality': (7, 21, 0.8),
+}
+# Haar wavelet shrinkage: (levels, cycle-spin shifts per axis)
+WAVELET_TIERS = {
+    'fast': (3, 1),
+    'balanced': (4, 2),
+    'quality': (4, 4),
+}
+# Self-guided filter: (radius, subsample, eps per unit of (sigma / 255) ** 2)
+GUIDED_TIERS = {
+    'fast': (4, 4, 4.0),
+    'balanced': (4, 2, 4.0),
+    'quality': (3, 1, 12.0),
+}
+
+
+def estimate_noise_sigma(image):
+    """
+    Per-channel Gaussian noise level on the 0-255 scale from the median
+    absolute value of the finest diagonal Haar coefficients (Donoho's MAD
+    estimator), taking the median over channels.
+    """
+    rows, cols = image.shape[0] & ~1, image.shape[1] & ~1
+    g = image[:rows, :cols].astype(np.float32)
+    diagonal = (g[0::2, 0::2] - g[0::2, 1::2] - g[1::2, 0::2] + g[1::2, 1::2]) * 0.5
+    per_channel = np.median(np.abs(diagonal).reshape(diagonal.shape[0] * diagonal.shape[1], -1), axis=0)
+    return float(np.median(per_channel) / 0.6745)
+
+
+def _haar_split(x):
+    # One orthonormal Haar level over axes 0 and 1: (approximation, details)
+    s = np.float32(0.5 ** 0.5)
+    lo = (x[0::2] + x[1::2]) * s
+    hi = (x[0::2] - x[1::2]) * s
+    return (lo[:, 0::2] + lo[:, 1::2]) * s, ((lo[:, 0::2] - lo[:, 1::2]) * s,
+                                             (hi[:, 0::2] + hi[:, 1::2]) * s,
+                                             (hi[:, 0::2] - hi[:, 1::2]) * s)
+
+
+def _haar_merge(approx, details):
+    lh, hl, hh = details
+    s = np.float32(0.5 ** 0.5)
+    rows, cols = approx.shape[:2]
+    lo = np.empty((rows, 2 * cols) + approx.shape[2:], np.float32)
+    hi = np.empty_like(lo)
+    lo[:, 0::2], lo[:, 1::2] = (approx + lh) * s, (approx - lh) * s
+    hi[:, 0::2], hi[:, 1::2] = (hl + hh) * s, (hl - hh) * s
+    out = np.empty((2 * rows,) + lo.shape[1:], np.float32)
+    out[0::2], out[1::2] = (lo + hi) * s, (lo - hi) * s
+    return out
+
+
+def _padded(image, levels, margin=0):
+    # Reflect-pad to a multiple of 2 ** levels so every level splits evenly;
+    # a `margin` leaves that many rows and columns of slack on each side
+    # for shifted windows
+    block = 2 ** levels
+    rows, cols = image.shape[:2]
+    return cv2.copyMakeBorder(image, margin, 2 * margin + (-rows % block), margin, 2 * margin + (-cols % block),
+                              cv2.BORDER_REFLECT_101).astype(np.float32)
+
+
+def wavelet_thresholds(image, sigma, levels=4):
+    """
+    BayesShrink soft thresholds sigma^2 / sigma_signal for every detail
+    subband and channel, as a list of (lh, hl, hh) per level. Bands that
+    look like pure noise would get an unbounded threshold, so each one is
+    capped at the universal threshold sigma * sqrt(2 ln n). Computed once
+    for the whole frame so that tiles all shrink by the same amounts.
+    """
+    thresholds = []
+    approx = _padded(image, levels)
+    for _ in range(levels):
+        approx, bands = _haar_split(approx)
+        universal = sigma * np.sqrt(2 * np.log(approx.shape[0] * approx.shape[1]))
+        level = []
+        for band in bands:
+            signal = np.sqrt(np.maximum((band * band).mean(axis=(0, 1)) - sigma ** 2, 1e-6))
+            level.append(np.minimum(sigma ** 2 / signal, universal).astype(np.float32))
+        thresholds.append(tuple(level))
+    return thresholds
+
+
+def _soft(band, threshold):
+    return np.sign(band) * np.maximum(np.abs(band) - threshold, 0)
+
+
+def _wavelet_shrink(x, thresholds):
+    details = []
+    approx = x
+    for level in thresholds:
+        approx, bands = _haar_split(approx)
+        details.append(tuple(_soft(b, t) for b, t in zip(bands, level)))
+    for bands in reversed(details):
+        approx = _haar_merge(approx, bands)
+    return approx
+
+
+def wavelet_denoise(image, thresholds, shifts=2):
+    """
+    Haar wavelet soft-thresholding averaged over shifts x shifts shifted
+    windows ("cycle spinning"), which removes the blocking a single
+    decimated Haar transform leaves behind. `thresholds` come from
+    wavelet_thresholds.
+    """
+    rows, cols = image.shape[:2]
+    block = 2 ** len(thresholds)
+    data = _padded(image, len(thresholds), block)
+    height, width = data.shape[0] - 2 * block, data.shape[1] - 2 * block
+    total = np.zeros((rows, cols) + image.shape[2:], np.float32)
+    for dy in range(shifts):
+        for dx in range(shifts):
+            sy, sx = dy * block // shifts, dx * block // shifts
+            window = data[block - sy:block - sy + height, block - sx:block - sx + width]
+            total += _wavelet_shrink(window, thresholds)[sy:sy + rows, sx:sx + cols]
+    total *= 1.0 / (shifts * shifts)
+    return np.clip(np.rint(total), 0, 255).astype(np.uint8)
+
+
+def _nlm(image, sigma, tier):
+    template, search, k = NLM_TIERS[tier]
+    h = max(k * sigma, 1.0)
+    if image.ndim == 2:
+        return cv2.fastNlMeansDenoising(image, None, h, template, search)
+    return cv2.fastNlMeansDenoisingColored(image, None, h, h, template, search)
+
+
+def denoiser_halo(method, tier):
+    """
+    (halo, align) for tiling a denoiser: rows of context it reads above and
+    below each output row, and the row grid its stripes must start on.
+    """
+    if method == 'nlm':
+        template, search, _ = NLM_TIERS[tier]
+        return search // 2 + template // 2, 1
+    if method == 'wavelet':
+        block = 2 ** WAVELET_TIERS[tier][0]
+        return 2 * block, block
+    radius, subsample, _ = GUIDED_TIERS[tier]
+    return 2 * (radius + 1) * subsample, subsample
+
+
+def denoise(image, method='nlm', tier='balanced', sigma=None, workers=None):
+    """
+    Remove Gaussian-like noise with non-local means, wavelet shrinkage or a
+    fast self-guided filter at a 'fast', 'balanced' or 'quality' tier.
+
+    The noise level (and for wavelets the subband thresholds) is estimated
+    once for the whole frame unless `sigma` (0-255 scale) is given, then
+    the frame is denoised in overlapping row stripes across a thread pool.
+    """
+    if method not in DENOISERS:
+        raise ValueError(f"Unsupported denoiser: {method}")
+    if tier not in TIERS:
+        raise ValueError(f"Unsupported tier: {tier}")
+    sigma = estimate_noise_sigma(image) if sigma is None else float(sigma)
+    if sigma <= 0:
+        return image.copy()
+
+    if method == 'nlm':
+        def func(block):
+            return _nlm(block, sigma, tier)
+    elif method == 'wavelet':
+        levels, shifts = WAVELET_TIERS[tier]
+        thresholds = wavelet_thresholds(image, sigma, levels)
+
+        def func(block):
+            return wavelet_denoise(block, thresholds, shifts)
+    else:
+        radius, subsample, k = GUIDED_TIERS[tier]
+        eps = k * (sigma / 255.0) ** 2
+
+        def func(block):
+            return apply_guided_filter(block, radius * subsample, eps, subsample)
+    halo, align = denoiser_halo(method, tier)
+    return run_in_stripes(func, image, halo, workers, align)
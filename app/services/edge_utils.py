@@ -0,0 +1,69 @@
+from contextlib import ExitStack, contextmanager
+import cv2
+import numpy as np
+from app.services.buffer_pool import pool
+
+
+@contextmanager
+def grayscale(image):
+    """Yield a grayscale view of `image`, converting into a pooled buffer if needed."""
+    if image.ndim == 2:
+        yield image
+        return
+    with pool.borrow(image.shape[:2], np.uint8) as gray:
+        cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray)
+        yield gray
+
+
+def _normalized(src, out):
+    # Min-max stretch straight into the uint8 output
+    if out is None:
+        out = np.empty(src.shape, np.uint8)
+    cv2.normalize(src, out, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+    return out
+
+
+def _gradient_magnitude(image, dx_op, direction, out):
+    with ExitStack() as stack:
+        gray = stack.enter_context(grayscale(image))
+        if direction in ('x', 'y'):
+            grad = stack.enter_context(pool.borrow(gray.shape, np.float32))
+            dx_op(gray, int(direction == 'x'), int(direction == 'y'), grad)
+            return _normalized(grad, out)
+        gx = stack.enter_context(pool.borrow(gray.shape, np.float32))
+        gy = stack.enter_context(pool.borrow(gray.shape, np.float32))
+        dx_op(gray, 1, 0, gx)
+        dx_op(gray, 0, 1, gy)
+        cv2.magnitude(gx, gy, gx)
+        return _normalized(gx, out)
+
+
+def sobel_edges(image, direction='both', kernel_size=3, out=None):
+    """
+    Sobel edge map as a single-channel uint8 frame.
+    Derivatives run in float32 into pooled scratch buffers, and the
+    magnitude comes from cv2.magnitude; `out` may be a reusable uint8 buffer.
+    """
+    def dx_op(gray, dx, dy, dst):
+        cv2.Sobel(gray, cv2.CV_32F, dx, dy, dst=dst, ksize=kernel_size)
+    return _gradient_magnitude(image, dx_op, direction, out)
+
+
+def scharr_edges(image, direction='both', out=None):
+    """Scharr (rotation-accurate 3x3) edge map, same layout as sobel_edges."""
+    def dx_op(gray, dx, dy, dst):
+        cv2.Scharr(gray, cv2.CV_32F, dx, dy, dst=dst)
+    return _gradient_magnitude(image, dx_op, direction, out)
+
+
+def laplace_edges(image, kernel_size=3, out=None):
+    with grayscale(image) as gray, pool.borrow(gray.shape, np.float32) as lap:
+        cv2.Laplacian(gray, cv2.CV_32F, dst=lap, ksize=kernel_size)
+        return _normalized(lap, out)
+
+
+def canny_edges(image, low=100, high=200, aperture=3, l2_gradient=True, out=None):
+    with grayscale(image) as gray:
+        if out is None:
+            return cv2.Canny(gray, low, high, apertureSize=aperture, L2gradient=l2_gradient)
+        return cv2.Canny(gray, low, high, out, apertureSize=aperture, L2gradient=l2_gradient)
@@ -0,0 +1,88 @@
+import fnmatch
+import os
+import zipfile
+
+# Formats that are already compressed: stored as-is instead of re-deflated
+STORED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+CHUNK_SIZE = 1 << 20
+
+
+class _Sink:
+    """Write-only stream that holds what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def compress_type(name):
+    ext = name.rsplit('.', 1)[-1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Generate a ZIP archive piece by piece.
+
+    `entries` yields (arcname, source) pairs, where source is a file path or
+    a callable returning the bytes or an iterator of chunks (e.g.
+    Storage.stream). A callable returning None, as Storage.stream does for
+    a name deleted since it was resolved, leaves the entry out. Files are
+    copied chunk_size bytes at a time and every piece is yielded as soon as
+    it is written, so memory stays constant however many files go in and
+    nothing touches the disk. The output is not seekable, so sizes and CRCs
+    follow each entry in a data descriptor.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for arcname, source in entries:
+            if callable(source):
+                data = source()
+                if data is None:
+                    continue
+                info = zipfile.ZipInfo(arcname)
+                info.compress_type = compress_type(arcname)
+                if isinstance(data, (bytes, bytearray)):
+                    archive.writestr(info, data)
+                else:
+                    # The size is not known up front, so always allow ZIP64
+                    with archive.open(info, 'w', force_zip64=True) as dest:
+                        for chunk in data:
+                            dest.write(chunk)
+                            piece = sink.drain()
+                            if piece:
+                                yield piece
+            else:
+                # from_file records the size up front, which switches on
+                # ZIP64 for files over 2 GB
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = compress_type(arcname)
+                with open(source, 'rb') as src, archive.open(info, 'w') as dest:
+                    for chunk in iter(lambda: src.read(chunk_size), b''):
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def match_files(folder, pattern):
+    """Names of the files in `folder` matching a glob pattern, sorted."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder)
+                  if fnmatch.fnmatchcase(name, pattern) and os.path.isfile(os.path.join(folder, name)))
@@ -1,4 +1,13 @@
+import cv2
 import numpy as np
+from scipy import fft as sfft
+from app.services.parallel import default_workers
+
+COLOR_MODES = ('rgb', 'luma', 'gray')
+# BGR weights of the luminance plane (BT.601, as in COLOR_BGR2GRAY / YCrCb)
+LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299], np.float32)
+
+
 def apply_fft(image):
     f = np.fft.fft2(image)
     fshift = np.fft.fftshift(f)
@@ -16,3 +25,144 @@ def magnitude_spectrum(fshift):
     mg = 20*np.log(np.abs(fshift)+1)
     return mg
 
+
+
+def spectrum_planes(image, color_mode='rgb'):
+    """
+    Float32 planes to transform: every channel for 'rgb', the luminance
+    plane for 'luma' and 'gray' (they differ only in how the result is put
+    back together). Single-channel images are used as they are.
+    """
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"Unsupported color mode: {color_mode}")
+    if image.ndim == 2 or color_mode == 'rgb':
+        return image.astype(np.float32)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+
+def forward_spectrum(image, color_mode='rgb', workers=None):
+    """
+    Centred complex64 spectrum of the planes picked by `color_mode`. All
+    channels go through one batched transform over axes (0, 1) on
+    `workers` threads (by default the request's share of the compute
+    budget), so a colour spectrum has shape (rows, cols, C) and a mask of
+    shape (rows, cols) applies to every channel via [:, :, None].
+    """
+    planes = spectrum_planes(image, color_mode)
+    spectrum = sfft.fft2(planes, axes=(0, 1), workers=workers or default_workers(), overwrite_x=True)
+    return sfft.fftshift(spectrum, axes=(0, 1))
+
+
+def planes_to_image(planes, image, color_mode='rgb', keep_levels=True):
+    """
+    Real filtered planes back to uint8 in the layout of `image`. With
+    keep_levels values are rounded and clipped, which is right whenever
+    the DC term survived; otherwise they are min-max stretched over all
+    channels. 'luma' puts the new luminance back under the original
+    chroma, 'gray' returns gray replicated to BGR.
+    """
+    if keep_levels:
+        result = np.clip(np.rint(planes), 0, 255).astype(np.uint8)
+    else:
+        result = cv2.normalize(planes, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+    if image.ndim == 2 or result.ndim == 3:
+        return result
+    if color_mode == 'luma':
+        ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+        ycrcb[:, :, 0] = result
+        return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
+    return cv2.cvtColor(result, cv2.COLOR_GRAY2BGR)
+
+
+def inverse_spectrum(fshift, image, color_mode='rgb', keep_levels=True, workers=None):
+    """
+    Invert a (filtered) forward_spectrum back to uint8 in the layout of
+    `image` (see planes_to_image); without keep_levels the magnitude of
+    the result is stretched.
+    """
+    planes = sfft.ifft2(sfft.ifftshift(fshift, axes=(0, 1)), axes=(0, 1), workers=workers or default_workers(),
+                        overwrite_x=True)
+    return planes_to_image(planes.real if keep_levels else np.abs(planes), image, color_mode, keep_levels)
+
+
+def luminance_spectrum(fshift):
+    """Spectrum of the luminance plane; for colour spectra it is a weighted sum of the channels (no extra FFT)."""
+    if fshift.ndim == 2:
+        return fshift
+    return np.tensordot(fshift, LUMA_WEIGHTS.astype(fshift.real.dtype), axes=([2], [0]))
+
+
+def spectrum_image(fshift):
+    """Log-magnitude spectrum stretched to uint8 for display, one plane per channel."""
+    return cv2.normalize(log_magnitude(fshift), None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+
+
+def smooth_spectrum(image):
+    """
+    Centred spectrum of the smooth component of `image` in Moisan's
+    periodic + smooth decomposition. The smooth part carries the jump
+    between opposite borders that otherwise shows up as a bright cross
+    through the spectrum centre; subtracting this from apply_fft(image)
+    leaves the periodic component. Only the border rows and columns enter
+    it, so it costs two 1-D FFTs plus a broadcast.
+    """
+    rows, cols = image.shape
+    a = np.fft.fft(image[-1, :].astype(np.float64) - image[0, :])
+    b = np.fft.fft(image[:, -1].astype(np.float64) - image[:, 0])
+    q = 2 * np.pi * np.arange(rows) / rows
+    r = 2 * np.pi * np.arange(cols) / cols
+    boundary = a[None, :] * (1 - np.exp(1j * q))[:, None] + b[:, None] * (1 - np.exp(1j * r))[None, :]
+    denominator = 2 * np.cos(q)[:, None] + 2 * np.cos(r)[None, :] - 4
+    denominator[0, 0] = 1
+    boundary /= denominator
+    boundary[0, 0] = 0
+    return np.fft.fftshift(boundary)
+
+
+def log_magnitude(fshift):
+    """log(1 + |F|) as float32, the scale peak detection works on."""
+    mag = np.abs(fshift).astype(np.float32)
+    np.log1p(mag, out=mag)
+    return mag
+
+
+def _median_1d(values, window):
+    half = window // 2
+    padded = np.pad(values, half, mode='reflect')
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, window), axis=1)
+
+
+def find_spectral_peaks(log_mag, max_peaks=8, threshold=2.5, min_radius=8, window=15):
+    """
+    Locate off-centre spikes in a centred log-magnitude spectrum, best
+    taken of the periodic component (see smooth_spectrum).
+
+    A pixel is a peak when it is the maximum of its 5x5 neighbourhood and
+    rises more than `threshold` (in log units) above the local median of a
+    `window`-sized neighbourhood. The central row and column collect the
+    energy of axis-aligned structure, so they are compared against a 1-D
+    median along themselves instead. Frequencies closer than `min_radius` to the centre
+    are ignored and only one point of each conjugate pair is returned.
+    Returns up to `max_peaks` (x, y) pixel positions, strongest first.
+    """
+    rows, cols = log_mag.shape
+    crow, ccol = rows // 2, cols // 2
+    window = max(3, int(window) | 1)
+    lo, hi = float(log_mag.min()), float(log_mag.max())
+    if hi <= lo:
+        return []
+    # medianBlur only takes large windows on 8-bit input
+    step = (hi - lo) / 255
+    quantized = cv2.convertScaleAbs(log_mag, alpha=1 / step, beta=-lo / step)
+    background = cv2.medianBlur(quantized, window).astype(np.float32)
+    background[crow, :] = _median_1d(quantized[crow, :], window)
+    background[:, ccol] = _median_1d(quantized[:, ccol], window)
+    score = (quantized - background) * step
+
+    local_max = log_mag >= cv2.dilate(log_mag, np.ones((5, 5), np.uint8))
+    ys, xs = np.nonzero(local_max & (score > threshold))
+    keep = ((ys - crow) ** 2 + (xs - ccol) ** 2 >= min_radius ** 2) & \
+        ((ys < crow) | ((ys == crow) & (xs > ccol)))
+    ys, xs = ys[keep], xs[keep]
+    order = np.argsort(-score[ys, xs], kind='stable')[:max_peaks]
+    return [(int(xs[i]), int(ys[i])) for i in order]
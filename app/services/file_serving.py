@@ -0,0 +1,96 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from flask import current_app, send_file
+
+# save_processed_image names every output uniquely and never rewrites it,
+# so those files can be cached forever; anything else (uploads, fft_*
+# visualizations) may be overwritten under the same name and is revalidated.
+WRITE_ONCE = re.compile(r'^processed_\d{8}_\d{6}_[0-9a-f]{8}\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ETAG_CACHE_SIZE = 4096
+
+_etags = OrderedDict()
+_lock = threading.Lock()
+
+
+def data_etag(data):
+    """Content hash of a bytes-like object, used as a strong ETag."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_etag(path):
+    """
+    Content-hash ETag of a file. Hashes are remembered per path and reused
+    while the file's size and modification time are unchanged.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _etags.get(path)
+        if cached is not None and cached[0] == version:
+            _etags.move_to_end(path)
+            return cached[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()
+
+    with _lock:
+        _etags[path] = (version, etag)
+        _etags.move_to_end(path)
+        while len(_etags) > ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+
+def _cache_policy(response, immutable, max_age=None):
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    elif max_age:
+        # Reused without asking for max_age seconds, then revalidated by ETag
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        # Cache, but check the ETag with the server before every reuse
+        response.cache_control.no_cache = True
+    return response
+
+
+def send_stored_file(path, download_name, as_attachment=True, max_age=None):
+    """
+    Serve a stored file with a content-hash ETag and Last-Modified.
+    Write-once outputs are cached as immutable; with `max_age` other files
+    may be reused for that many seconds before they are revalidated.
+
+    send_file answers If-None-Match / If-Modified-Since with 304 and Range
+    requests with 206, and streams through wsgi.file_wrapper, or hands the
+    transfer to the front-end server with X-Sendfile when USE_X_SENDFILE
+    is set.
+    """
+    response = send_file(path, as_attachment=as_attachment, download_name=download_name,
+                         etag=file_etag(path), conditional=True)
+    return _cache_policy(response, bool(WRITE_ONCE.match(os.path.basename(path))), max_age)
+
+
+def send_stored_bytes(data, download_name, mimetype, etag=None, as_attachment=True):
+    """Serve in-memory bytes (e.g. a database blob) with the same caching rules."""
+    response = send_file(BytesIO(data), mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag or data_etag(data), conditional=True)
+    return _cache_policy(response, False)
+
+
+def not_modified(etag):
+    """A bare 304 for a revalidation that matched before the body was loaded."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return _cache_policy(response, False)
@@ -1,72 +1,140 @@
 import cv2
 import numpy as np
-from scipy import fftpack
-from app.services.fft_utils import apply_fft, apply_ifft, magnitude_spectrum
+from app.services.fft_utils import (
+    forward_spectrum, inverse_spectrum, luminance_spectrum, smooth_spectrum, log_magnitude, find_spectral_peaks
+)
+from app.services.median_utils import median_filter
+from app.services.blur_utils import gaussian_blur, gaussian_sigma, box_blur
+from app.services.convolve_utils import convolve
+from app.services.edge_utils import grayscale, sobel_edges, scharr_edges, laplace_edges, canny_edges
+from app.services.morphology_utils import apply_morphology, structuring_element, morphology_reach
+from app.services.buffer_pool import pool
+from app.services.lut_utils import apply_lut, load_preset
 
 
-def apply_sobel_filter(image, direction='both', kernel_size=3):
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
+def _edge_output(edges, image, output):
+    # Edge maps are single channel; only expand to BGR for colour input when asked
+    if output == 'gray' or len(image.shape) == 2:
+        return edges
+    return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
 
-    if direction == 'x':
-        filtered = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=kernel_size)
-    elif direction == 'y':
-        filtered = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=kernel_size)
-    else:  
-        sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=kernel_size)
-        sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=kernel_size)
-        filtered = np.sqrt(sobelx**2 + sobely**2)
+def apply_sobel_filter(image, direction='both', kernel_size=3, output='bgr'):
+    return _edge_output(sobel_edges(image, direction, kernel_size), image, output)
 
+def apply_scharr_filter(image, direction='both', output='bgr'):
+    return _edge_output(scharr_edges(image, direction), image, output)
+
+def apply_laplace_filter(image, kernel_size=3, output='bgr'):
+    return _edge_output(laplace_edges(image, kernel_size), image, output)
+
+def apply_canny_filter(image, low=100, high=200, aperture=3, output='bgr'):
+    return _edge_output(canny_edges(image, low, high, aperture), image, output)
+
+def apply_gaussian_filter(image, kernel_size=5, sigma=0, method='auto'):
+    return gaussian_blur(image, kernel_size, sigma, method)
+
+def apply_mean_filter(image, kernel_size=5, method='auto'):
+    return box_blur(image, kernel_size, method)
+
+def apply_median_filter(image, kernel_size=5, kernel_height=None, weights=None, center_weight=1):
+    return median_filter(image, kernel_size, kernel_height, weights, center_weight)
+
+# Above this diameter the exact bilateral filter (cost ~ d^2 per pixel)
+# is swapped for the guided filter when mode='auto'
+FAST_BILATERAL_MIN_D = 15
 
-    filtered = cv2.normalize(filtered, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    
-    if len(image.shape) == 3:
-        filtered = cv2.cvtColor(filtered, cv2.COLOR_GRAY2BGR)
-    
-    return filtered
 
-def apply_laplace_filter(image, kernel_size=3):   
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+def bilateral_radius(d, sigma_space):
+    # Same rule cv2.bilateralFilter uses to size its window
+    if d <= 0:
+        return max(int(round(sigma_space * 1.5)), 1)
+    return max(d // 2, 1)
+
+
+def apply_guided_filter(image, radius, eps, subsample=None):
+    """
+    Edge-preserving smoothing with a self-guided filter (He et al.).
+
+    Every step is a box filter, so the cost per pixel is independent of
+    `radius`. `eps` is the edge threshold as a variance on the 0-1 scale.
+    Coefficients are computed at 1/`subsample` resolution and upsampled
+    (the "fast guided filter"), which by default scales with the radius.
+    """
+    if subsample is None:
+        subsample = max(radius // 4, 1)
+    guide = image.astype(np.float32)
+    guide *= 1.0 / 255.0
+
+    if subsample > 1:
+        rows, cols = image.shape[:2]
+        small = cv2.resize(guide, (max(cols // subsample, 1), max(rows // subsample, 1)),
+                           interpolation=cv2.INTER_AREA)
+        r = max(radius // subsample, 1)
     else:
-        gray = image.copy()
-        
-    filtered = cv2.Laplacian(gray, cv2.CV_64F, ksize=kernel_size)
-    filtered = cv2.normalize(filtered, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    if len(image.shape) == 3:
-        filtered = cv2.cvtColor(filtered, cv2.COLOR_GRAY2BGR)
-    
-    return filtered
+        small = guide
+        r = radius
+
+    ksize = (2 * r + 1, 2 * r + 1)
+    mean_i = cv2.blur(small, ksize)
+    var_i = cv2.blur(small * small, ksize)
+    var_i -= mean_i * mean_i
+    a = var_i / (var_i + eps)
+    b = mean_i - a * mean_i
+    mean_a = cv2.blur(a, ksize)
+    mean_b = cv2.blur(b, ksize)
 
-def apply_gaussian_filter(image, kernel_size=5, sigma=0):
-    return cv2.GaussianBlur(image, (kernel_size, kernel_size), sigma)
+    if subsample > 1:
+        rows, cols = image.shape[:2]
+        mean_a = cv2.resize(mean_a, (cols, rows), interpolation=cv2.INTER_LINEAR)
+        mean_b = cv2.resize(mean_b, (cols, rows), interpolation=cv2.INTER_LINEAR)
 
-def apply_mean_filter(image, kernel_size=5):
-    return cv2.blur(image, (kernel_size, kernel_size))
+    guide *= mean_a
+    guide += mean_b
+    guide *= 255.0
+    return np.clip(guide, 0, 255, out=guide).round().astype(np.uint8)
 
-def apply_median_filter(image, kernel_size=5):
-    return cv2.medianBlur(image, kernel_size)
 
-def apply_bilateral_filter(image, d=9, sigma_color=75, sigma_space=75):
-    return cv2.bilateralFilter(image, d, sigma_color, sigma_space)
+def apply_bilateral_filter(image, d=9, sigma_color=75, sigma_space=75, mode='auto'):
+    """
+    mode='exact' runs cv2.bilateralFilter, mode='fast' runs the guided
+    filter over the same radius with eps from sigma_color, and 'auto'
+    switches to 'fast' once the diameter reaches FAST_BILATERAL_MIN_D.
+    """
+    radius = bilateral_radius(d, sigma_space)
+    if mode == 'auto':
+        mode = 'fast' if 2 * radius + 1 >= FAST_BILATERAL_MIN_D else 'exact'
+    if mode == 'exact':
+        return cv2.bilateralFilter(image, d, sigma_color, sigma_space)
+    if mode == 'fast':
+        return apply_guided_filter(image, radius, (sigma_color / 255.0) ** 2)
+    raise ValueError(f"Unsupported bilateral mode: {mode}")
+
+def sharpen_kernel(kernel_size=3, strength=1.0):
+    # -1 everywhere and k*k in the centre: for k=3 the classic
+    # [[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]] kernel
+    kernel = -np.ones((kernel_size, kernel_size), np.float32)
+    kernel[kernel_size // 2, kernel_size // 2] = kernel_size * kernel_size
+    return kernel * strength
 
 def apply_sharpen_filter(image, kernel_size=3, strength=1.0):
-    kernel = np.array([[-1, -1, -1],
-                      [-1,  9, -1],
-                      [-1, -1, -1]]) * strength
-    
-    return cv2.filter2D(image, -1, kernel)
+    if kernel_size < 3 or kernel_size % 2 == 0:
+        raise ValueError("Sharpen kernel_size must be an odd number >= 3")
+    return convolve(image, sharpen_kernel(kernel_size, strength))
 
-def apply_emboss_filter(image, direction='north'):
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-        
+def normalize_kernel(kernel):
+    kernel = np.asarray(kernel, np.float32)
+    total = kernel.sum()
+    if total == 0:
+        raise ValueError("Cannot normalize a kernel that sums to zero")
+    return kernel / total
+
+def apply_custom_kernel(image, kernel, normalize=False, method='auto'):
+    """`kernel` is a 2-D array, or the KernelAnalysis of one (already normalized)."""
+    if normalize:
+        kernel = normalize_kernel(kernel)
+    return convolve(image, kernel, method)
+
+def apply_emboss_filter(image, direction='north', output='bgr'):
     kernels = {
         'north': np.array([[-1, -1, -1],
                           [ 0,  0,  0],
@@ -84,161 +152,247 @@ def apply_emboss_filter(image, direction='north'):
 
     
     kernel = kernels.get(direction.lower(), kernels['north'])
-    filtered = cv2.filter2D(gray, -1, kernel)
-    
-    filtered = cv2.normalize(filtered, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    if len(image.shape) == 3:
-        filtered = cv2.cvtColor(filtered, cv2.COLOR_GRAY2BGR)
-    
-    return filtered
+    with grayscale(image) as gray:
+        filtered = convolve(gray, kernel)
+    cv2.normalize(filtered, filtered, 0, 255, cv2.NORM_MINMAX)
+    return _edge_output(filtered, image, output)
 
-def apply_notch_filter(image, points=None):
-    
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    
-    
-    fshift = apply_fft(gray)
-    
-    rows, cols = gray.shape
-    crow, ccol = rows//2, cols//2
-    
-    mask = np.ones((rows, cols), np.float32)
-    
-    if points:
-        
-        for x, y in points:
-            
-            x_coord = int(ccol + (x * ccol))
-            y_coord = int(crow - (y * crow))  
-            
-            r = 5  
-            y_coords, x_coords = np.ogrid[:rows, :cols]
-            dist_from_point = np.sqrt((x_coords - x_coord)**2 + (y_coords - y_coord)**2)
-            mask[dist_from_point < r] = 0
-            
-            x_sym = int(ccol - (x * ccol))
-            y_sym = int(crow + (y * crow))
-            dist_from_symmetric = np.sqrt((x_coords - x_sym)**2 + (y_coords - y_sym)**2)
-            mask[dist_from_symmetric < r] = 0
-    else:
-        
-        r = 5
-        y_coords, x_coords = np.ogrid[:rows, :cols]
-        dist_from_center = np.sqrt((x_coords - ccol)**2 + (y_coords - crow)**2)
-        mask[dist_from_center < r] = 0
-    
-    fshift = fshift * mask
-    
-    f_ishift = apply_ifft(fshift)
-    img_back = apply_ifft(f_ishift)
-    img_back = np.abs(img_back)
-    
-    img_back = cv2.normalize(img_back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
+def _zero_disc(mask, cx, cy, r):
+    # Zero the pixels strictly within r of (cx, cy), touching only its bounding window
+    rows, cols = mask.shape
+    y0, y1 = max(cy - r + 1, 0), min(cy + r, rows)
+    x0, x1 = max(cx - r + 1, 0), min(cx + r, cols)
+    if y0 >= y1 or x0 >= x1:
+        return
+    y, x = np.ogrid[y0:y1, x0:x1]
+    mask[y0:y1, x0:x1][(x - cx) ** 2 + (y - cy) ** 2 < r * r] = 0
 
-    if len(image.shape) == 3:
-        img_back = cv2.cvtColor(img_back, cv2.COLOR_GRAY2BGR)
-    
-    return img_back
+def notch_mask(shape, points=None, radius=5, out=None):
+    """
+    Float32 mask for a centred spectrum with a disc of `radius` zeroed at
+    each (x, y) pixel position and at its conjugate-symmetric twin. With
+    points=None only the centre (DC) is notched.
+    """
+    rows, cols = shape
+    crow, ccol = rows // 2, cols // 2
+    if out is None:
+        out = np.empty((rows, cols), np.float32)
+    out.fill(1)
+    if points is None:
+        _zero_disc(out, ccol, crow, radius)
+    for x, y in points or ():
+        _zero_disc(out, x, y, radius)
+        _zero_disc(out, 2 * ccol - x, 2 * crow - y, radius)
+    return out
 
-def apply_band_reject_filter(image, cutoff_freq=30, width=10):
-    
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
-    
-    
-    fshift = apply_fft(gray)
-    
-    rows, cols = gray.shape
+def _masked_inverse(image, fshift, mask, color_mode):
+    # One (rows, cols) mask shared by every channel. With the DC term kept
+    # the result is a filtered image and keeps its levels; without it only
+    # the min-max stretched magnitude is meaningful.
+    rows, cols = mask.shape
+    fshift *= mask if fshift.ndim == 2 else mask[:, :, None]
+    return inverse_spectrum(fshift, image, color_mode, keep_levels=bool(mask[rows // 2, cols // 2]))
+
+def apply_notch_filter(image, points=None, radius=5, color_mode='rgb'):
+    """
+    Notch filter at `points` given as (x, y) offsets from the spectrum
+    centre in [-1, 1]. color_mode picks the planes filtered: 'rgb' (every
+    channel, one batched FFT), 'luma' (YCrCb luminance only) or 'gray'.
+    """
+    fshift = forward_spectrum(image, color_mode)
+    
+    rows, cols = image.shape[:2]
     crow, ccol = rows//2, cols//2
+    # No points notches the centre, as before
+    pixels = [(int(ccol + (x * ccol)), int(crow - (y * crow))) for x, y in points] if points else None
     
-    mask = np.ones((rows, cols), np.float32)
-    r = cutoff_freq
-    w = width
-    
+    with pool.borrow((rows, cols), np.float32) as mask:
+        return _masked_inverse(image, fshift, notch_mask((rows, cols), pixels, radius, out=mask), color_mode)
 
-    y, x = np.ogrid[:rows, :cols]
-    center = [crow, ccol]
-    
-    dist_from_center = np.sqrt((x - center[1])**2 + (y - center[0])**2)
-    mask = np.ones_like(dist_from_center)
-    mask[dist_from_center < r - w/2] = 0
-    mask[dist_from_center > r + w/2] = 0
-    
-    fshift = fshift * mask
-    
-    f_ishift = apply_ifft(fshift)
-    img_back = apply_ifft(f_ishift)
-    img_back = np.abs(img_back)
-    
-    img_back = cv2.normalize(img_back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    if len(image.shape) == 3:
-        img_back = cv2.cvtColor(img_back, cv2.COLOR_GRAY2BGR)
-    
-    return img_back
+def band_reject_mask(shape, cutoff_freq, width, out=None):
+    """
+    Float32 ring mask for a centred spectrum: 1 where the distance from the
+    centre lies within cutoff_freq +/- width/2, 0 elsewhere. Squared
+    distances come from two broadcast 1-D terms, so no float64 grid is built.
+    """
+    rows, cols = shape
+    if out is None:
+        out = np.empty((rows, cols), np.float32)
+    dy = (np.arange(rows, dtype=np.float32) - rows // 2) ** 2
+    dx = (np.arange(cols, dtype=np.float32) - cols // 2) ** 2
+    np.add(dy[:, None], dx[None, :], out=out)
+    inner = max(cutoff_freq - width / 2, 0) ** 2
+    outer = (cutoff_freq + width / 2) ** 2
+    np.copyto(out, (out >= inner) & (out <= outer), casting='unsafe')
+    return out
 
-def remove_periodic_noise(image, frequency=20, bandwidth=5):
-    
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image.copy()
+def apply_band_reject_filter(image, cutoff_freq=30, width=10, color_mode='rgb'):
+    fshift = forward_spectrum(image, color_mode)
     
-    # Apply FFT
-    fshift = apply_fft(gray)
-    
-    # Get magnitude spectrum for visualization
-    magnitude_spectrum = magnitude_spectrum(fshift)
-    magnitude_spectrum_norm = cv2.normalize(magnitude_spectrum, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    # Get image dimensions and center
+    shape = image.shape[:2]
+    with pool.borrow(shape, np.float32) as mask:
+        return _masked_inverse(image, fshift, band_reject_mask(shape, cutoff_freq, width, out=mask), color_mode)
+
+def remove_periodic_noise(image, max_peaks=8, threshold=2.0, radius=2, min_radius=8, color_mode='rgb'):
+    """
+    Automatic notch filter. Off-centre spikes are detected on the
+    log-magnitude of the image's periodic component (the spectrum minus
+    its border-jump part, see smooth_spectrum) and notched out of the full
+    spectrum, so only one forward FFT is taken; for colour spectra the
+    luminance spectrum used for detection is a weighted sum of channels.
+    Detected spikes are sharp, so the notches default to a smaller radius
+    than the manual filter's. Returns the filtered image and the notched
+    points in the same normalized (x, y) convention apply_notch_filter
+    accepts.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    fshift = forward_spectrum(image, color_mode)
+    periodic = luminance_spectrum(fshift) - smooth_spectrum(gray)
+    peaks = find_spectral_peaks(log_magnitude(periodic), max_peaks, threshold, min_radius)
+
     rows, cols = gray.shape
-    crow, ccol = rows//2, cols//2
-    
-    # Create mask for periodic noise
-    mask = np.ones((rows, cols), np.float32)
-    y, x = np.ogrid[:rows, :cols]
-    
-    # Convert frequency to pixel distance in frequency domain
-    # The higher the frequency, the further from center in FFT
-    freq_radius = (frequency * min(rows, cols)) / 100  # Convert frequency to radius
-    
-    # Create circular masks at the noise frequency locations
-    # We look in horizontal and vertical directions from the center
-    for angle in [0, 90, 180, 270]:  # Look in all four directions
-        angle_rad = np.deg2rad(angle)
-        center_x = int(ccol + freq_radius * np.cos(angle_rad))
-        center_y = int(crow + freq_radius * np.sin(angle_rad))
-        
-        # Calculate distance from this point
-        dist = np.sqrt((x - center_x)**2 + (y - center_y)**2)
-        # Create smooth transition in the mask using Gaussian
-        mask_component = 1 - np.exp(-(dist**2)/(2 * bandwidth**2))
-        mask = mask * mask_component
-    
-    # Ensure mask values are in [0, 1]
-    mask = np.clip(mask, 0, 1)
-    
-    # Apply mask to FFT
-    fshift_filtered = fshift * mask
-    
-    # Inverse FFT
-    f_ishift = apply_ifft(fshift_filtered)
-    img_back = apply_ifft(f_ishift)
-    img_back = np.abs(img_back)
-    
-    # Normalize and convert back to uint8
-    img_back = cv2.normalize(img_back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    
-    # Convert back to color if input was color
-    if len(image.shape) == 3:
-        img_back = cv2.cvtColor(img_back, cv2.COLOR_GRAY2BGR)
-    
-    return img_back, magnitude_spectrum_norm  
+    crow, ccol = rows // 2, cols // 2
+    points = [{"x": (x - ccol) / ccol, "y": (crow - y) / crow} for x, y in peaks]
+    with pool.borrow((rows, cols), np.float32) as mask:
+        filtered = _masked_inverse(image, fshift, notch_mask((rows, cols), peaks, radius, out=mask), color_mode)
+    return filtered, points
+
+
+def apply_filter(image, filter_type, params):
+    """Run a filter by name with the params dict sent to /filters/apply."""
+    if filter_type == 'sobel':
+        return apply_sobel_filter(
+            image,
+            params.get('direction', 'both'),
+            int(params.get('kernel_size', 3)),
+            params.get('output', 'bgr')
+        )
+    elif filter_type == 'scharr':
+        return apply_scharr_filter(
+            image,
+            params.get('direction', 'both'),
+            params.get('output', 'bgr')
+        )
+    elif filter_type == 'laplace':
+        return apply_laplace_filter(
+            image,
+            int(params.get('kernel_size', 3)),
+            params.get('output', 'bgr')
+        )
+    elif filter_type == 'canny':
+        return apply_canny_filter(
+            image,
+            float(params.get('low', 100)),
+            float(params.get('high', 200)),
+            int(params.get('kernel_size', 3)),
+            params.get('output', 'bgr')
+        )
+    elif filter_type == 'gaussian':
+        return apply_gaussian_filter(
+            image,
+            int(params.get('kernel_size', 5)),
+            float(params.get('sigma', 0)),
+            params.get('method', 'auto')
+        )
+    elif filter_type == 'mean':
+        return apply_mean_filter(
+            image,
+            int(params.get('kernel_size', 5)),
+            params.get('method', 'auto')
+        )
+    elif filter_type == 'median':
+        return apply_median_filter(
+            image,
+            int(params.get('kernel_size', 5)),
+            params.get('kernel_height'),
+            params.get('weights'),
+            int(params.get('center_weight', 1))
+        )
+    elif filter_type == 'bilateral':
+        return apply_bilateral_filter(
+            image,
+            int(params.get('d', 9)),
+            float(params.get('sigma_color', 75)),
+            float(params.get('sigma_space', 75)),
+            params.get('mode', 'auto')
+        )
+    elif filter_type == 'sharpen':
+        return apply_sharpen_filter(
+            image,
+            int(params.get('kernel_size', 3)),
+            float(params.get('strength', 1.0))
+        )
+    elif filter_type == 'emboss':
+        return apply_emboss_filter(
+            image,
+            params.get('direction', 'north'),
+            params.get('output', 'bgr')
+        )
+    elif filter_type == 'convolve':
+        return apply_custom_kernel(
+            image,
+            params.get('kernel'),
+            bool(params.get('normalize', False)),
+            params.get('method', 'auto')
+        )
+    elif filter_type == 'morphology':
+        return apply_morphology(
+            image,
+            params.get('operation', 'erode'),
+            params.get('shape', 'rect'),
+            int(params.get('width', params.get('kernel_size', 3))),
+            params.get('height'),
+            float(params.get('angle', 0)),
+            params.get('method', 'auto')
+        )
+    elif filter_type == 'lut':
+        return apply_lut(
+            image,
+            load_preset(params.get('preset')),
+            params.get('method', 'baked'),
+            float(params.get('strength', 1.0))
+        )
+    raise ValueError("Invalid filter type")
+
+
+def filter_halo(filter_type, params):
+    """
+    Number of pixels a filter reads beyond each output pixel.
+    Cropped (region-of-interest) runs pad their crop by this much so the
+    result inside the region matches a full-frame run.
+    """
+    if filter_type in ('sobel', 'laplace', 'sharpen'):
+        return int(params.get('kernel_size', 3)) // 2
+    if filter_type == 'median':
+        if params.get('weights') is not None:
+            return max(np.shape(params['weights'])) // 2
+        return max(int(params.get('kernel_size', 5)), int(params.get('kernel_height') or 0)) // 2
+    if filter_type == 'gaussian':
+        kernel_size, sigma = gaussian_sigma(int(params.get('kernel_size', 5)), float(params.get('sigma', 0)))
+        # The recursive and FFT backends do not truncate the Gaussian at the kernel
+        return max(kernel_size // 2, int(np.ceil(3 * sigma)))
+    if filter_type == 'mean':
+        return int(params.get('kernel_size', 5)) // 2
+    if filter_type == 'bilateral':
+        radius = bilateral_radius(int(params.get('d', 9)), float(params.get('sigma_space', 75)))
+        # The guided filter's box passes run twice, so its reach is doubled
+        return 2 * radius
+    if filter_type in ('emboss', 'scharr'):
+        return 1
+    if filter_type == 'canny':
+        # Gradient aperture plus non-maximum suppression; hysteresis can
+        # follow an edge further, so cropped runs are an approximation
+        return int(params.get('kernel_size', 3)) // 2 + 2
+    if filter_type == 'convolve':
+        return max(np.shape(params.get('kernel'))) // 2
+    if filter_type == 'morphology':
+        element = structuring_element(
+            params.get('shape', 'rect'),
+            int(params.get('width', params.get('kernel_size', 3))),
+            params.get('height'),
+            float(params.get('angle', 0))
+        )
+        return morphology_reach(params.get('operation', 'erode'), element)
+    if filter_type == 'lut':
+        return 0
+    raise ValueError("Invalid filter type")
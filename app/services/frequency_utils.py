@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import fft as sfft
+from app.services.buffer_pool import pool
+from app.services.parallel import default_workers
+from app.services.shared_store import get_store
+from app.services.fft_utils import spectrum_planes, planes_to_image
+
+FILTER_TYPES = ('ideal', 'butterworth', 'gaussian')
+BANDS = ('lowpass', 'highpass', 'bandpass', 'bandreject')
+# Spectra of recently filtered images, so a cutoff sweep skips the forward FFT
+SPECTRUM_CACHE_BYTES = 256 * 1024 * 1024
+TRANSFER_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class _ByteLRU:
+    # Least-recently-used mapping bounded by the total nbytes of its values
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._held = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items or value.nbytes > self.max_bytes:
+                return value
+            self._items[key] = value
+            self._held += value.nbytes
+            while self._held > self.max_bytes:
+                self._held -= self._items.popitem(last=False)[1].nbytes
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._held = 0
+
+
+_spectra = _ByteLRU(SPECTRUM_CACHE_BYTES)
+_transfers = _ByteLRU(TRANSFER_CACHE_BYTES)
+
+
+def _squared_distance(shape):
+    # Squared distance from DC for the unshifted rfft2 grid, in the same
+    # units as the centred spectrum used elsewhere (index offsets)
+    rows, cols = shape
+    u = sfft.fftfreq(rows, 1 / rows).astype(np.float32) ** 2
+    v = sfft.rfftfreq(cols, 1 / cols).astype(np.float32) ** 2
+    d2 = np.empty((rows, v.size), np.float32)
+    np.add(u[:, None], v[None, :], out=d2)
+    return d2
+
+
+def _lowpass(d2, filter_type, cutoff, order):
+    if filter_type == 'ideal':
+        return (d2 <= cutoff ** 2).astype(np.float32)
+    if filter_type == 'butterworth':
+        return 1 / (1 + (d2 / cutoff ** 2) ** order)
+    return np.exp(d2 / (-2 * cutoff ** 2))
+
+
+def _bandreject(d2, filter_type, cutoff, width, order):
+    if filter_type == 'ideal':
+        inner = max(cutoff - width / 2, 0) ** 2
+        outer = (cutoff + width / 2) ** 2
+        return ((d2 < inner) | (d2 > outer)).astype(np.float32)
+    # Gonzalez & Woods band forms; they are 0 on the ring d = cutoff
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.sqrt(d2) * width / (d2 - cutoff ** 2)
+        if filter_type == 'butterworth':
+            result = 1 / (1 + ratio ** (2 * order))
+        else:
+            result = 1 - np.exp(-(1 / ratio) ** 2)
+    return np.nan_to_num(result, nan=0.0).astype(np.float32)
+
+
+def transfer_function(shape, filter_type='gaussian', band='lowpass', cutoff=30, width=10, order=2):
+    """
+    H(u, v) on the rfft2 grid of a (rows, cols) image, as a read-only
+    float32 array of shape (rows, cols // 2 + 1). `cutoff` and `width` are
+    distances from the spectrum centre in frequency samples; `order` only
+    applies to Butterworth. Cached by (shape, type, band, params).
+    """
+    if filter_type not in FILTER_TYPES:
+        raise ValueError(f"Unsupported frequency filter: {filter_type}")
+    if band not in BANDS:
+        raise ValueError(f"Unsupported band: {band}")
+    cutoff, width, order = float(cutoff), float(width), int(order)
+    if cutoff <= 0 or width <= 0 or order < 1:
+        raise ValueError("cutoff and width must be positive and order at least 1")
+    key = (tuple(shape[:2]), filter_type, band, cutoff, width if band in ('bandpass', 'bandreject') else None,
+           order if filter_type == 'butterworth' else None)
+    transfer = _transfers.get(key)
+    if transfer is not None:
+        return transfer
+
+    d2 = _squared_distance(shape[:2])
+    if band in ('lowpass', 'highpass'):
+        transfer = _lowpass(d2, filter_type, cutoff, order)
+    else:
+        transfer = _bandreject(d2, filter_type, cutoff, width, order)
+    if band in ('highpass', 'bandpass'):
+        np.subtract(1, transfer, out=transfer)
+    transfer = transfer.astype(np.float32, copy=False)
+    transfer.flags.writeable = False
+    _transfers.put(key, transfer)
+    return transfer
+
+
+def image_spectrum(image, color_mode='rgb', workers=None):
+    """
+    rfft2 over axes (0, 1) of the planes picked by `color_mode`, complex64
+    and read-only. Cached by image content, so repeated filtering of the
+    same upload reuses one forward transform; with the shared store
+    enabled the cache is shared by every worker process.
+    """
+    # Hash the uint8 input in place rather than the float planes
+    digest = hashlib.blake2b(np.ascontiguousarray(image), digest_size=16).hexdigest()
+    key = ('spectrum', digest, image.shape, color_mode if image.ndim == 3 else None)
+    store = get_store()
+    cache = store if store is not None else _spectra
+    spectrum = cache.get(key)
+    if spectrum is None:
+        planes = spectrum_planes(image, color_mode)
+        spectrum = sfft.rfft2(planes, axes=(0, 1), workers=workers or default_workers(), overwrite_x=True)
+        spectrum.flags.writeable = False
+        spectrum = cache.put(key, spectrum)
+    return spectrum
+
+
+def frequency_filter(image, filter_type='gaussian', band='lowpass', cutoff=30, width=10, order=2,
+                     color_mode='rgb', workers=None):
+    """
+    Ideal, Butterworth or Gaussian low-, high-, band-pass or band-reject
+    filtering in the frequency domain. With the spectrum and transfer
+    function cached, each call is one multiply and one inverse real FFT.
+    Filters that remove DC (high- and band-pass) return the result min-max
+    stretched.
+    """
+    transfer = transfer_function(image.shape, filter_type, band, cutoff, width, order)
+    spectrum = image_spectrum(image, color_mode, workers)
+    rows, cols = image.shape[:2]
+    with pool.borrow(spectrum.shape, spectrum.dtype) as product:
+        np.multiply(spectrum, transfer if spectrum.ndim == 2 else transfer[:, :, None], out=product)
+        planes = sfft.irfft2(product, s=(rows, cols), axes=(0, 1), workers=workers or default_workers(),
+                             overwrite_x=True)
+    return planes_to_image(planes, image, color_mode, keep_levels=bool(transfer[0, 0] > 0))
@@ -0,0 +1,91 @@
+import threading
+import cv2
+import numpy as np
+
+EQUALIZE_METHODS = ('clahe', 'global')
+# gray equalizes intensity; lab and ycrcb equalize only lightness / luma
+# and keep the chroma of colour images
+EQUALIZE_MODES = ('gray', 'lab', 'ycrcb')
+# CLAHE objects kept per thread (they are not safe to share across threads)
+CLAHE_CACHE_SIZE = 8
+
+_local = threading.local()
+
+_CONVERSIONS = {
+    'lab': (cv2.COLOR_BGR2LAB, cv2.COLOR_LAB2BGR),
+    'ycrcb': (cv2.COLOR_BGR2YCrCb, cv2.COLOR_YCrCb2BGR),
+}
+
+
+def clahe(clip_limit=2.0, tile_size=8):
+    """This thread's cv2.CLAHE for (clip_limit, tile_size), created on first use."""
+    clip_limit, tile_size = float(clip_limit), int(tile_size)
+    if clip_limit <= 0:
+        raise ValueError("clip_limit must be positive")
+    if not 1 <= tile_size <= 64:
+        raise ValueError("tile_size must be between 1 and 64")
+    cache = getattr(_local, 'clahe', None)
+    if cache is None:
+        cache = _local.clahe = {}
+    key = (clip_limit, tile_size)
+    engine = cache.get(key)
+    if engine is None:
+        if len(cache) >= CLAHE_CACHE_SIZE:
+            cache.clear()
+        engine = cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
+    return engine
+
+
+def equalization_lut(channel):
+    """
+    Global histogram-equalization table for a uint8 channel, built from its
+    histogram the same way cv2.equalizeHist does.
+    """
+    hist = cv2.calcHist([channel], [0], None, [256], [0, 256]).ravel()
+    first = int(np.flatnonzero(hist)[0])
+    total = channel.size
+    if hist[first] == total:
+        return np.full(256, first, np.uint8)
+    cdf = np.cumsum(hist)
+    cdf -= hist[first]
+    lut = np.rint(cdf * (255.0 / (total - hist[first])))
+    lut[:first] = 0
+    return np.clip(lut, 0, 255).astype(np.uint8)
+
+
+def _equalize_channel(channel, method, clip_limit, tile_size):
+    if method == 'clahe':
+        return clahe(clip_limit, tile_size).apply(channel)
+    return cv2.LUT(channel, equalization_lut(channel))
+
+
+def working_channel(image, color_mode='gray'):
+    """The single channel a color_mode equalizes: intensity, LAB L or YCrCb Y."""
+    if image.ndim == 2:
+        return image
+    if color_mode == 'gray':
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.extractChannel(cv2.cvtColor(image, _CONVERSIONS[color_mode][0]), 0)
+
+
+def equalize(image, method='clahe', color_mode='gray', clip_limit=2.0, tile_size=8):
+    """
+    Contrast-limited adaptive (CLAHE) or global histogram equalization.
+
+    'gray' equalizes the intensity and returns a single-channel image;
+    'lab' and 'ycrcb' equalize only the L or Y channel of a colour image
+    and convert back, leaving its colours alone. Grayscale input is
+    equalized directly in any mode.
+    """
+    if method not in EQUALIZE_METHODS:
+        raise ValueError(f"Unsupported equalization method: {method}")
+    if color_mode not in EQUALIZE_MODES:
+        raise ValueError(f"Unsupported equalization mode: {color_mode}")
+    if image.ndim == 2 or color_mode == 'gray':
+        return _equalize_channel(working_channel(image), method, clip_limit, tile_size)
+
+    to_mode, from_mode = _CONVERSIONS[color_mode]
+    converted = cv2.cvtColor(image, to_mode)
+    luma = _equalize_channel(cv2.extractChannel(converted, 0), method, clip_limit, tile_size)
+    cv2.insertChannel(luma, converted, 0)
+    return cv2.cvtColor(converted, from_mode, dst=converted)
@@ -1,77 +1,163 @@
+import hashlib
 import cv2
 import numpy as np
 from flask import request, current_app
+from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 import uuid
 from app.models.db import db
 from app.models.image_log import ImageLog
+from app.services.buffer_pool import pool
+from app.services.shared_store import get_store
+from app.services.storage import get_storage
 
-def get_image_from_request(request):
+# Decode flags per downscale factor: (colour, grayscale). libjpeg scales
+# JPEGs by 1/2, 1/4 or 1/8 while decoding; other formats are decoded in
+# full and then resized.
+DECODE_FLAGS = {
+    1: (cv2.IMREAD_COLOR, cv2.IMREAD_GRAYSCALE),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_size(data):
+    """(width, height) from a PNG or JPEG header without decoding, else None."""
+    data = memoryview(data)
+    if bytes(data[:8]) == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if bytes(data[:2]) != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+        elif marker in _JPEG_SOF:
+            return int.from_bytes(data[i + 7:i + 9], 'big'), int.from_bytes(data[i + 5:i + 7], 'big')
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+        else:
+            i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def reduction_factor(size, max_dimension):
+    """
+    Largest decode downscale (1, 2, 4 or 8) that keeps the longer side of
+    an image of `size` (width, height) at or above max_dimension.
+    """
+    if size is None or not max_dimension:
+        return 1
+    longest = max(size)
+    for factor in (8, 4, 2):
+        if longest // factor >= max_dimension:
+            return factor
+    return 1
+
+
+def decode_image(data, max_dimension=None, grayscale=False):
+    """
+    Decode encoded image bytes, as BGR or grayscale.
+
+    With max_dimension the image is decoded at 1/2, 1/4 or 1/8 scale
+    where its longer side stays at least that long, which is far cheaper
+    for JPEGs. Returns (image, factor); image is None if undecodable.
+    """
+    factor = reduction_factor(image_size(data), max_dimension)
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), DECODE_FLAGS[factor][bool(grayscale)])
+    return image, factor
+
+
+def read_image(path, max_dimension=None, grayscale=False):
+    """
+    decode_image for a file on disk; (None, 1) if it cannot be read. With
+    the shared store enabled, decodes are shared between worker processes
+    by file content and come back read-only.
+    """
+    try:
+        data = np.fromfile(path, np.uint8)
+    except OSError:
+        return None, 1
+    store = get_store()
+    if store is None:
+        return decode_image(data, max_dimension, grayscale)
+
+    factor = reduction_factor(image_size(data), max_dimension)
+    key = ('decoded', hashlib.blake2b(data, digest_size=16).hexdigest(), factor, bool(grayscale))
+    image = store.get(key)
+    if image is None:
+        image, factor = decode_image(data, max_dimension, grayscale)
+        if image is not None:
+            image = store.put(key, image)
+    return image, factor
+
+
+def get_image_from_request(request, max_dimension=None, grayscale=False):
     if 'file' not in request.files:
         return None
     file = request.files['file']
     if file.filename == '':
         return None
     
-    nparr = np.frombuffer(file.read(), np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    data = file.read()
+    image, factor = decode_image(data, max_dimension, grayscale)
     
-    if image is not None:
-        # Save the uploaded image first
-        upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-        os.makedirs(upload_folder, exist_ok=True)
-        filepath = os.path.join(upload_folder, file.filename)
-        cv2.imwrite(filepath, image)
+    # Save the uploaded image first, as uploaded, under the name /upload/ would give it
+    filename = secure_filename(file.filename)
+    if image is not None and filename:
+        get_storage().put(filename, data)
     
     return image
 
-def save_processed_image(image):
+def save_processed_image(image, single_channel=False):
     """
     Save a processed image with a unique filename.
+    Grayscale images are expanded to BGR unless single_channel is set,
+    in which case they are encoded as 1-channel PNGs.
     Returns the filename of the saved image.
     """
-    # Use the same static folder for all images
-    upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-    
     # Generate a unique filename using timestamp and UUID
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     unique_id = str(uuid.uuid4())[:8]
     filename = f"processed_{timestamp}_{unique_id}.png"
     
-    filepath = os.path.join(upload_folder, filename)
-    
     # Ensure the image is in the correct format for saving
     if isinstance(image, np.ndarray):
-        if len(image.shape) == 2:  # Grayscale image
-            # Convert to 3-channel grayscale if needed
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-        
-        success = cv2.imwrite(filepath, image)
+        if len(image.shape) == 2 and not single_channel:  # Grayscale image
+            # Convert to 3-channel grayscale in a pooled buffer, only needed until encoded
+            with pool.borrow(image.shape + (3,), image.dtype) as bgr:
+                cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=bgr)
+                success, encoded = cv2.imencode('.png', bgr)
+        else:
+            success, encoded = cv2.imencode('.png', image)
         if not success:
-            current_app.logger.error(f"Failed to save image to {filepath}")
-            raise IOError(f"Failed to save image to {filepath}")
-            
+            current_app.logger.error(f"Failed to encode {filename}")
+            raise IOError(f"Failed to save image to {filename}")
+
+        get_storage().put(filename, encoded)
         return filename
     else:
         raise ValueError("Invalid image format: image must be a numpy array")
 
 def load_image(filename):
-    # Get the full path to the uploads directory
-    upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    filepath = os.path.join(upload_folder, filename)
-    
-    if os.path.exists(filepath):
-        return cv2.imread(filepath)
+    # A local copy: the file itself, or one fetched from the object store
+    with get_storage().local_path(filename) as filepath:
+        if filepath is not None:
+            return read_image(filepath)[0]
     return None
 
 def save_image(image, filename):
-    # Use the same static folder for all images
-    upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-    filepath = os.path.join(upload_folder, filename)
-    cv2.imwrite(filepath, image)
+    success, encoded = cv2.imencode(os.path.splitext(filename)[1] or '.png', image)
+    if not success:
+        raise IOError(f"Failed to save image to {filename}")
+    get_storage().put(filename, encoded)
     
     # Update the existing log entry
     existing_log = ImageLog.query.filter_by(filename=filename).first()
@@ -0,0 +1,128 @@
+import cv2
+import numpy as np
+from app.services.filters import apply_filter, filter_halo
+from app.services.adjustments import apply_adjustments
+
+
+def _shape_points(spec):
+    """Outline of a rectangle, ellipse or polygon mask spec as an (N, 2) int32 array."""
+    mask_type = spec.get('type')
+    if mask_type == 'rectangle':
+        x, y = float(spec['x']), float(spec['y'])
+        w, h = float(spec['width']), float(spec['height'])
+        # Corners are inclusive pixel centres, so a w x h rectangle covers w x h pixels
+        points = [(x, y), (x + w - 1, y), (x + w - 1, y + h - 1), (x, y + h - 1)]
+    elif mask_type == 'ellipse':
+        cx, cy = spec['center']
+        ax, ay = spec['axes']
+        points = cv2.ellipse2Poly(
+            (int(round(cx)), int(round(cy))),
+            (max(int(round(ax)), 1), max(int(round(ay)), 1)),
+            int(spec.get('angle', 0)), 0, 360, 2
+        )
+    elif mask_type == 'polygon':
+        points = spec.get('points', [])
+        if len(points) < 3:
+            raise ValueError("Polygon mask needs at least 3 points")
+        points = [(float(p['x']), float(p['y'])) if isinstance(p, dict) else p for p in points]
+    else:
+        raise ValueError(f"Unsupported mask type: {mask_type}")
+    return np.round(np.asarray(points, dtype=np.float64)).astype(np.int32)
+
+
+def _clip_box(x0, y0, x1, y1, shape):
+    rows, cols = shape[:2]
+    return max(x0, 0), max(y0, 0), min(x1, cols), min(y1, rows)
+
+
+def rasterize_mask(image_shape, spec, bitmap=None):
+    """
+    Rasterize a mask spec into an alpha matte covering only its bounding box.
+
+    Returns (alpha, box) where alpha is float32 in [0, 1] and box is
+    (x0, y0, x1, y1) in image coordinates, or (None, None) when the mask
+    does not cover any pixel. Feathering is a Gaussian of sigma `feather`
+    pixels, so the box is grown by 3 sigma to hold the soft edge.
+    """
+    feather = float(spec.get('feather', 0) or 0)
+    pad = int(np.ceil(3 * feather)) if feather > 0 else 0
+
+    if spec.get('type') == 'bitmap':
+        if bitmap is None:
+            raise ValueError("Bitmap mask requires a mask image")
+        rows, cols = image_shape[:2]
+        if bitmap.ndim == 3:
+            bitmap = cv2.cvtColor(bitmap, cv2.COLOR_BGR2GRAY)
+        if bitmap.shape[:2] != (rows, cols):
+            bitmap = cv2.resize(bitmap, (cols, rows), interpolation=cv2.INTER_LINEAR)
+        x, y, w, h = cv2.boundingRect(bitmap)
+        if w == 0 or h == 0:
+            return None, None
+        x0, y0, x1, y1 = _clip_box(x - pad, y - pad, x + w + pad, y + h + pad, image_shape)
+        canvas = bitmap[y0:y1, x0:x1]
+    else:
+        points = _shape_points(spec)
+        x, y, w, h = cv2.boundingRect(points)
+        x0, y0, x1, y1 = _clip_box(x - pad, y - pad, x + w + pad, y + h + pad, image_shape)
+        if x1 <= x0 or y1 <= y0:
+            return None, None
+        canvas = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        cv2.fillPoly(canvas, [points - np.array([x0, y0], np.int32)], 255, cv2.LINE_AA)
+
+    alpha = canvas.astype(np.float32)
+    alpha *= 1.0 / 255.0
+    if feather > 0:
+        # The box already carries a zero margin of 3 sigma, so replicating the
+        # border only matters where the mask touches the frame edge.
+        alpha = cv2.GaussianBlur(alpha, (0, 0), feather, borderType=cv2.BORDER_REPLICATE)
+    return alpha, (x0, y0, x1, y1)
+
+
+def resolve_operation(operation, params):
+    """
+    Map an operation name to (callable, halo).
+    Any /filters type is accepted, plus 'adjust' for brightness/contrast/saturation.
+    """
+    if operation == 'adjust':
+        def run(region):
+            return apply_adjustments(
+                region,
+                float(params.get('brightness', 0)),
+                float(params.get('contrast', 0)),
+                float(params.get('saturation', 0))
+            )
+        return run, 0
+
+    halo = filter_halo(operation, params)
+
+    def run(region):
+        return apply_filter(region, operation, params)
+    return run, halo
+
+
+def apply_masked_operation(image, alpha, box, operation, halo=0):
+    """
+    Apply `operation` only under the mask and alpha-blend it into a copy of `image`.
+
+    The operation runs on the mask's bounding box grown by `halo` pixels
+    (clamped to the frame), so its cost scales with the masked region.
+    """
+    result = image.copy()
+    if alpha is None:
+        return result
+
+    x0, y0, x1, y1 = box
+    hx0, hy0, hx1, hy1 = _clip_box(x0 - halo, y0 - halo, x1 + halo, y1 + halo, image.shape)
+
+    processed = operation(image[hy0:hy1, hx0:hx1])
+    processed = processed[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+
+    region = image[y0:y1, x0:x1]
+    if processed.ndim == 2 and region.ndim == 3:
+        processed = cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR)
+    if processed.dtype != region.dtype:
+        processed = np.clip(processed, 0, 255).astype(region.dtype)
+
+    # Single fused pass: dst = processed * alpha + region * (1 - alpha)
+    result[y0:y1, x0:x1] = cv2.blendLinear(processed, region, alpha, 1.0 - alpha)
+    return result
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+from app.services.parallel import run_in_stripes
+
+# cv2.medianBlur handles 3x3 and 5x5 with sorting networks for any depth.
+# Beyond that it only accepts 8-bit images, where it switches to its
+# histogram-based O(1) path (Perreault & Hebert).
+SMALL_KERNEL_MAX = 5
+
+
+def _rank_median(image, ksize=None, weights=None, center_weight=1):
+    """
+    Median by threshold decomposition.
+
+    For every grey level t, a box (or weighted) count of pixels <= t tells
+    each output pixel how much of its window lies at or below t. The median
+    is the first t where that count reaches half the window, i.e. the number
+    of levels where it does not. Each level is one O(1)-per-pixel box filter,
+    so the cost does not depend on the window size, and windows may be
+    rectangular or carry weights. A `center_weight` counts the centre pixel
+    that many times (centre-weighted median) and stays O(1); a full
+    `weights` array goes through filter2D and costs more for big windows.
+    """
+    if image.dtype != np.uint8:
+        raise ValueError("Rank median filter requires an 8-bit image")
+
+    if weights is None:
+        kw, kh = ksize
+        extra = center_weight - 1
+        need = (kw * kh + extra) // 2 + 1
+
+        def count(below):
+            counts = cv2.boxFilter(below, cv2.CV_32F, (kw, kh), normalize=False,
+                                   borderType=cv2.BORDER_REPLICATE)
+            if extra:
+                counts += extra * below
+            return counts
+    else:
+        total = float(weights.sum())
+        need = total / 2 - 1e-6 * total
+
+        def count(below):
+            return cv2.filter2D(below, cv2.CV_32F, weights, borderType=cv2.BORDER_REPLICATE)
+
+    lo, hi = int(image.min()), int(image.max())
+    result = np.full(image.shape, lo, np.uint8)
+    for t in range(lo, hi):
+        # bool -> uint8 view: a 0/1 mask without another copy
+        counts = count(np.less_equal(image, t).view(np.uint8))
+        np.add(result, counts < need, out=result, casting='unsafe')
+    return result
+
+
+def median_filter(image, kernel_size=5, kernel_height=None, weights=None,
+                  center_weight=1, workers=None):
+    """
+    Median filter that picks its algorithm from the window.
+
+    Square odd windows go to cv2.medianBlur, whose 8-bit path is already
+    constant time per pixel for large kernels. Rectangular windows,
+    centre-weighted windows and weighted windows (a 2-D `weights` array,
+    laid over the neighbourhood as-is) use the rank decomposition above.
+    Either way the image is split into row stripes that run in parallel.
+    """
+    if weights is not None:
+        weights = np.asarray(weights, np.float32)
+        if weights.ndim != 2 or weights.size == 0 or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("Median weights must be a non-empty 2-D array of non-negative values")
+        halo = weights.shape[0] // 2
+
+        def func(block):
+            return _rank_median(block, weights=weights)
+        return run_in_stripes(func, image, halo, workers)
+
+    kw = int(kernel_size)
+    kh = int(kernel_height) if kernel_height else kw
+    center_weight = int(center_weight or 1)
+    if kw < 1 or kh < 1 or center_weight < 1:
+        raise ValueError("Median kernel size and centre weight must be positive")
+    if kw == 1 and kh == 1:
+        return image.copy()
+
+    if center_weight > 1:
+        def func(block):
+            return _rank_median(block, ksize=(kw, kh), center_weight=center_weight)
+    elif kw == kh and kw % 2 == 1 and (kw <= SMALL_KERNEL_MAX or image.dtype == np.uint8):
+        def func(block):
+            return cv2.medianBlur(block, kw)
+    else:
+        def func(block):
+            return _rank_median(block, ksize=(kw, kh))
+    return run_in_stripes(func, image, kh // 2, workers)
@@ -0,0 +1,192 @@
+from functools import lru_cache
+import cv2
+import numpy as np
+from app.services.parallel import run_in_stripes
+
+OPERATIONS = ('erode', 'dilate', 'open', 'close', 'tophat', 'blackhat', 'gradient')
+SHAPES = ('rect', 'ellipse', 'cross', 'line')
+# See use_decomposition
+DECOMPOSE_FACTOR = 1.4
+RECT_OVERHEAD = 8
+
+
+def structuring_element(shape='rect', width=3, height=None, angle=0):
+    """
+    Binary structuring element with its anchor at the centre.
+    Lines take `width` as their length and `angle` in degrees (0 = horizontal,
+    45 = '/', 90 = vertical, 135 = '\\').
+    """
+    width = int(width)
+    height = int(height) if height else width
+    if width < 1 or height < 1:
+        raise ValueError("Structuring element size must be positive")
+    if shape == 'rect':
+        return np.ones((height, width), np.uint8)
+    if shape == 'ellipse':
+        return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (width, height))
+    if shape == 'cross':
+        return cv2.getStructuringElement(cv2.MORPH_CROSS, (width, height))
+    if shape == 'line':
+        length = width | 1
+        r = length // 2
+        t = np.arange(-r, r + 1)
+        theta = np.deg2rad(angle)
+        dx = np.round(t * np.cos(theta)).astype(int)
+        dy = np.round(-t * np.sin(theta)).astype(int)
+        size = 2 * max(np.abs(dx).max(), np.abs(dy).max()) + 1
+        element = np.zeros((size, size), np.uint8)
+        element[dy + size // 2, dx + size // 2] = 1
+        return element
+    raise ValueError(f"Unsupported structuring element: {shape}")
+
+
+def decompose(element):
+    """
+    Cover a binary element exactly with axis-aligned rectangles.
+
+    Every distinct horizontal run is grown over each block of consecutive
+    rows that contain it, and rectangles inside another are dropped. Convex
+    shapes such as ellipses come out as a stack of nested rectangles (about
+    one per distinct row width) instead of one window per set pixel.
+    Rectangles are returned as (y0, y1, x0, x1) offsets relative to the
+    anchor, inclusive. Results are cached per element.
+    """
+    element = np.ascontiguousarray(element, dtype=np.uint8)
+    return list(_decompose(element.shape, element.tobytes()))
+
+
+@lru_cache(maxsize=64)
+def _decompose(shape, data):
+    on = np.frombuffer(data, np.uint8).reshape(shape).astype(bool)
+    rows, cols = shape
+    ay, ax = rows // 2, cols // 2
+    if on.all():
+        return ((-ay, rows - 1 - ay, -ax, cols - 1 - ax),)
+
+    runs = set()
+    for y in range(rows):
+        padded = np.concatenate(([False], on[y], [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        runs.update(zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()))
+
+    rects = set()
+    for x0, x1 in runs:
+        covered = np.concatenate(([False], on[:, x0:x1 + 1].all(axis=1), [False]))
+        edges = np.flatnonzero(covered[1:] != covered[:-1])
+        for top, bottom in zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()):
+            rects.add((top - ay, bottom - ay, x0 - ax, x1 - ax))
+
+    rects = sorted(rects)
+    return tuple(
+        r for r in rects
+        if not any(o != r and o[0] <= r[0] and o[1] >= r[1] and o[2] <= r[2] and o[3] >= r[3] for o in rects)
+    )
+
+
+def _shift(image, dy, dx, fill):
+    # result[y, x] = image[y + dy, x + dx], `fill` where that falls outside
+    rows, cols = image.shape[:2]
+    result = np.full_like(image, fill)
+    result[max(-dy, 0):rows - max(dy, 0), max(-dx, 0):cols - max(dx, 0)] = \
+        image[max(dy, 0):rows - max(-dy, 0), max(dx, 0):cols - max(-dx, 0)]
+    return result
+
+
+def _rect_pass(image, rect, cv_op, fill):
+    y0, y1, x0, x1 = rect
+    kernel = np.ones((y1 - y0 + 1, x1 - x0 + 1), np.uint8)
+    # Anchoring the all-ones kernel at (-x0, -y0) applies the offsets directly;
+    # OpenCV needs the anchor inside the kernel, so shift the rest afterwards.
+    ax, ay = min(max(-x0, 0), x1 - x0), min(max(-y0, 0), y1 - y0)
+    result = cv_op(image, kernel, anchor=(ax, ay))
+    dy, dx = y0 + ay, x0 + ax
+    if dy or dx:
+        result = _shift(result, dy, dx, fill)
+    return result
+
+
+def use_decomposition(element, rects):
+    """
+    cv2.erode/dilate cost about one pass per set pixel for general elements
+    but only width + height for a single rectangle; a decomposition costs
+    width + height per rectangle plus a combine pass. Measured on uint8
+    frames (benchmarks/bench_morphology.py) one unit of rectangle cost is
+    ~1.4x one kernel element, hence DECOMPOSE_FACTOR.
+    """
+    if len(rects) == 1:
+        return False
+    cost = sum((y1 - y0 + 1) + (x1 - x0 + 1) + RECT_OVERHEAD for y0, y1, x0, x1 in rects)
+    return DECOMPOSE_FACTOR * cost < int(element.sum())
+
+
+def _extreme(image, element, cv_op, np_op, fill, decomposed):
+    if not decomposed:
+        return cv_op(image, element)
+    result = None
+    for rect in decompose(element):
+        part = _rect_pass(image, rect, cv_op, fill)
+        if result is None:
+            result = part
+        else:
+            np_op(result, part, out=result)
+    return result
+
+
+def _morph(image, operation, element, decomposed):
+    # OpenCV's default morphology border acts as +inf for erosion and -inf
+    # for dilation, i.e. the frame edge never wins
+    info = np.iinfo(image.dtype) if image.dtype.kind in 'ui' else np.finfo(image.dtype)
+
+    def erode(src):
+        return _extreme(src, element, cv2.erode, np.minimum, info.max, decomposed)
+
+    def dilate(src):
+        return _extreme(src, element, cv2.dilate, np.maximum, info.min, decomposed)
+
+    if operation == 'erode':
+        return erode(image)
+    if operation == 'dilate':
+        return dilate(image)
+    if operation == 'open':
+        return dilate(erode(image))
+    if operation == 'close':
+        return erode(dilate(image))
+    if operation == 'tophat':
+        return cv2.subtract(image, dilate(erode(image)))
+    if operation == 'blackhat':
+        return cv2.subtract(erode(dilate(image)), image)
+    return cv2.subtract(dilate(image), erode(image))
+
+
+def morphology_reach(operation, element):
+    # Rows an operation reads above/below each output pixel; open, close and
+    # the hats chain two passes.
+    reach = max(element.shape) // 2
+    return 2 * reach if operation in ('open', 'close', 'tophat', 'blackhat') else reach
+
+
+def apply_morphology(image, operation='erode', shape='rect', width=3, height=None, angle=0,
+                     method='auto', workers=None):
+    """
+    Erode, dilate, open, close, top-hat, black-hat or gradient with a
+    structuring element of any size.
+
+    Rectangles and lines run as single OpenCV passes, which are separable
+    and stay cheap at any size. Large ellipses, crosses and other shapes are
+    split into rectangles (method='decompose') when that is cheaper than
+    OpenCV's per-element pass (method='opencv'); 'auto' decides. The frame
+    is processed in row stripes across a thread pool either way.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unsupported morphology operation: {operation}")
+    element = structuring_element(shape, width, height, angle)
+    if method == 'auto':
+        decomposed = use_decomposition(element, decompose(element))
+    elif method in ('opencv', 'decompose'):
+        decomposed = method == 'decompose'
+    else:
+        raise ValueError(f"Unsupported morphology method: {method}")
+
+    def func(block):
+        return _morph(block, operation, element, decomposed)
+    return run_in_stripes(func, image, morphology_reach(operation, element), workers)
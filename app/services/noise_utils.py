@@ -1,55 +1,117 @@
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
-from scipy import fftpack
+from app.services.buffer_pool import pool
 
+PATTERNS = ('sine', 'cosine', 'square')
+# Unit-amplitude periodic planes are cached per (rows, cols, frequency, pattern)
+# up to this many bytes, so repeated edits of one image skip building them
+PATTERN_CACHE_BYTES = 128 * 1024 * 1024
 
+_pattern_cache = OrderedDict()
+_pattern_held = 0
+_pattern_lock = threading.Lock()
 
-def add_salt_pepper_noise(image, density=0.05):
-    noisy = image.copy()
-    
-    num_salt = np.ceil(density * image.size * 0.5)
-    coords = [np.random.randint(0, i - 1, int(num_salt)) for i in image.shape]
-    noisy[coords[0], coords[1], :] = 255
-    
-    num_pepper = np.ceil(density * image.size * 0.5)
-    coords = [np.random.randint(0, i - 1, int(num_pepper)) for i in image.shape]
-    noisy[coords[0], coords[1], :] = 0
-    return noisy
 
-def add_gaussian_noise(image, mean=0, sigma=25):
-    gaussian = np.random.normal(mean, sigma, image.shape).astype(np.uint8)
-    return cv2.add(image, gaussian)
+def noise_rng(seed=None):
+    """PCG64 generator; a fixed seed makes the noise reproducible."""
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+def add_salt_pepper_noise(image, density=0.05, seed=None, out=None):
+    # `out` may be a pooled buffer of the image's shape; it is overwritten
+    if out is None:
+        noisy = image.copy()
+    else:
+        noisy = out
+        np.copyto(noisy, image)
 
-def add_periodic_noise(image, frequency=20, amplitude=50, pattern='sine'):
     rows, cols = image.shape[:2]
-    x = np.arange(0, cols)
-    y = np.arange(0, rows)
-    X, Y = np.meshgrid(x, y)
+    count = int(np.ceil(density * image.size * 0.5))
+    # Salt and pepper positions in one draw; pepper is applied second
+    coords = noise_rng(seed).integers(0, [rows, cols], size=(2, count, 2))
+    noisy[coords[0, :, 0], coords[0, :, 1]] = 255
+    noisy[coords[1, :, 0], coords[1, :, 1]] = 0
+    return noisy
+
+
+def add_gaussian_noise(image, mean=0, sigma=25, seed=None, out=None):
+    """
+    Additive Gaussian noise, saturated to uint8. Normals are drawn as
+    float32 into a pooled buffer and added to the image in one pass, so
+    negative noise darkens instead of wrapping around.
+    """
+    with pool.borrow(image.shape, np.float32) as normal:
+        noise_rng(seed).standard_normal(out=normal, dtype=np.float32)
+        return cv2.addWeighted(image, 1.0, normal, float(sigma), float(mean), dst=out, dtype=cv2.CV_8U)
+
 
-    # Generate noise pattern
+def _waves(length, frequency, pattern):
+    phase = (2 * np.pi * frequency / length) * np.arange(length, dtype=np.float32)
     if pattern == 'sine':
-        noise = (np.sin(2 * np.pi * frequency * X / cols) +
-                 np.sin(2 * np.pi * frequency * Y / rows)) / 2
-    elif pattern == 'cosine':
-        noise = (np.cos(2 * np.pi * frequency * X / cols) +
-                 np.cos(2 * np.pi * frequency * Y / rows)) / 2
-    elif pattern == 'square':
-        noise = (np.sign(np.sin(2 * np.pi * frequency * X / cols)) +
-                 np.sign(np.sin(2 * np.pi * frequency * Y / rows))) / 2
-    else:
+        return np.sin(phase)
+    if pattern == 'cosine':
+        return np.cos(phase)
+    return np.sign(np.sin(phase))
+
+
+def periodic_pattern(shape, frequency=20, pattern='sine'):
+    """
+    Periodic pattern (wave(x) + wave(y)) / 2 scaled to a peak of 1, as a
+    read-only float32 (rows, cols) plane for an image of `shape`; every
+    channel uses the same plane. Built by broadcasting the two 1-D waves
+    and cached per (rows, cols, frequency, pattern) unless the plane alone
+    exceeds PATTERN_CACHE_BYTES.
+    """
+    global _pattern_held
+    if pattern not in PATTERNS:
         raise ValueError("Unsupported pattern type")
+    rows, cols = shape[:2]
+    key = (rows, cols, float(frequency), pattern)
+    with _pattern_lock:
+        plane = _pattern_cache.get(key)
+        if plane is not None:
+            _pattern_cache.move_to_end(key)
+            return plane
 
-    # Normalize and scale
-    noise = noise / np.max(np.abs(noise))
-    noise = noise * amplitude
+    wx = _waves(cols, frequency, pattern)
+    wy = _waves(rows, frequency, pattern)
+    # The peak of |wx + wy| is at one of the extreme pairs
+    peak = max(abs(wx.max() + wy.max()), abs(wx.min() + wy.min()))
+    scale = np.float32(1 / peak if peak else 0)
+    wx *= scale
+    wy *= scale
+    plane = np.empty((rows, cols), np.float32)
+    np.add(wy[:, None], wx[None, :], out=plane)
+    plane.flags.writeable = False
 
-    # Add noise
-    if len(image.shape) == 2:
-        noisy = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
-    else:
-        noisy = image.copy().astype(np.float32)
-        for c in range(image.shape[2]):
-            noisy[:, :, c] = np.clip(image[:, :, c] + noise, 0, 255)
-        noisy = noisy.astype(np.uint8)
+    with _pattern_lock:
+        if key in _pattern_cache or plane.nbytes > PATTERN_CACHE_BYTES:
+            return plane
+        _pattern_cache[key] = plane
+        _pattern_held += plane.nbytes
+        while _pattern_held > PATTERN_CACHE_BYTES:
+            _pattern_held -= _pattern_cache.popitem(last=False)[1].nbytes
+    return plane
 
-    return noisy
+
+def clear_pattern_cache():
+    global _pattern_held
+    with _pattern_lock:
+        _pattern_cache.clear()
+        _pattern_held = 0
+
+
+def add_periodic_noise(image, frequency=20, amplitude=50, pattern='sine', out=None):
+    """
+    Add a periodic pattern with peak `amplitude`: one saturating
+    channel + amplitude * pattern pass per channel over the cached plane.
+    """
+    plane = periodic_pattern(image.shape, frequency, pattern)
+    if image.ndim == 2:
+        return cv2.addWeighted(image, 1.0, plane, float(amplitude), 0.0, dst=out, dtype=cv2.CV_8U)
+    channels = cv2.split(image)
+    for channel in channels:
+        cv2.addWeighted(channel, 1.0, plane, float(amplitude), 0.0, dst=channel, dtype=cv2.CV_8U)
+    return cv2.merge(channels, dst=out)
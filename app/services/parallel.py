@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.services.compute_budget import budget
+
+# Stripes thinner than this spend more time on halo rows than on real work
+MIN_STRIPE_ROWS = 64
+
+
+def default_workers():
+    """Threads the calling request may use, from the shared compute budget."""
+    return budget.threads()
+
+
+def run_in_stripes(func, image, halo, workers=None, align=1):
+    """
+    Run `func` over horizontal stripes of `image` in a thread pool.
+
+    Each stripe is handed `halo` extra rows of real context above and below,
+    so for any neighbourhood operation whose reach is at most `halo` rows the
+    stitched result is identical to `func(image)`. `func` must return an
+    array with the same number of rows as its input. Stripe boundaries fall
+    on multiples of `align` rows, for block transforms and resampling whose
+    grid must line up with the full frame's (`halo` should then be a
+    multiple of `align` too). OpenCV and NumPy release the GIL for the heavy
+    lifting, so threads run the stripes in parallel.
+    """
+    rows = image.shape[0]
+    workers = workers or default_workers()
+    stripes = min(workers, rows // max(MIN_STRIPE_ROWS, 2 * halo + 1))
+    if stripes <= 1:
+        return func(image)
+
+    bounds = np.linspace(0, rows, stripes + 1).astype(int) // align * align
+    bounds[-1] = rows
+    parts = [None] * stripes
+
+    def work(i):
+        y0, y1 = bounds[i], bounds[i + 1]
+        p0, p1 = max(0, y0 - halo), min(rows, y1 + halo)
+        parts[i] = func(image[p0:p1])[y0 - p0:y1 - p0]
+
+    with ThreadPoolExecutor(max_workers=stripes) as pool:
+        list(pool.map(work, range(stripes)))
+
+    out = np.empty((rows,) + parts[0].shape[1:], parts[0].dtype)
+    for i, part in enumerate(parts):
+        out[bounds[i]:bounds[i + 1]] = part
+    return out
@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.models.db import db
+from app.models.image_log import ImageLog
+from app.models.rendition import Rendition
+from app.services.image_io import decode_image
+from app.services.storage import get_storage
+
+# Encoder settings per format: (extension, mimetype, quality flag, quality)
+FORMATS = {
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY, 80),
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY, 85),
+}
+
+_executor = None
+_queued = set()
+# Per-filename locks with a count of the threads using each
+_generating = {}
+_lock = threading.Lock()
+
+
+def rendition_name(filename, size, fmt):
+    """Storage name of the `size` px `fmt` rendition of `filename`."""
+    return f"rendition_{size}_{filename}{FORMATS[fmt][0]}"
+
+
+def build_pyramid(data, sizes):
+    """
+    Downscaled copies of encoded image `data` whose longer side is each of
+    `sizes` (never enlarged), as {size: BGR image}.
+
+    The image is decoded once, at the smallest JPEG DCT scale that still
+    covers the largest size, and each level is area-averaged from the
+    next larger one rather than from the original.
+    """
+    image, _ = decode_image(data, max(sizes))
+    if image is None:
+        raise ValueError("Image could not be decoded")
+    # Target sizes come from the decoded image, so rounding does not compound down the levels
+    height, width = image.shape[:2]
+    levels = {}
+    for size in sorted(sizes, reverse=True):
+        if max(image.shape[:2]) > size:
+            scale = size / max(height, width)
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        levels[size] = image
+    return levels
+
+
+def latest_log(filename):
+    return ImageLog.query.filter_by(filename=filename).order_by(ImageLog.id.desc()).first()
+
+
+@contextmanager
+def _exclusive(filename):
+    # One thread at a time builds the renditions of a name; others wait for it
+    with _lock:
+        entry = _generating.setdefault(filename, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _generating[filename]
+
+
+def generate_renditions(filename, sizes=None):
+    """
+    Build, store and record the renditions of the latest upload of a logged
+    image that are not recorded yet, of `sizes` (all configured sizes by
+    default); those of earlier uploads under the name are replaced. Returns
+    the latest upload's Rendition rows, or None if the image or its log
+    entry is gone.
+    """
+    with _exclusive(filename):
+        log = latest_log(filename)
+        if log is None:
+            return None
+        recorded = Rendition.query.filter_by(image_log_id=log.id).all()
+        done = {(row.size, row.format) for row in recorded}
+        missing = [(size, fmt) for size in sizes or current_app.config['RENDITION_SIZES']
+                   for fmt in current_app.config['RENDITION_FORMATS'] if (size, fmt) not in done]
+        if not missing:
+            return recorded
+        storage = get_storage()
+        data = storage.get(filename)
+        if data is None:
+            return None
+
+        levels = build_pyramid(np.frombuffer(data, np.uint8), sorted({size for size, _ in missing}))
+        Rendition.query.filter(Rendition.image_log_id.in_(
+            db.session.query(ImageLog.id).filter(ImageLog.filename == filename, ImageLog.id != log.id)
+        )).delete(synchronize_session=False)
+        rows = []
+        for size, fmt in missing:
+            image = levels[size]
+            ext, _, flag, quality = FORMATS[fmt]
+            success, encoded = cv2.imencode(ext, image, [flag, quality])
+            if not success:
+                raise IOError(f"Failed to encode {fmt} rendition of {filename}")
+            name = rendition_name(filename, size, fmt)
+            storage.put(name, encoded)
+            rows.append(Rendition(image_log_id=log.id, size=size, format=fmt, filename=name,
+                                  width=image.shape[1], height=image.shape[0], bytes=encoded.nbytes))
+        db.session.add_all(rows)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker process recorded them first; its files are the same
+            db.session.rollback()
+            return Rendition.query.filter_by(image_log_id=log.id).all()
+        return recorded + rows
+
+
+def _run(app, filename):
+    with _lock:
+        # A later upload of the same name queues a new job once this one has started
+        _queued.discard(filename)
+    try:
+        with app.app_context():
+            generate_renditions(filename)
+    except Exception:
+        app.logger.exception(f"Rendition generation failed for {filename}")
+
+
+def schedule_renditions(filename):
+    """Generate the renditions of `filename` in the background after the request returns."""
+    global _executor
+    app = current_app._get_current_object()
+    with _lock:
+        if filename in _queued:
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(app.config['RENDITION_WORKERS'], thread_name_prefix='renditions')
+        _queued.add(filename)
+        _executor.submit(_run, app, filename)
+
+
+def find_rendition(filename, size):
+    """
+    Recorded renditions of `filename` at `size`, by format, or None if it
+    was never logged. If there are none yet (an upload from before
+    renditions, or a job still queued or running) this waits for any job
+    building them and then generates only what is still missing at `size`.
+    """
+    log = latest_log(filename)
+    if log is None:
+        return None
+    rows = Rendition.query.filter_by(image_log_id=log.id, size=size).all()
+    if not rows:
+        rows = [row for row in generate_renditions(filename, [size]) or [] if row.size == size]
+    return {row.format: row for row in rows}
@@ -0,0 +1,323 @@
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from flask import current_app, has_app_context
+from app import config
+
+# Entries the index can hold, and worker processes recorded per entry
+SLOTS = 1024
+HOLDERS = 32
+# Attachments a process keeps open after their arrays are dropped, so a hot
+# entry is not re-mapped on every request
+KEEP_ATTACHED = 16
+# Every segment starts with a header describing its array: magic, dtype,
+# ndim and shape; the data follows at DATA_OFFSET (aligned for complex128)
+_HEADER = struct.Struct('<8s8sB8Q')
+DATA_OFFSET = 128
+_MAGIC = b'SHMIMG01'
+_registry = {}
+_registry_lock = threading.Lock()
+_INDEX_DTYPE = np.dtype([('key', 'S32'), ('size', '<i8'), ('used', '<f8'), ('holders', '<i4', (HOLDERS,))])
+
+
+def key_name(key):
+    """32-character hex name of any hashable key (tuples, strings, digests)."""
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def content_key(array):
+    """Content-hash key of an array, including its shape and dtype."""
+    digest = hashlib.blake2b(np.ascontiguousarray(array), digest_size=16).hexdigest()
+    return ('array', digest, array.shape, array.dtype.str)
+
+
+def _untracked(segment):
+    # The resource tracker would unlink segments when the process that
+    # opened them exits; entries must outlive any one worker
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _open(name, size=0):
+    try:
+        return _untracked(shared_memory.SharedMemory(name, create=size > 0, size=size))
+    except FileNotFoundError:
+        return None
+
+
+def _unlink(name):
+    try:
+        # Opened tracked, since unlink() unregisters it from the tracker
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _attachments(name):
+    # Attachments and their lock are shared by every store object of a name
+    # in this process: a segment is only closed by _drop_idle once no array
+    # uses it, never by a store object being garbage collected
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = (threading.Lock(), OrderedDict())
+        return _registry[name]
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedImageStore:
+    """
+    Arrays (decoded images, spectra) shared between worker processes
+    through POSIX shared memory, looked up by key.
+
+    Each entry is its own segment holding a header and the array. A shared
+    index (SLOTS entries, guarded by a lock file) records each entry's
+    size, last use and the pids of the processes attached to it, which is
+    its reference count. Entries nobody holds are evicted least recently
+    used first once `max_bytes` would be exceeded; holders that have died
+    are dropped. Arrays handed out are read-only views of the shared pages.
+    """
+
+    def __init__(self, name, max_bytes, slots=SLOTS):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.pid = os.getpid()
+        self._lock, self._attached = _attachments(name)
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f'{name}.lock'), 'a+')
+        with self._locked():
+            index = _open(f'{name}_index') or _open(f'{name}_index', _INDEX_DTYPE.itemsize * slots)
+        self._index_segment = index
+        self._index = np.ndarray((slots,), _INDEX_DTYPE, buffer=index.buf)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _locked(self):
+        # Imported here so that the module (and image_io with it) still loads
+        # on hosts without fcntl while SHARED_STORE is off
+        import fcntl
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _segment_name(self, name):
+        return f'{self.name}_{name}'
+
+    def _find(self, name):
+        found = np.flatnonzero(self._index['key'] == name.encode())
+        return int(found[0]) if found.size else -1
+
+    def _hold(self, slot):
+        holders = self._index['holders'][slot]
+        if self.pid not in holders:
+            free = np.flatnonzero(holders == 0)
+            if free.size:
+                holders[free[0]] = self.pid
+        self._index['used'][slot] = time.time()
+
+    def _make_room(self, size):
+        # Evict unheld entries, oldest first, until `size` more bytes fit
+        occupied = self._index['key'] != b''
+        held = int(self._index['size'][occupied].sum())
+        if held + size <= self.max_bytes and not occupied.all():
+            return True
+        for slot in np.flatnonzero(occupied)[np.argsort(self._index['used'][occupied])]:
+            holders = self._index['holders'][slot]
+            for i in np.flatnonzero(holders):
+                if not _alive(holders[i]):
+                    holders[i] = 0
+            if holders.any():
+                continue
+            _unlink(self._segment_name(self._index['key'][slot].decode()))
+            held -= int(self._index['size'][slot])
+            self._index[slot] = np.zeros((), _INDEX_DTYPE)
+            self.evictions += 1
+            if held + size <= self.max_bytes:
+                return True
+        return False
+
+    def _attach(self, name, segment):
+        magic, dtype, ndim, *shape = _HEADER.unpack_from(segment.buf)
+        array = np.ndarray(tuple(shape[:ndim]), np.dtype(dtype.rstrip(b'\0').decode()),
+                           buffer=segment.buf, offset=DATA_OFFSET)
+        array.flags.writeable = False
+        self._attached[name] = (segment, array)
+        return array
+
+    def get(self, key):
+        """The shared array stored under `key`, or None."""
+        name = key_name(key)
+        with self._lock:
+            entry = self._attached.get(name)
+            if entry is not None:
+                self._attached.move_to_end(name)
+                self.hits += 1
+                return entry[1]
+        with self._locked():
+            entry = self._attached.get(name)
+            if entry is not None:
+                return entry[1]
+            slot = self._find(name)
+            segment = _open(self._segment_name(name)) if slot >= 0 else None
+            if segment is None:
+                if slot >= 0:
+                    # Its segment was removed behind the index's back
+                    self._index[slot] = np.zeros((), _INDEX_DTYPE)
+                self.misses += 1
+                return None
+            self._hold(slot)
+            array = self._attach(name, segment)
+            self.hits += 1
+        self._detach_idle()
+        return array
+
+    def put(self, key, array):
+        """
+        Publish `array` under `key` and return the shared read-only copy.
+        If another process published it first, that copy is returned; if it
+        cannot fit, `array` itself comes back unshared.
+        """
+        name = key_name(key)
+        shared = self.get(key)
+        if shared is not None:
+            return shared
+        array = np.ascontiguousarray(array)
+        size = DATA_OFFSET + array.nbytes
+        if array.ndim > 8 or array.dtype.hasobject or len(array.dtype.str) > 8 or size > self.max_bytes:
+            return array
+        with self._locked():
+            entry = self._attached.get(name)
+            if entry is not None:
+                return entry[1]
+            slot = self._find(name)
+            segment = _open(self._segment_name(name)) if slot >= 0 else None
+            if segment is None:
+                if slot >= 0:
+                    self._index[slot] = np.zeros((), _INDEX_DTYPE)
+                if not self._make_room(size):
+                    # Our own idle attachments may be what is pinning the space
+                    self._drop_idle(0)
+                    if not self._make_room(size):
+                        return array
+                slot = int(np.flatnonzero(self._index['key'] == b'')[0])
+                # A segment left behind by a crashed publisher is replaced
+                _unlink(self._segment_name(name))
+                segment = _open(self._segment_name(name), size)
+                shape = tuple(array.shape) + (0,) * (8 - array.ndim)
+                _HEADER.pack_into(segment.buf, 0, _MAGIC, array.dtype.str.encode(), array.ndim, *shape)
+                np.ndarray(array.shape, array.dtype, buffer=segment.buf, offset=DATA_OFFSET)[...] = array
+                self._index[slot] = (name.encode(), size, time.time(), np.zeros(HOLDERS, np.int32))
+            self._hold(slot)
+            shared = self._attach(name, segment)
+        self._detach_idle()
+        return shared
+
+    @contextmanager
+    def share(self, array, key=None):
+        """
+        Publish `array` and keep it pinned while the block runs, yielding a
+        small picklable handle (its key) that other processes pass to `get`
+        instead of pickling the array.
+        """
+        key = key if key is not None else content_key(array)
+        pinned = self.put(key, array)
+        try:
+            yield key
+        finally:
+            del pinned
+
+    def _drop_idle(self, keep):
+        # Close attachments beyond the most recent `keep` whose arrays
+        # nobody else references and give up our hold on them; the caller
+        # holds the lock
+        for name in list(self._attached)[:max(len(self._attached) - keep, 0)]:
+            # References: the dict's tuple, `array` below and getrefcount's argument
+            array = self._attached[name][1]
+            if sys.getrefcount(array) > 3:
+                continue
+            del array
+            segment = self._attached.pop(name)[0]
+            try:
+                segment.close()
+            except BufferError:
+                pass
+            slot = self._find(name)
+            if slot >= 0:
+                holders = self._index['holders'][slot]
+                holders[holders == self.pid] = 0
+
+    def _detach_idle(self):
+        if len(self._attached) > KEEP_ATTACHED:
+            with self._locked():
+                self._drop_idle(KEEP_ATTACHED)
+
+    def stats(self):
+        with self._locked():
+            occupied = self._index['key'] != b''
+            return {
+                'entries': int(occupied.sum()),
+                'held_bytes': int(self._index['size'][occupied].sum()),
+                'max_bytes': self.max_bytes,
+                'attached': len(self._attached),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def destroy(self):
+        """Unlink every entry and the index (tests, benchmarks, redeploys)."""
+        with self._locked():
+            for name in self._index['key'][self._index['key'] != b'']:
+                _unlink(self._segment_name(name.decode()))
+            self._index[...] = np.zeros((), _INDEX_DTYPE)
+            # Arrays still in use keep their pages until they are dropped
+            self._drop_idle(0)
+        _unlink(f'{self.name}_index')
+        try:
+            os.remove(self._lock_file.name)
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    This process's SharedImageStore, or None when SHARED_STORE is off. The
+    settings are the current app's, or app.config's outside an app (worker
+    scripts, benchmarks).
+    """
+    global _store
+    settings = current_app.config if has_app_context() else vars(config)
+    if not settings['SHARED_STORE']:
+        return None
+    name, max_bytes = settings['SHARED_STORE_NAME'], settings['SHARED_STORE_MAX_BYTES']
+    with _store_lock:
+        # A forked worker opens its own handles rather than reusing its parent's
+        if _store is None or (_store.pid, _store.name, _store.max_bytes) != (os.getpid(), name, max_bytes):
+            _store = SharedImageStore(name, max_bytes)
+        return _store
@@ -0,0 +1,598 @@
+import atexit
+import fnmatch
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import current_app
+from app.services.export_utils import match_files
+from app.services.file_serving import WRITE_ONCE, data_etag, file_etag
+
+CHUNK_SIZE = 1 << 20
+# Object-store writes larger than MULTIPART_THRESHOLD go up in PART_SIZE
+# parts (S3 requires at least 5 MB for every part but the last)
+PART_SIZE = 8 * 1024 * 1024
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+
+
+def _chunks(data, size):
+    """Pieces of up to `size` bytes from a binary file object or any buffer (bytes, ndarray)."""
+    if hasattr(data, 'read'):
+        yield from iter(lambda: data.read(size), b'')
+        return
+    view = memoryview(data).cast('B')
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+class Storage:
+    """
+    Where uploads, processed outputs and FFT data are kept, by flat name.
+
+    put(name, data) stores a buffer or a binary file object, get(name) returns
+    the bytes, read(name, length) up to its first `length` bytes, size(name)
+    its length, stream(name) an iterator of chunks, exists / delete / names
+    do what they say, etag(name) is a content tag (the object store's ETag,
+    or the remembered file hash), and `with local_path(name) as path` gives
+    a local file to hand to OpenCV or send_file, which stays in place until
+    the block exits. get, read, size, stream, etag and local_path give None
+    for a missing name.
+    Names with a path separator or starting with a dot are a ValueError.
+    """
+
+    def check(self, name):
+        if not name or name.startswith('.') or '/' in name or '\\' in name or '\0' in name:
+            raise ValueError(f"Invalid storage name: {name!r}")
+        return name
+
+    def get(self, name):
+        chunks = self.stream(name)
+        return None if chunks is None else b''.join(chunks)
+
+    def read(self, name, length):
+        chunks = self.stream(name, chunk_size=length)
+        if chunks is None:
+            return None
+        try:
+            return next(chunks, b'')
+        finally:
+            chunks.close()
+
+    @contextmanager
+    def local_path(self, name):
+        yield self.path(name)
+
+
+class LocalStorage(Storage):
+    """Files in one folder on local disk (the default, static/uploads)."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        path = os.path.join(self.root, self.check(name))
+        return path if os.path.isfile(path) else None
+
+    def put(self, name, data):
+        # Written next to the target and renamed, so readers never see half a file
+        path = os.path.join(self.root, self.check(name))
+        temp = os.path.join(self.root, f'.{name}.{uuid.uuid4().hex[:8]}.part')
+        try:
+            with open(temp, 'wb') as f:
+                for chunk in _chunks(data, CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        return name
+
+    def stream(self, name, chunk_size=CHUNK_SIZE):
+        path = self.path(name)
+        if path is None:
+            return None
+
+        def chunks():
+            with open(path, 'rb') as f:
+                yield from iter(lambda: f.read(chunk_size), b'')
+        return chunks()
+
+    def size(self, name):
+        path = self.path(name)
+        return None if path is None else os.path.getsize(path)
+
+    def exists(self, name):
+        return self.path(name) is not None
+
+    def etag(self, name):
+        path = self.path(name)
+        return None if path is None else file_etag(path)
+
+    def delete(self, name):
+        path = self.path(name)
+        if path is None:
+            return False
+        os.remove(path)
+        return True
+
+    def names(self, pattern='*'):
+        # Dot files are writes in progress
+        return [name for name in match_files(self.root, pattern) if not name.startswith('.')]
+
+
+class _FileCache:
+    """
+    Local copies of remote objects, least recently used first out once
+    they add up to more than max_bytes, tagged with the object's ETag.
+    A name is pinned while a caller holds its file: pinned copies are not
+    evicted or removed until released, and an object larger than max_bytes
+    is only kept for as long as it is pinned. Each process keeps its own
+    folder under `folder`, removed at exit.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.parent = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def _folder(self):
+        # Set up on first use in each process, so forked workers do not share an index
+        if self._pid != os.getpid():
+            os.makedirs(self.parent, exist_ok=True)
+            self.folder = tempfile.mkdtemp(prefix=f'{os.getpid()}_', dir=self.parent)
+            atexit.register(shutil.rmtree, self.folder, True)
+            self._entries = OrderedDict()
+            self._pins = {}
+            self._held = 0
+            self._pid = os.getpid()
+        return self.folder
+
+    def _path(self, name):
+        return os.path.join(self._folder(), name)
+
+    def location(self, name):
+        """Where the cached copy of `name` is (or would be) kept."""
+        with self._lock:
+            return self._path(name)
+
+    def lookup(self, name):
+        """(path, etag) of the cached copy of `name`, or None."""
+        with self._lock:
+            self._folder()
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return self._path(name), entry[0]
+
+    def fill(self, name, etag, chunks):
+        """
+        Pass `chunks` through while writing them to the cache; the copy is
+        kept once they have all been read.
+        """
+        with self._lock:
+            temp = f'{self._path(name)}.{uuid.uuid4().hex[:8]}.part'
+        size = 0
+        try:
+            with open(temp, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        with self._lock:
+            os.replace(temp, self._path(name))
+            self._forget(name)
+            if size <= self.max_bytes:
+                self._entries[name] = (etag, size)
+                self._held += size
+                self._evict(keep=name)
+            elif name not in self._pins:
+                os.remove(self._path(name))
+
+    def _forget(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._held -= entry[1]
+
+    def _evict(self, keep=None):
+        # Least recently used first, skipping copies a caller still holds
+        for name in list(self._entries):
+            if self._held <= self.max_bytes:
+                break
+            if name not in self._pins and name != keep:
+                self._forget(name)
+                os.remove(self._path(name))
+
+    @contextmanager
+    def pinned(self, name):
+        """Keep the cached copy of `name` (once there is one) in place until the block exits."""
+        with self._lock:
+            self._folder()
+            self._pins[name] = self._pins.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                count = self._pins.pop(name) - 1
+                if count:
+                    self._pins[name] = count
+                elif name not in self._entries:
+                    # Discarded or too large to keep while it was held
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+                else:
+                    self._evict()
+
+    def discard(self, name):
+        with self._lock:
+            self._folder()
+            if name in self._entries:
+                self._forget(name)
+                if name not in self._pins:
+                    os.remove(self._path(name))
+
+    def stats(self):
+        with self._lock:
+            self._folder()
+            return {'entries': len(self._entries), 'held_bytes': self._held, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def _not_found(error):
+    # boto3 raises ClientError with the S3 error code in .response
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+class ObjectStorage(Storage):
+    """
+    Objects in an S3-compatible bucket, for workers on several nodes.
+
+    `client` is a boto3 S3 client (or anything with the same calls, such as
+    InProcessObjectClient). Reads go through a local _FileCache: names
+    save_processed_image writes once are served from it without asking the
+    bucket again, other names are revalidated with a HEAD. Writes over
+    multipart_threshold are uploaded in part_size parts, upload_workers at
+    a time, so memory stays at about upload_workers parts.
+    """
+
+    def __init__(self, client, bucket, prefix='', cache_dir=None, cache_bytes=1024 * 1024 * 1024,
+                 part_size=PART_SIZE, multipart_threshold=MULTIPART_THRESHOLD, upload_workers=4):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = part_size
+        self.multipart_threshold = max(multipart_threshold, part_size)
+        self.upload_workers = upload_workers
+        self.cache = _FileCache(cache_dir or os.path.join(tempfile.gettempdir(), 'photo_editor_cache'),
+                                cache_bytes)
+
+    def _key(self, name):
+        return self.prefix + self.check(name)
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if _not_found(e):
+                return None
+            raise
+
+    def _fetch(self, name, chunk_size):
+        # The object's chunks, copied into the cache as they are read
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if _not_found(e):
+                self.cache.discard(name)
+                return None
+            raise
+        body = response['Body']
+        return self.cache.fill(name, response['ETag'], iter(lambda: body.read(chunk_size), b''))
+
+    def _cached(self, name):
+        cached = self.cache.lookup(self.check(name))
+        if cached is None:
+            return None
+        if WRITE_ONCE.match(name):
+            return cached[0]
+        head = self._head(name)
+        if head is not None and head['ETag'] == cached[1]:
+            return cached[0]
+        self.cache.discard(name)
+        return None
+
+    @contextmanager
+    def local_path(self, name):
+        with self.cache.pinned(self.check(name)):
+            path = self._cached(name)
+            if path is None:
+                chunks = self._fetch(name, CHUNK_SIZE)
+                if chunks is not None:
+                    for _ in chunks:
+                        pass
+                    path = self.cache.location(name)
+            yield path
+
+    def stream(self, name, chunk_size=CHUNK_SIZE):
+        # Opened while pinned, so a concurrent fill cannot evict it first
+        with self.cache.pinned(self.check(name)):
+            path = self._cached(name)
+            if path is None:
+                return self._fetch(name, chunk_size)
+            f = open(path, 'rb')
+
+        def chunks():
+            with f:
+                yield from iter(lambda: f.read(chunk_size), b'')
+        return chunks()
+
+    def put(self, name, data):
+        key = self._key(name)
+        if not hasattr(data, 'read') and memoryview(data).nbytes <= self.multipart_threshold:
+            first, rest = bytes(data), iter(())
+        else:
+            # Read up to the threshold to see whether one request will do
+            parts = _chunks(data, self.part_size)
+            first = b''
+            for part in parts:
+                first += part
+                if len(first) > self.multipart_threshold:
+                    break
+            rest = parts
+        if len(first) <= self.multipart_threshold:
+            response = self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+            # Small writes are cached as they are, so the writer reads them back locally
+            for _ in self.cache.fill(name, response['ETag'], [first]):
+                pass
+            return name
+        self._put_multipart(key, first, rest)
+        self.cache.discard(name)
+        return name
+
+    def _put_multipart(self, key, first, rest):
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+        slots = threading.BoundedSemaphore(self.upload_workers)
+
+        def upload(number, body):
+            try:
+                response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                   PartNumber=number, Body=body)
+                return {'PartNumber': number, 'ETag': response['ETag']}
+            finally:
+                slots.release()
+
+        def parts():
+            buffered = first
+            for chunk in rest:
+                buffered += chunk
+                while len(buffered) >= self.part_size:
+                    yield buffered[:self.part_size]
+                    buffered = buffered[self.part_size:]
+            if buffered:
+                yield buffered
+
+        try:
+            with ThreadPoolExecutor(self.upload_workers) as executor:
+                futures = []
+                for number, body in enumerate(parts(), 1):
+                    # Wait for a free worker before reading the next part
+                    slots.acquire()
+                    futures.append(executor.submit(upload, number, bytes(body)))
+                uploaded = [future.result() for future in futures]
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': uploaded})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def read(self, name, length):
+        # A cached copy if there is one, otherwise a ranged GET: no full download
+        with self.cache.pinned(self.check(name)):
+            path = self._cached(name)
+            if path is not None:
+                with open(path, 'rb') as f:
+                    return f.read(length)
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name),
+                                              Range=f'bytes=0-{length - 1}')
+        except Exception as e:
+            if _not_found(e):
+                return None
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'InvalidRange':
+                return b''  # An empty object
+            raise
+        return response['Body'].read(length)
+
+    def size(self, name):
+        head = self._head(name)
+        return None if head is None else head['ContentLength']
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def etag(self, name):
+        cached = self.cache.lookup(self.check(name))
+        if cached is not None and WRITE_ONCE.match(name):
+            return cached[1]
+        head = self._head(name)
+        return None if head is None else head['ETag']
+
+    def delete(self, name):
+        existed = self.exists(name)
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        self.cache.discard(name)
+        return existed
+
+    def names(self, pattern='*'):
+        names, token = [], None
+        while True:
+            kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix}
+            if token:
+                kwargs['ContinuationToken'] = token
+            response = self.client.list_objects_v2(**kwargs)
+            names += [item['Key'][len(self.prefix):] for item in response.get('Contents', [])]
+            if not response.get('IsTruncated'):
+                break
+            token = response['NextContinuationToken']
+        return sorted(name for name in names if '/' not in name and fnmatch.fnmatchcase(name, pattern))
+
+
+class ObjectNotFound(Exception):
+    def __init__(self, key):
+        super().__init__(f"No such key: {key}")
+        self.response = {'Error': {'Code': 'NoSuchKey'}}
+
+
+class InvalidRange(Exception):
+    def __init__(self, key):
+        super().__init__(f"Range not satisfiable: {key}")
+        self.response = {'Error': {'Code': 'InvalidRange'}}
+
+
+class InProcessObjectClient:
+    """
+    In-memory stand-in for the boto3 S3 calls ObjectStorage makes, for tests,
+    benchmarks and single-process development (STORAGE_BACKEND=memory).
+    Every call takes `latency` seconds, as a round trip would, plus its
+    payload over `bandwidth` bytes/s when that is set (per request, like a
+    single connection).
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, name, size=0):
+        with self._lock:
+            self.calls.append(name)
+        delay = self.latency + (size / self.bandwidth if self.bandwidth else 0)
+        if delay:
+            time.sleep(delay)
+
+    def _object(self, bucket, key):
+        try:
+            return self.objects[bucket, key]
+        except KeyError:
+            raise ObjectNotFound(key) from None
+
+    def put_object(self, Bucket, Key, Body):
+        body = bytes(Body) if not hasattr(Body, 'read') else Body.read()
+        self._call('put_object', len(body))
+        etag = f'"{data_etag(body)}"'
+        with self._lock:
+            self.objects[Bucket, Key] = (body, etag)
+        return {'ETag': etag}
+
+    def head_object(self, Bucket, Key):
+        self._call('head_object')
+        body, etag = self._object(Bucket, Key)
+        return {'ETag': etag, 'ContentLength': len(body)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        body, etag = self._object(Bucket, Key)
+        response = {'ETag': etag}
+        if Range is not None:
+            # Only the 'bytes=first-last' form ObjectStorage.read sends
+            first, last = (int(n) for n in Range[len('bytes='):].split('-'))
+            if first >= len(body):
+                raise InvalidRange(Key)
+            response['ContentRange'] = f'bytes {first}-{min(last, len(body) - 1)}/{len(body)}'
+            body = body[first:last + 1]
+        self._call('get_object', len(body))
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body), **response}
+
+    def delete_object(self, Bucket, Key):
+        self._call('delete_object')
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None):
+        self._call('list_objects_v2')
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        return {'Contents': [{'Key': key, 'Size': len(self.objects[Bucket, key][0])} for key in keys],
+                'IsTruncated': False}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self._call('create_multipart_upload')
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._call('upload_part', len(Body))
+        etag = f'"{data_etag(Body)}"'
+        with self._lock:
+            self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {'ETag': etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._call('complete_multipart_upload')
+        with self._lock:
+            parts = self.uploads.pop(UploadId)
+            body = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+            etag = f'"{data_etag(body)}-{len(parts)}"'
+            self.objects[Bucket, Key] = (body, etag)
+        return {'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._call('abort_multipart_upload')
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+
+def init_storage(app):
+    """Build the storage backend from app.config and register it on `app`."""
+    backend = app.config['STORAGE_BACKEND']
+    if backend == 'local':
+        storage = LocalStorage(app.config['STORAGE_ROOT'] or os.path.join(app.root_path, 'static', 'uploads'))
+    elif backend in ('s3', 'memory'):
+        if backend == 's3':
+            # Only needed for this backend, so not in requirements.txt
+            import boto3
+            client = boto3.client('s3', endpoint_url=app.config['STORAGE_ENDPOINT_URL'] or None)
+        else:
+            client = InProcessObjectClient()
+        storage = ObjectStorage(
+            client,
+            app.config['STORAGE_BUCKET'],
+            app.config['STORAGE_PREFIX'],
+            app.config['STORAGE_CACHE_DIR'] or os.path.join(app.instance_path, 'storage_cache'),
+            app.config['STORAGE_CACHE_BYTES'],
+            app.config['STORAGE_PART_SIZE'],
+            upload_workers=app.config['STORAGE_UPLOAD_WORKERS'],
+        )
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    app.extensions['storage'] = storage
+    return storage
+
+
+def get_storage():
+    """The storage backend of the current app."""
+    storage = current_app.extensions.get('storage')
+    return storage if storage is not None else init_storage(current_app)
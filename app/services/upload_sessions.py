@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import current_app
+
+CHUNK_SIZE = 1 << 20
+# Sessions untouched for this long are removed when a new one is created
+SESSION_TTL = 24 * 3600
+
+
+class OffsetMismatch(ValueError):
+    """An append that does not start where the upload currently ends."""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class SessionBusy(ValueError):
+    """Another request is appending to the same upload."""
+
+
+class UploadSessions:
+    """
+    Resumable uploads: a session is created for a file, chunks are appended
+    at the offset where the data received so far ends, and finalize checks
+    the size and content hash before the file is stored.
+
+    Each session is a partial file plus a small JSON description in
+    `folder`, so any worker on the node can continue it and what was
+    received survives an interrupted request or a restart. Chunks are read
+    from the request CHUNK_SIZE bytes at a time and fed to a blake2b
+    hash (the same digest as file_serving.data_etag) as they are written,
+    so memory stays constant whatever the file size. The running hash is
+    kept per process; a worker that did not see the earlier chunks
+    re-hashes the partial file once.
+    """
+
+    def __init__(self, folder, ttl=SESSION_TTL):
+        self.folder = folder
+        self.ttl = ttl
+        self._hashes = {}
+        self._writing = set()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, upload_id, suffix):
+        # Ids are generated here; anything else cannot name a session
+        if len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+            return None
+        return os.path.join(self.folder, f'{upload_id}.{suffix}')
+
+    def _describe(self, upload_id, info):
+        offset = os.path.getsize(self._path(upload_id, 'part'))
+        return {'upload_id': upload_id, 'offset': offset, **info}
+
+    def _info(self, upload_id):
+        path = self._path(upload_id, 'json')
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def create(self, filename, size=None):
+        """Start an upload of `filename`, `size` bytes if known; returns its status."""
+        if size is not None and (not isinstance(size, int) or size < 0):
+            raise ValueError("size must be a non-negative integer")
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        info = {'filename': filename, 'size': size, 'created': time.time()}
+        open(self._path(upload_id, 'part'), 'wb').close()
+        with open(self._path(upload_id, 'json'), 'w') as f:
+            json.dump(info, f)
+        return self._describe(upload_id, info)
+
+    def status(self, upload_id):
+        """Status of an upload (where to resume from), or None if there is no such upload."""
+        info = self._info(upload_id)
+        return None if info is None else self._describe(upload_id, info)
+
+    @contextmanager
+    def _exclusive(self, upload_id):
+        # One writer per session across the node's workers; without fcntl
+        # (non-POSIX hosts) only across this process's threads
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        with open(self._path(upload_id, 'part'), 'ab') as f:
+            if fcntl is None:
+                with self._lock:
+                    if upload_id in self._writing:
+                        raise SessionBusy("Another chunk of this upload is being received")
+                    self._writing.add(upload_id)
+                try:
+                    yield f
+                finally:
+                    with self._lock:
+                        self._writing.discard(upload_id)
+                return
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SessionBusy("Another chunk of this upload is being received") from None
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _hash(self, upload_id, offset):
+        # The running hash of the first `offset` bytes, rebuilt from disk if this process lacks it
+        with self._lock:
+            known = self._hashes.pop(upload_id, None)
+        if known is not None and known[0] == offset:
+            return known[1]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self._path(upload_id, 'part'), 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest
+
+    def append(self, upload_id, offset, stream, chunk_size=CHUNK_SIZE):
+        """
+        Append everything `stream` yields at `offset`; returns the new status.
+        Data received before the stream fails is kept, so the client resumes
+        from the offset the status reports.
+        """
+        info = self._info(upload_id)
+        if info is None:
+            return None
+        with self._exclusive(upload_id) as f:
+            current = f.tell()
+            if offset != current:
+                raise OffsetMismatch(current)
+            digest = self._hash(upload_id, current)
+            try:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    if info['size'] is not None and current + len(chunk) > info['size']:
+                        raise ValueError(f"Upload is larger than the declared {info['size']} bytes")
+                    f.write(chunk)
+                    digest.update(chunk)
+                    current += len(chunk)
+            finally:
+                f.flush()
+                with self._lock:
+                    self._hashes[upload_id] = (current, digest)
+            os.utime(self._path(upload_id, 'json'))
+        return self._describe(upload_id, info)
+
+    def finish(self, upload_id, save, checksum=None):
+        """
+        Check a finished upload and pass (filename, open file) to `save`;
+        the session is removed once it returns. Returns the filename, size
+        and content hash, or None for an unknown upload.
+        """
+        info = self._info(upload_id)
+        if info is None:
+            return None
+        with self._exclusive(upload_id) as f:
+            size = f.tell()
+            if info['size'] is not None and size != info['size']:
+                raise OffsetMismatch(size)
+            digest = self._hash(upload_id, size).hexdigest()
+            if checksum and checksum.lower() != digest:
+                raise ValueError(f"Checksum mismatch: received data hashes to {digest}")
+            with open(self._path(upload_id, 'part'), 'rb') as data:
+                save(info['filename'], data)
+        self.discard(upload_id)
+        return {'filename': info['filename'], 'size': size, 'etag': digest}
+
+    def discard(self, upload_id):
+        """Remove an upload and what it received; False if there was none."""
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+        removed = False
+        for suffix in ('part', 'json'):
+            path = self._path(upload_id, suffix)
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+                removed = True
+        return removed
+
+    def expire(self):
+        """Remove sessions idle for longer than the TTL."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.folder):
+            if name.endswith('.json') and os.path.getmtime(os.path.join(self.folder, name)) < cutoff:
+                self.discard(name[:-5])
+
+
+def get_sessions():
+    """The upload sessions of the current app, kept in UPLOAD_SESSION_DIR."""
+    sessions = current_app.extensions.get('upload_sessions')
+    if sessions is None:
+        folder = current_app.config['UPLOAD_SESSION_DIR'] or os.path.join(current_app.instance_path,
+                                                                          'upload_sessions')
+        sessions = current_app.extensions['upload_sessions'] = UploadSessions(folder)
+    return sessions
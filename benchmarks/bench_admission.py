@@ -0,0 +1,155 @@
+"""
+Admission control.
+
+--calibrate measures every operation in app.services.admission.COSTS on a
+synthetic photo and prints ms and peak MB per megapixel next to the table,
+which is where its numbers come from.
+
+Without it, the load test runs a stream of cheap requests (adjust, 1 MP)
+while a burst of heavy ones (NLM, 2 MP) arrives, with and without an
+AdmissionController in front, and reports cheap-request latency
+percentiles and how many heavy requests were turned away with 429.
+
+    python -m benchmarks.bench_admission [--calibrate] [--megapixels 2]
+    python -m benchmarks.bench_admission [--heavy 6 --cheap 40 --budget-mb 1024]
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from app.services.admission import COSTS, IO_COST, AdmissionController, estimate
+from app.services.adjustments import apply_adjustments
+from app.services.denoise_utils import denoise
+from app.services.filters import apply_filter, remove_periodic_noise
+from app.services.frequency_utils import frequency_filter
+from app.services.histogram_utils import equalize
+from app.services.noise_utils import add_gaussian_noise
+from benchmarks.bench_denoise import scene
+
+KERNEL = [[0, -1, 0], [-1, 5, -1], [0, -1, 0]]
+
+
+def operations():
+    ops = {}
+    for name in ('sobel', 'scharr', 'laplace', 'canny', 'gaussian', 'mean', 'median', 'bilateral',
+                 'sharpen', 'emboss', 'morphology'):
+        ops[f'filter:{name}'] = lambda image, name=name: apply_filter(image, name, {})
+    ops['filter:convolve'] = lambda image: apply_filter(image, 'convolve', {'kernel': KERNEL})
+    for method in ('nlm', 'wavelet', 'guided'):
+        for tier in ('fast', 'balanced', 'quality'):
+            ops[f'denoise:{method}:{tier}'] = lambda image, m=method, t=tier: denoise(image, m, t, 20)
+    ops['fft'] = lambda image: frequency_filter(image)
+    ops['fft:auto_notch'] = lambda image: remove_periodic_noise(image)
+    ops['noise:add'] = lambda image: add_gaussian_noise(image, seed=0)
+    ops['adjust'] = lambda image: apply_adjustments(image, 10, 10, 10)
+    ops['histogram'] = lambda image: cv2.calcHist([cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)], [0], None,
+                                                  [256], [0, 256])
+    ops['equalize'] = lambda image: equalize(image)
+    return ops
+
+
+def io_round_trip(image):
+    # What every request adds: decode the upload and PNG-encode the result
+    data = cv2.imencode('.jpg', image)[1]
+    return cv2.imencode('.png', cv2.imdecode(data, cv2.IMREAD_COLOR))
+
+
+def measure(func, image, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(image)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(image)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def calibrate(megapixels):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    _, image = scene(width, width * 3 // 4, 20)
+    mp = image.shape[0] * image.shape[1] / 1e6
+    print(f"{image.shape[1]}x{image.shape[0]} ({mp:.1f} MP); tracemalloc sees NumPy buffers, not OpenCV's own")
+    print(f"{'operation':<26}{'ms/MP':>8}{'table':>8}{'MB/MP':>8}{'table':>8}")
+    rows = [('io', io_round_trip, IO_COST)] + [(key, func, COSTS.get(key)) for key, func in operations().items()]
+    for key, func, table in rows:
+        seconds, peak = measure(func, image)
+        table = table or ('-', '-')
+        print(f"{key:<26}{seconds * 1000 / mp:>8.0f}{table[0]:>8}{peak / 1e6 / mp:>8.0f}{table[1]:>8}")
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+
+def load_test(controller, heavy, cheap, heavy_image, cheap_image):
+    latencies, rejected = [], [0]
+    heavy_ticket = estimate('denoise:nlm:fast', heavy_image.shape[0] * heavy_image.shape[1])
+    cheap_ticket = estimate('adjust', cheap_image.shape[0] * cheap_image.shape[1])
+
+    def run(ticket, func, image):
+        if controller is not None and not controller.admit(ticket):
+            return False
+        try:
+            func(image)
+        finally:
+            if controller is not None:
+                controller.release(ticket)
+        return True
+
+    def heavy_job():
+        if not run(heavy_ticket, lambda image: denoise(image, 'nlm', 'fast', 20, workers=1), heavy_image):
+            rejected[0] += 1
+
+    def cheap_stream():
+        for _ in range(cheap):
+            start = time.perf_counter()
+            run(cheap_ticket, lambda image: apply_adjustments(image, 10, 10, 10), cheap_image)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=heavy_job) for _ in range(heavy)]
+    stream = threading.Thread(target=cheap_stream)
+    start = time.perf_counter()
+    stream.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads + [stream]:
+        thread.join()
+    return time.perf_counter() - start, latencies, rejected[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calibrate', action='store_true')
+    parser.add_argument('--megapixels', type=float, default=2)
+    parser.add_argument('--heavy', type=int, default=6)
+    parser.add_argument('--cheap', type=int, default=40)
+    parser.add_argument('--budget-mb', type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.calibrate:
+        calibrate(args.megapixels)
+        return
+
+    _, heavy_image = scene(1600, 1200, 20)
+    _, cheap_image = scene(1000, 1000, 20)
+    print(f"{args.heavy} heavy NLM requests (2 MP) during {args.cheap} cheap adjust requests (1 MP)")
+    print(f"{'mode':<12}{'wall s':>8}{'cheap p50 ms':>14}{'p95 ms':>9}{'max ms':>9}{'429s':>6}")
+    modes = {
+        'none': None,
+        'admission': AdmissionController(args.budget_mb * 1024 * 1024, queue_timeout=1.0, max_queued=2,
+                                         heavy_concurrency=1),
+    }
+    for name, controller in modes.items():
+        wall, latencies, rejected = load_test(controller, args.heavy, args.cheap, heavy_image, cheap_image)
+        print(f"{name:<12}{wall:>8.2f}{percentile(latencies, 50):>14.1f}{percentile(latencies, 95):>9.1f}"
+              f"{max(latencies) * 1000:>9.1f}{rejected:>6}")
+
+
+if __name__ == '__main__':
+    main()
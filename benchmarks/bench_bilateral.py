@@ -0,0 +1,52 @@
+"""
+Exact vs fast (guided filter) bilateral smoothing.
+
+    python -m benchmarks.bench_bilateral [--image photo.jpg]
+
+For each diameter prints the seconds per call of both modes and the PSNR
+of the fast result against the exact one. Without --image a synthetic
+noisy test card is used.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.filters import apply_bilateral_filter
+
+
+def synthetic(width, height):
+    rng = np.random.default_rng(0)
+    image = np.zeros((height, width, 3), np.uint8)
+    for _ in range(40):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(image, (int(x), int(y)), int(rng.integers(20, height // 4)), color, -1)
+    noise = rng.normal(0, 12, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image')
+    parser.add_argument('--width', type=int, default=2000)
+    parser.add_argument('--height', type=int, default=1500)
+    parser.add_argument('--sigma-color', type=float, default=40)
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image) if args.image else synthetic(args.width, args.height)
+    print(f"image {image.shape[1]}x{image.shape[0]}, sigma_color={args.sigma_color}")
+    print(f"{'d':>5} {'exact s':>9} {'fast s':>9} {'speedup':>8} {'PSNR dB':>8}")
+    for d in (5, 9, 15, 25, 41, 61):
+        exact, exact_time = timed(lambda: apply_bilateral_filter(image, d, args.sigma_color, d, mode='exact'))
+        fast, fast_time = timed(lambda: apply_bilateral_filter(image, d, args.sigma_color, d, mode='fast'))
+        print(f"{d:>5} {exact_time:>9.3f} {fast_time:>9.3f} {exact_time / fast_time:>8.1f} {cv2.PSNR(exact, fast):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
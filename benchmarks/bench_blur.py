@@ -0,0 +1,44 @@
+"""
+Gaussian and mean blur cost per backend as the radius grows.
+
+    python -m benchmarks.bench_blur [--width 3000 --height 2000]
+
+'auto' is what /filters/apply runs; it should track 'direct' for small
+sigmas and stay flat once the recursive/FFT backends take over.
+"""
+import argparse
+import time
+import numpy as np
+from app.services.blur_utils import gaussian_blur, gaussian_sigma, select_gaussian_method, box_blur
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    print(f"image {args.width}x{args.height}x3")
+    print(f"{'sigma':>6} {'direct':>8} {'iir':>8} {'fft':>8} {'auto':>8}  picks")
+    for sigma in (1, 2, 5, 10, 20, 40, 80):
+        kernel_size, _ = gaussian_sigma(0, sigma)
+        row = [timed(lambda: gaussian_blur(image, 0, sigma, method)) for method in ('direct', 'iir', 'fft', 'auto')]
+        picks = select_gaussian_method(image.shape, kernel_size, sigma)
+        print(f"{sigma:>6} " + " ".join(f"{t:>8.3f}" for t in row) + f"  {picks}")
+
+    print(f"\n{'box k':>6} {'running':>8} {'integral':>8}")
+    for k in (3, 15, 63, 255):
+        running = timed(lambda: box_blur(image, k, 'running'))
+        integral = timed(lambda: box_blur(image, k, 'integral'))
+        print(f"{k:>6} {running:>8.3f} {integral:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Decode-time downscaling: full decodes against IMREAD_REDUCED_* decodes of
+the same JPEG and PNG, as used by approximate histogram requests.
+
+    python -m benchmarks.bench_decode [--width 4000 --height 3000 --repeat 5]
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.image_io import decode_image
+
+
+def photo(width, height):
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    image = photo(args.width, args.height)
+    longest = max(args.width, args.height)
+    print(f"{args.width}x{args.height}")
+    print(f"{'format':<8}{'mode':<7}{'factor':>7}{'shape':>16}{'ms':>9}{'MB out':>9}")
+    for ext in ('.jpg', '.png'):
+        data = cv2.imencode(ext, image)[1].tobytes()
+        for grayscale in (False, True):
+            for max_dimension in (None, longest // 2, longest // 4, longest // 8):
+                best = float('inf')
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    decoded, factor = decode_image(data, max_dimension, grayscale)
+                    best = min(best, time.perf_counter() - start)
+                shape = 'x'.join(map(str, decoded.shape[:2]))
+                print(f"{ext[1:]:<8}{'gray' if grayscale else 'color':<7}{factor:>7}{shape:>16}"
+                      f"{best * 1000:>9.1f}{decoded.nbytes / 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Latency and PSNR of the denoisers per tier and image size, on a synthetic
+scene with Gaussian noise (sigma 20).
+
+    python -m benchmarks.bench_denoise [--sizes 640x480 1920x1080 --sigma 20 --workers N]
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.denoise_utils import DENOISERS, TIERS, denoise
+
+
+def scene(width, height, sigma):
+    y, x = np.mgrid[:height, :width].astype(np.float32)
+    clean = np.dstack([127 + 60 * np.sin(x / 23) + 40 * np.cos(y / 17), x / width * 255, y / height * 200 + 20])
+    for i in range(8):
+        x0, y0 = (i * 131) % width, (i * 197) % height
+        cv2.rectangle(clean, (x0, y0), (x0 + width // 6, y0 + height // 8), (30 * i, 220 - 20 * i, 90), -1)
+    clean = np.clip(clean, 0, 255).astype(np.uint8)
+    noisy = np.clip(clean + np.random.default_rng(0).normal(0, sigma, clean.shape), 0, 255).astype(np.uint8)
+    return clean, noisy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1920x1080'])
+    parser.add_argument('--sigma', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'method':>8} {'tier':>9} {'time s':>8} {'PSNR dB':>8}")
+    for size in args.sizes:
+        width, height = (int(n) for n in size.split('x'))
+        clean, noisy = scene(width, height, args.sigma)
+        print(f"{size:>10} {'noisy':>8} {'':>9} {'':>8} {cv2.PSNR(noisy, clean):>8.2f}")
+        for method in DENOISERS:
+            for tier in TIERS:
+                start = time.perf_counter()
+                result = denoise(noisy, method, tier, workers=args.workers)
+                elapsed = time.perf_counter() - start
+                print(f"{size:>10} {method:>8} {tier:>9} {elapsed:>8.3f} {cv2.PSNR(result, clean):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
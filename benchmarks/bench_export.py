@@ -0,0 +1,63 @@
+"""
+Bulk export: the streaming ZIP generator behind /export against building
+the whole archive in a BytesIO first, over a folder of PNGs.
+
+    python -m benchmarks.bench_export [--files 200 --size 2000000]
+
+Reports wall time, throughput and tracemalloc peak for each.
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from app.services.export_utils import stream_zip
+
+
+def buffered_zip(entries):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as archive:
+        for arcname, path in entries:
+            archive.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    total = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', type=int, default=2_000_000, help='bytes per file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        entries = []
+        for i in range(args.files):
+            path = os.path.join(folder, f'processed_{i:05d}.png')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(args.size))
+            entries.append((os.path.basename(path), path))
+
+        runs = {
+            'streamed (stored)': lambda: sum(len(c) for c in stream_zip(entries)),
+            'buffered (deflated)': lambda: len(buffered_zip(entries)),
+        }
+        print(f"{args.files} files x {args.size / 1e6:.1f} MB")
+        print(f"{'mode':<22}{'time s':>9}{'MB/s':>9}{'peak MB':>10}")
+        for name, func in runs.items():
+            elapsed, total, peak = measure(func)
+            print(f"{name:<22}{elapsed:>9.2f}{total / elapsed / 1e6:>9.0f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+3D LUT throughput: tetrahedral and trilinear interpolation against the baked
+lookup table, with cv2.LUT (a per-channel 1D table) as the reference speed.
+
+    python -m benchmarks.bench_lut [--width 3000 --height 2000 --size 33]
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.lut_utils import METHODS, BAKE_BITS, CubeLut, apply_lut
+
+
+def warm_grade(size):
+    axis = np.linspace(0, 1, size, dtype=np.float32)
+    b, g, r = np.meshgrid(axis, axis, axis, indexing='ij')
+
+    def s(x):
+        return x * x * (3 - 2 * x)
+    bgr = np.stack([s(np.clip(0.8 * b + 0.1 * r, 0, 1)), s(g), s(np.clip(0.9 * r + 0.1 * g + 0.05, 0, 1))], axis=-1)
+    return CubeLut(bgr * 255)
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=33)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    megapixels = args.width * args.height / 1e6
+    lut = warm_grade(args.size)
+
+    start = time.perf_counter()
+    lut.baked(BAKE_BITS)
+    print(f"{args.size}^3 LUT, {2 ** BAKE_BITS}^3 bake: {time.perf_counter() - start:.3f} s (once per LUT)")
+    print(f"{'method':>12} {'time s':>8} {'MP/s':>8} {'max diff':>9}")
+
+    reference = None
+    for method in ('tetrahedral',) + tuple(m for m in METHODS if m != 'tetrahedral'):
+        elapsed, result = timed(lambda: apply_lut(image, lut, method))
+        if reference is None:
+            reference = result.astype(int)
+        diff = np.abs(result - reference).max()
+        print(f"{method:>12} {elapsed:>8.3f} {megapixels / elapsed:>8.1f} {diff:>9}")
+
+    table = np.repeat(np.arange(256, dtype=np.uint8)[None, :, None], 3, axis=2)
+    elapsed, _ = timed(lambda: cv2.LUT(image, table))
+    print(f"{'cv2.LUT 1D':>12} {elapsed:>8.3f} {megapixels / elapsed:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Median filter cost as the kernel grows.
+
+    python -m benchmarks.bench_median [--width 3000 --height 2000]
+
+Prints seconds per call for the square (cv2.medianBlur) path, the
+rectangular rank path and a centre-weighted window, single-threaded and
+striped.
+Each column should stay roughly flat as the kernel size increases.
+"""
+import argparse
+import time
+import numpy as np
+from app.services.median_utils import median_filter
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    print(f"image {args.width}x{args.height}x3")
+    print(f"{'kernel':>8} {'square 1T':>10} {'square':>10} {'rect':>10} {'weighted':>10}")
+    for k in (3, 5, 7, 15, 31, 63, 127):
+        square_1t = timed(lambda: median_filter(image, k, workers=1))
+        square = timed(lambda: median_filter(image, k, workers=args.workers))
+        rect = timed(lambda: median_filter(image, k, max(k // 3, 1) | 1, workers=args.workers), repeat=1)
+        weighted = timed(lambda: median_filter(image, k, center_weight=k, workers=args.workers), repeat=1)
+        print(f"{k:>8} {square_1t:>10.3f} {square:>10.3f} {rect:>10.3f} {weighted:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Memory under concurrent load: the previous allocate-per-step hot path
+('legacy') against the current services with the shared buffer pool
+disabled ('unpooled') and enabled ('pooled').
+
+    python -m benchmarks.bench_memory [--width 3000 --height 2000 --threads 4 --requests 24]
+
+Each mode runs in its own interpreter so peak RSS is not shared. Reports
+wall time, tracemalloc peak, peak RSS, how many pooled scratch buffers
+were freshly allocated versus recycled, and the idle buffers the pool
+still holds once the burst is over (requests are bracketed by the compute
+budget, as in the app, which trims the pool when the last one leaves).
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from app.services.buffer_pool import pool, DEFAULT_MAX_BYTES
+from app.services.compute_budget import budget
+from app.services.adjustments import apply_adjustments
+from app.services.noise_utils import add_salt_pepper_noise, add_periodic_noise
+from app.services.filters import apply_sobel_filter, apply_band_reject_filter
+from benchmarks.bench_edges import legacy_sobel
+
+
+def legacy_adjust(image):
+    adjusted = cv2.convertScaleAbs(image, alpha=1.15, beta=1.1)
+    hsv = cv2.cvtColor(adjusted, cv2.COLOR_BGR2HSV).astype(np.float32)
+    hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.3, 0, 255)
+    return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+
+
+def legacy_salt_pepper(image, density=0.05):
+    noisy = image.copy()
+    count = int(np.ceil(density * image.size * 0.5))
+    for value in (255, 0):
+        coords = [np.random.randint(0, i - 1, count) for i in image.shape]
+        noisy[coords[0], coords[1], :] = value
+    return noisy
+
+
+def legacy_periodic(image, frequency=20, amplitude=40):
+    rows, cols = image.shape[:2]
+    X, Y = np.meshgrid(np.arange(cols), np.arange(rows))
+    noise = (np.sin(2 * np.pi * frequency * X / cols) + np.sin(2 * np.pi * frequency * Y / rows)) / 2
+    noise = noise / np.max(np.abs(noise)) * amplitude
+    noisy = image.copy().astype(np.float32)
+    for c in range(image.shape[2]):
+        noisy[:, :, c] = np.clip(image[:, :, c] + noise, 0, 255)
+    return noisy.astype(np.uint8)
+
+
+def legacy_band_reject(image, r=30, w=10):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    fshift = np.fft.fftshift(np.fft.fft2(gray))
+    rows, cols = gray.shape
+    y, x = np.ogrid[:rows, :cols]
+    dist = np.sqrt((x - cols // 2) ** 2 + (y - rows // 2) ** 2)
+    mask = np.ones_like(dist)
+    mask[dist < r - w / 2] = 0
+    mask[dist > r + w / 2] = 0
+    fshift = fshift * mask
+    back = np.abs(np.fft.ifft2(np.fft.ifftshift(np.abs(np.fft.ifft2(np.fft.ifftshift(fshift))))))
+    back = cv2.normalize(back, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return cv2.cvtColor(back, cv2.COLOR_GRAY2BGR)
+
+
+def handle_legacy(image, i):
+    kind = i % 4
+    if kind == 0:
+        legacy_adjust(image)
+    elif kind == 1:
+        legacy_salt_pepper(image)
+    elif kind == 2:
+        legacy_periodic(image)
+    else:
+        cv2.cvtColor(legacy_sobel(image), cv2.COLOR_BGR2GRAY)
+    if i % 8 == 7:
+        legacy_band_reject(image[:1024, :1024])
+
+
+def handle(image, i):
+    # One simulated request: the route borrows its output frame and returns it once encoded
+    budget.enter()
+    try:
+        handle_request(image, i)
+    finally:
+        budget.leave()
+
+
+def handle_request(image, i):
+    with pool.borrow(image.shape, image.dtype) as out:
+        kind = i % 4
+        if kind == 0:
+            apply_adjustments(image, 10, 15, 30, out=out)
+        elif kind == 1:
+            add_salt_pepper_noise(image, 0.05, out=out)
+        elif kind == 2:
+            add_periodic_noise(image, 20, 40, out=out)
+        else:
+            apply_sobel_filter(image, output='gray')
+    if i % 8 == 7:
+        apply_band_reject_filter(image[:1024, :1024], 30, 10)
+
+
+MODES = ('legacy', 'unpooled', 'pooled')
+
+
+def run_mode(mode, args):
+    pool.max_bytes = DEFAULT_MAX_BYTES if mode == 'pooled' else 0
+    handler = handle_legacy if mode == 'legacy' else handle
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        list(executor.map(lambda i: handler(image, i), range(args.requests)))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = pool.stats()
+    return {
+        'seconds': elapsed,
+        'traced_peak': peak,
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'fresh': stats['misses'],
+        'reused': stats['hits'],
+        'idle': stats['held_bytes'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=24)
+    parser.add_argument('--mode', choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args)))
+        return
+
+    print(f"image {args.width}x{args.height}x3, {args.requests} requests on {args.threads} threads")
+    print(f"{'mode':>9} {'seconds':>8} {'traced MB':>10} {'RSS MB':>8} {'fresh':>6} {'reused':>7} {'idle MB':>8}")
+    for mode in MODES:
+        cmd = [sys.executable, '-m', 'benchmarks.bench_memory', '--mode', mode,
+               '--width', str(args.width), '--height', str(args.height),
+               '--threads', str(args.threads), '--requests', str(args.requests)]
+        r = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+        fresh, reused = ('-', '-') if mode == 'legacy' else (r['fresh'], r['reused'])
+        print(f"{mode:>9} {r['seconds']:>8.2f} {r['traced_peak'] / 2 ** 20:>10.1f} "
+              f"{r['max_rss'] / 2 ** 20:>8.1f} {fresh:>6} {reused:>7} {r['idle'] / 2 ** 20:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Large structuring elements: a single cv2.erode pass vs the engine.
+
+    python -m benchmarks.bench_morphology [--width 3000 --height 2000]
+
+Rectangles and lines are single separable OpenCV passes and stay flat as
+the size grows. Ellipses decompose into rectangles, so once 'auto' picks
+the decomposition their cost grows with the rectangle count (~size/3),
+not with their area.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.morphology_utils import apply_morphology, structuring_element, decompose, use_decomposition
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width), dtype=np.uint8)
+    print(f"image {args.width}x{args.height} gray")
+    print(f"{'shape':>8} {'size':>5} {'rects':>6} {'picks':>10} {'cv2.erode':>10} {'auto 1T':>8} {'auto':>8}")
+    for shape, angle in (('rect', 0), ('line', 45), ('ellipse', 0), ('cross', 0)):
+        for size in (5, 15, 31, 63, 127, 255):
+            element = structuring_element(shape, size, angle=angle)
+            rects = decompose(element)
+            picks = 'decompose' if use_decomposition(element, rects) else 'opencv'
+            naive = timed(lambda: cv2.erode(image, element))
+            single = timed(lambda: apply_morphology(image, 'erode', shape, size, angle=angle, workers=1))
+            striped = timed(lambda: apply_morphology(image, 'erode', shape, size, angle=angle,
+                                                     workers=args.workers))
+            print(f"{shape:>8} {size:>5} {len(rects):>6} {picks:>10} {naive:>10.3f} {single:>8.3f} {striped:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
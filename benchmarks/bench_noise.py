@@ -0,0 +1,59 @@
+"""
+Noise generators: the previous float64 / global-RNG versions against the
+float32 PCG64 engine.
+
+    python -m benchmarks.bench_noise [--width 4000 --height 3000]
+
+The periodic row is timed cold (pattern built) and warm (pattern cached).
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.noise_utils import (
+    add_salt_pepper_noise, add_gaussian_noise, add_periodic_noise, clear_pattern_cache
+)
+from benchmarks.bench_memory import legacy_salt_pepper, legacy_periodic
+
+
+def legacy_gaussian(image, mean=0, sigma=25):
+    gaussian = np.random.normal(mean, sigma, image.shape).astype(np.uint8)
+    return cv2.add(image, gaussian)
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    rows = [
+        ('salt_pepper', lambda: legacy_salt_pepper(image), lambda: add_salt_pepper_noise(image, 0.05, seed=1)),
+        ('gaussian', lambda: legacy_gaussian(image), lambda: add_gaussian_noise(image, 0, 25, seed=1)),
+    ]
+    print(f"image {args.width}x{args.height}x3")
+    print(f"{'noise':>16} {'legacy s':>9} {'engine s':>9}")
+    for name, legacy, engine in rows:
+        print(f"{name:>16} {timed(legacy):>9.3f} {timed(engine):>9.3f}")
+
+    legacy = timed(lambda: legacy_periodic(image))
+
+    def cold():
+        clear_pattern_cache()
+        add_periodic_noise(image, 20, 40)
+    print(f"{'periodic cold':>16} {legacy:>9.3f} {timed(cold):>9.3f}")
+    print(f"{'periodic warm':>16} {legacy:>9.3f} {timed(lambda: add_periodic_noise(image, 20, 40)):>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
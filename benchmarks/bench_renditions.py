@@ -0,0 +1,70 @@
+"""
+Rendition generation and the bytes a gallery saves.
+
+'independent' decodes the upload in full and area-resizes it to every
+size; 'pyramid' is app.services.renditions.build_pyramid (one decode at a
+reduced JPEG scale, each level from the next larger one). Encoding is
+timed separately, as it is the same for both. The second table is the
+size of each rendition against the original, and its transfer time over
+a --mbit link.
+
+    python -m benchmarks.bench_renditions [--width 6000 --height 4000 --mbit 20]
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from app import config
+from app.services.renditions import FORMATS, build_pyramid
+from benchmarks.bench_denoise import scene
+
+
+def independent(data, sizes):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    height, width = image.shape[:2]
+    levels = {}
+    for size in sizes:
+        scale = min(1, size / max(height, width))
+        levels[size] = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return levels
+
+
+def best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--mbit', type=float, default=20, help='link speed for the transfer column')
+    args = parser.parse_args()
+    sizes = config.RENDITION_SIZES
+
+    _, photo = scene(args.width, args.height, 20)
+    data = cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+    print(f"{args.width}x{args.height} JPEG, {len(data) / 1e6:.1f} MB, sizes {sizes}")
+    print(f"{'mode':<14}{'resize s':>10}")
+    for name, func in (('independent', independent), ('pyramid', build_pyramid)):
+        seconds, levels = best(lambda: func(data, sizes))
+        print(f"{name:<14}{seconds:>10.3f}")
+
+    print(f"\n{'rendition':<14}{'encode s':>10}{'KB':>10}{'of original':>13}{'transfer s':>12}")
+    rows = [('original', 0.0, len(data))]
+    for size in sizes:
+        for fmt in config.RENDITION_FORMATS:
+            ext, _, flag, quality = FORMATS[fmt]
+            seconds, encoded = best(lambda: cv2.imencode(ext, levels[size], [flag, quality])[1])
+            rows.append((f'{size} {fmt}', seconds, encoded.nbytes))
+    for name, seconds, nbytes in rows:
+        print(f"{name:<14}{seconds:>10.3f}{nbytes / 1e3:>10.0f}{nbytes / len(data):>13.2%}"
+              f"{nbytes * 8 / (args.mbit * 1e6):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Memory of several worker processes that all decode the same upload and
+take its FFT spectrum: each caching its own copy ('private') against
+publishing them once in app.services.shared_store ('shared').
+
+    python -m benchmarks.bench_shared_store [--workers 4 --width 4000 --height 3000]
+
+Reports the workers' total PSS (shared pages are split between the
+processes mapping them, so it is what the host actually pays) and RSS, and
+the first and last worker's time to get the image and spectrum.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import cv2
+from app import config
+from app.services.frequency_utils import image_spectrum
+from app.services.image_io import read_image
+from app.services.shared_store import get_store
+from benchmarks.bench_denoise import scene
+
+
+def memory_kb():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields['Pss'], fields['Rss']
+
+
+def worker(path, barrier, results, index):
+    # Workers start one after another, as a request reaching each in turn would
+    time.sleep(index * 0.5)
+    start = time.perf_counter()
+    image, _ = read_image(path)
+    spectrum = image_spectrum(image)
+    elapsed = time.perf_counter() - start
+    barrier.wait()
+    results.put((index, elapsed) + memory_kb())
+    barrier.wait()
+    del image, spectrum
+
+
+def run(path, workers, shared):
+    config.SHARED_STORE = shared
+    context = multiprocessing.get_context('fork')
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(path, barrier, results, i)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    rows = sorted(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    if shared:
+        get_store().destroy()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    args = parser.parse_args()
+    config.SHARED_STORE_NAME = f'bench_shared_store_{os.getpid()}'
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'upload.jpg')
+        cv2.imwrite(path, scene(args.width, args.height, 20)[1])
+        print(f"{args.workers} workers, {args.width}x{args.height} JPEG")
+        print(f"{'mode':<9}{'PSS MB':>9}{'RSS MB':>9}{'first s':>9}{'last s':>9}")
+        for name, shared in (('private', False), ('shared', True)):
+            rows = run(path, args.workers, shared)
+            pss = sum(row[2] for row in rows) / 1024
+            rss = sum(row[3] for row in rows) / 1024
+            print(f"{name:<9}{pss:>9.0f}{rss:>9.0f}{rows[0][1]:>9.2f}{rows[-1][1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Cold-start cost of a worker: create_app time, the first request that needs
+the image services, and import time per package, with services loaded on
+first use (default) and with PRELOAD_SERVICES=1. Each mode runs in a fresh
+interpreter.
+
+    python -m benchmarks.bench_startup [--runs 3 --top 12]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+WORKER = r'''
+import io, json, os, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+ready = time.perf_counter() - start
+import sys
+sys.stderr.write('-- ready --\n')
+import numpy as np, cv2
+png = cv2.imencode('.png', np.zeros((64, 64, 3), np.uint8))[1].tobytes()
+client = app.test_client()
+start = time.perf_counter()
+client.post('/fft/magnitude', data={'file': (io.BytesIO(png), 'bench_startup.png')},
+            content_type='multipart/form-data')
+first = time.perf_counter() - start
+os.remove(os.path.join(app.root_path, 'static', 'uploads', 'bench_startup.png'))
+print(json.dumps({'ready': ready, 'first': first}))
+'''
+
+
+def run_worker(preload):
+    env = dict(os.environ, PRELOAD_SERVICES='1' if preload else '0')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', WORKER],
+                            capture_output=True, text=True, env=env, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    # "import time: self [us] | cumulative | imported package", up to create_app
+    per_package = defaultdict(float)
+    for line in result.stderr.split('-- ready --')[0].splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(own) / 1e6
+    return timings, per_package
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    packages = {}
+    print(f"{'mode':>10} {'create_app s':>13} {'first request s':>16} {'total s':>8}")
+    for preload in (False, True):
+        mode = 'preload' if preload else 'lazy'
+        runs = [run_worker(preload) for _ in range(args.runs)]
+        ready = min(t['ready'] for t, _ in runs)
+        first = min(t['first'] for t, _ in runs)
+        packages[mode] = runs[-1][1]
+        print(f"{mode:>10} {ready:>13.3f} {first:>16.3f} {ready + first:>8.3f}")
+
+    print("\nimport time until the app is ready, by top-level package (s)")
+    print(f"{'package':>18} {'lazy':>7} {'preload':>8}")
+    names = sorted(packages['preload'], key=packages['preload'].get, reverse=True)[:args.top]
+    for name in names:
+        print(f"{name:>18} {packages['lazy'].get(name, 0):>7.3f} {packages['preload'][name]:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
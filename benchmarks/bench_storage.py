@@ -0,0 +1,75 @@
+"""
+Object-store backend against a simulated remote store
+(InProcessObjectClient with a round-trip latency and per-connection
+bandwidth).
+
+Writes: one large upload sent in a single request, in parts one at a
+time, and in parts STORAGE_UPLOAD_WORKERS at a time. Reads: the same
+gallery of files read repeatedly with and without the local read-through
+cache, for write-once outputs (served from the cache without a request)
+and for rewritable uploads (revalidated with a HEAD).
+
+    python -m benchmarks.bench_storage [--upload-mb 64 --latency 0.02 --mbps 50 --workers 4]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+from app.services.storage import InProcessObjectClient, ObjectStorage, PART_SIZE
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--upload-mb', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per request')
+    parser.add_argument('--mbps', type=float, default=50, help='MB/s per connection')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--reads', type=int, default=5)
+    args = parser.parse_args()
+    client = InProcessObjectClient(args.latency, args.mbps * 1e6)
+    data = os.urandom(args.upload_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as cache:
+        def storage(**kwargs):
+            return ObjectStorage(client, 'bench', '', cache, **kwargs)
+
+        print(f"{args.latency * 1000:.0f} ms per request, {args.mbps:.0f} MB/s per connection")
+        print(f"upload of {args.upload_mb} MB")
+        print(f"{'mode':<28}{'time s':>9}{'MB/s':>9}")
+        runs = {
+            'single request': storage(multipart_threshold=len(data)),
+            'parts, 1 at a time': storage(upload_workers=1),
+            f'parts, {args.workers} at a time': storage(upload_workers=args.workers),
+        }
+        for name, target in runs.items():
+            elapsed = timed(lambda: target.put('upload.tif', io.BytesIO(data)))
+            print(f"{name:<28}{elapsed:>9.2f}{args.upload_mb / elapsed:>9.0f}")
+
+        print(f"\n{args.reads} reads of {args.files} files of 2 MB")
+        print(f"{'mode':<28}{'time s':>9}{'requests':>9}")
+        names = {'write-once': [f'processed_20240101_120000_{i:08x}.png' for i in range(args.files)],
+                 'rewritable': [f'upload_{i}.png' for i in range(args.files)]}
+        writer = storage()
+        for group in names.values():
+            for name in group:
+                writer.put(name, os.urandom(2 * 1024 * 1024))
+        for kind, group in names.items():
+            for cached in (False, True):
+                # cache_bytes=0 keeps only the newest file, so every other read misses
+                reader = storage(cache_bytes=PART_SIZE * 64 if cached else 0)
+                client.calls.clear()
+                elapsed = timed(lambda: [reader.get(name) for _ in range(args.reads) for name in group])
+                label = f"{kind}, {'cached' if cached else 'uncached'}"
+                print(f"{label:<28}{elapsed:>9.2f}{len(client.calls):>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput of concurrent image requests with and without the compute
+budget, at 1, 4 and 16 requests in flight.
+
+'unmanaged' is the old behaviour: every request uses all cores for its
+stripes and FFTs and OpenCV keeps one thread per core. 'budget' enters
+app.services.compute_budget for each request, so the cores are split
+between the requests in flight. --unmanaged-cores sets how many cores the
+unmanaged run believes it has (e.g. a container whose CPU quota is below
+the host's core count).
+
+    python -m benchmarks.bench_threads [--concurrency 1 4 16 --requests 16 --unmanaged-cores N]
+"""
+import argparse
+import threading
+import time
+import cv2
+from app.services.compute_budget import budget
+from app.services.blur_utils import gaussian_blur_fft
+from app.services.denoise_utils import denoise
+from app.services.median_utils import median_filter
+from benchmarks.bench_denoise import scene
+
+
+def request_work(image):
+    # One request's worth of mixed work: striped, FFT and OpenCV-internal
+    denoise(image, 'guided', 'balanced', 20)
+    gaussian_blur_fft(image, 12)
+    median_filter(image, 7)
+    cv2.GaussianBlur(image, (0, 0), 3)
+
+
+def run(concurrency, requests, image, managed, cores):
+    queue = list(range(requests))
+    lock = threading.Lock()
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                queue.pop()
+            start = time.perf_counter()
+            if managed:
+                budget.enter()
+            try:
+                request_work(image)
+            finally:
+                if managed:
+                    budget.leave()
+            latencies.append(time.perf_counter() - start)
+
+    budget.cores = cores
+    cv2.setNumThreads(cores)
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start, cpu = time.perf_counter(), time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    busy = (time.process_time() - cpu) / wall
+    return requests / wall, sorted(latencies)[len(latencies) // 2], busy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=16)
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=900)
+    parser.add_argument('--unmanaged-cores', type=int, default=None)
+    args = parser.parse_args()
+    cores = budget.cores
+    unmanaged_cores = args.unmanaged_cores or cores
+
+    _, image = scene(args.width, args.height, 20)
+    request_work(image)
+    print(f"{cores} cores (unmanaged assumes {unmanaged_cores}), {args.requests} requests of {args.width}x{args.height}")
+    print(f"{'in flight':>9} {'mode':>10} {'req/s':>8} {'p50 s':>8} {'cores busy':>11}")
+    for concurrency in args.concurrency:
+        for name, managed in (('unmanaged', False), ('budget', True)):
+            throughput, p50, cpu = run(concurrency, args.requests, image, managed,
+                                       cores if managed else unmanaged_cores)
+            print(f"{concurrency:>9} {name:>10} {throughput:>8.2f} {p50:>8.2f} {cpu:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
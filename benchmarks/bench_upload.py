@@ -0,0 +1,101 @@
+"""
+Upload memory: a file sent to the single-request POST /upload/ against
+the same file sent to /upload/chunked in PATCH chunks and finalized.
+
+The upload namespace runs in a throwaway app with its own SQLite
+database, storage folder and session folder. Request bodies are streamed
+from a file on disk, so tracemalloc's peak is what the server side holds.
+
+    python -m benchmarks.bench_upload [--size-mb 200 --chunk-mb 16]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from flask import Flask
+from flask_restx import Api
+from app.models.db import db
+from app.routes.upload import upload_ns
+
+
+def make_app(folder):
+    app = Flask(__name__)
+    app.config.from_object('app.config')
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(folder, 'bench.db')}",
+                      STORAGE_ROOT=os.path.join(folder, 'stored'),
+                      UPLOAD_SESSION_DIR=os.path.join(folder, 'sessions'))
+    db.init_app(app)
+    api = Api(app)
+    api.add_namespace(upload_ns, path='/upload')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def single_request(client, path):
+    with open(path, 'rb') as f:
+        response = client.post('/upload/', data={'file': (f, 'single.png')}, content_type='multipart/form-data')
+    assert response.status_code == 201, response.json
+
+
+def split(path, chunk_size):
+    # Chunk files on disk, so every PATCH body streams from a file
+    paths = []
+    with open(path, 'rb') as f:
+        for i, data in enumerate(iter(lambda: f.read(chunk_size), b'')):
+            paths.append(f'{path}.{i}')
+            with open(paths[-1], 'wb') as out:
+                out.write(data)
+    return paths
+
+
+def chunked(client, size, chunks):
+    upload_id = client.post('/upload/chunked', json={'filename': 'chunked.png', 'size': size}).json['upload_id']
+    offset = 0
+    for chunk in chunks:
+        with open(chunk, 'rb') as f:
+            response = client.patch(f'/upload/chunked/{upload_id}', input_stream=f,
+                                    headers={'Upload-Offset': str(offset)})
+        offset = response.json['offset']
+    response = client.post(f'/upload/chunked/{upload_id}/finalize', json={})
+    assert response.status_code == 201, response.json
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--chunk-mb', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'scan.bin')
+        with open(path, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        chunks = split(path, args.chunk_mb * 1024 * 1024)
+        client = make_app(folder).test_client()
+
+        print(f"{args.size_mb} MB upload")
+        print(f"{'mode':<22}{'time s':>9}{'peak MB':>10}")
+        runs = {
+            'single request': lambda: single_request(client, path),
+            f'chunked ({args.chunk_mb} MB)': lambda: chunked(client, os.path.getsize(path), chunks),
+        }
+        for name, func in runs.items():
+            elapsed, peak = measure(func)
+            print(f"{name:<22}{elapsed:>9.2f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
+import argparse
 from app import create_app
 from app.models.db import db
 from app.models.image_log import ImageLog
+from app.models.rendition import Rendition
+
+def create_tables(app):
+    """Create any missing tables; existing data is kept."""
+    with app.app_context():
+        db.create_all()
 
 def init_db():
     app = create_app()
@@ -12,4 +19,12 @@ def init_db():
         print("Database initialized successfully!")
 
 if __name__ == "__main__":
-    init_db()
+    parser = argparse.ArgumentParser(description="Set up the photo editor database")
+    parser.add_argument('--create-only', action='store_true',
+                        help="only create missing tables (safe on every deploy) instead of resetting")
+    args = parser.parse_args()
+    if args.create_only:
+        create_tables(create_app())
+        print("Database tables created")
+    else:
+        init_db()
@@ -3,4 +3,8 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # The development server sets up its own tables; deployments run
+    # `python init_db.py --create-only` once instead
+    from init_db import create_tables
+    create_tables(app)
     app.run(debug=True)
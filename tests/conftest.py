@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    Build a Flask app the way create_app does, for one test: app.config
+    with a SQLite database and local storage under tmp_path, then the
+    keyword overrides, with the given namespaces mounted at /<name>.
+    Admission control is off unless ADMISSION_CONTROL=True is passed.
+    """
+    from flask import Flask
+    from flask_restx import Api
+    from app.models.db import db
+    from app.services.storage import init_storage
+
+    def make(*namespaces, **overrides):
+        app = Flask(__name__)
+        app.config.from_object('app.config')
+        app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+                          STORAGE_BACKEND='local', STORAGE_ROOT=str(tmp_path / 'stored'),
+                          ADMISSION_CONTROL=False)
+        app.config.update(overrides)
+        db.init_app(app)
+        init_storage(app)
+        if app.config['ADMISSION_CONTROL']:
+            from app.services.admission import init_admission
+            init_admission(app)
+        api = Api(app)
+        for namespace in namespaces:
+            api.add_namespace(namespace, path=f'/{namespace.name}')
+        with app.app_context():
+            db.create_all()
+        return app
+    return make
@@ -0,0 +1,114 @@
+import io
+import threading
+import time
+import cv2
+import numpy as np
+from app.services.admission import AdmissionController, estimate, CHEAP_SECONDS
+
+
+def test_estimate_scales_with_pixels_and_operation():
+    small = estimate('adjust', 1_000_000)
+    large = estimate('adjust', 4_000_000)
+    assert abs(large.seconds - 4 * small.seconds) < 1e-9 and large.memory == 4 * small.memory
+    assert estimate('denoise:nlm:quality', 1_000_000).seconds > estimate('denoise:nlm:fast', 1_000_000).seconds
+    assert estimate('unknown', 1_000_000).seconds > 0
+
+
+def test_heavy_operations_are_limited_but_cheap_ones_pass():
+    controller = AdmissionController(1 << 30, queue_timeout=0.05, heavy_concurrency=1)
+    heavy = estimate('denoise:nlm:fast', 2_000_000)
+    cheap = estimate('adjust', 500_000)
+    assert cheap.seconds < CHEAP_SECONDS <= heavy.seconds
+    assert controller.admit(heavy)
+    assert not controller.admit(heavy)
+    assert controller.admit(cheap)
+    assert controller.stats()['rejected'] == 1
+    controller.release(heavy)
+    assert controller.admit(heavy)
+
+
+def test_memory_budget_keeps_a_reserve_for_cheap_requests():
+    heavy = estimate('denoise:wavelet:fast', 2_000_000)
+    controller = AdmissionController(int(heavy.memory * 1.2), queue_timeout=0.05, heavy_concurrency=4)
+    assert controller.admit(heavy)
+    assert not controller.admit(estimate('denoise:guided:fast', 2_000_000))
+    cheap = estimate('histogram', 1_000_000)
+    assert controller.admit(cheap)
+    # A request over its whole budget still runs, alone
+    controller.release(heavy)
+    controller.release(cheap)
+    huge = estimate('denoise:wavelet:fast', 50_000_000)
+    assert controller.admit(huge) and controller.stats()['memory_bytes'] <= controller.memory_budget
+
+
+def test_queued_request_is_admitted_on_release():
+    controller = AdmissionController(1 << 30, queue_timeout=5, heavy_concurrency=1)
+    heavy = estimate('fft:auto_notch', 4_000_000)
+    assert controller.admit(heavy)
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(controller.admit(heavy)))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while controller.stats()['queued'] == 0:
+        assert time.monotonic() < deadline, "request was never queued"
+        time.sleep(0.001)
+    controller.release(heavy)
+    waiter.join()
+    assert result == [True]
+
+
+def test_overloaded_endpoint_answers_429_with_retry_after(make_app):
+    app = make_app(ADMISSION_CONTROL=True, ADMISSION_MEMORY_BUDGET=1 << 30, ADMISSION_QUEUE_TIMEOUT=0.05,
+                   ADMISSION_MAX_QUEUED=0, ADMISSION_HEAVY_CONCURRENCY=1)
+    controller = app.extensions['admission']
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+        return 'done'
+    app.add_url_rule('/remove', 'noise_remove_noise', work, methods=['POST'])
+
+    png = cv2.imencode('.png', np.zeros((1500, 2000, 3), np.uint8))[1].tobytes()
+
+    def post():
+        return app.test_client().post('/remove', data={'type': 'nlm', 'file': (io.BytesIO(png), 'a.png')},
+                                      content_type='multipart/form-data')
+    first = []
+    thread = threading.Thread(target=lambda: first.append(post()))
+    thread.start()
+    started.wait(5)
+    busy = post()
+    assert busy.status_code == 429 and int(busy.headers['Retry-After']) >= 1
+    assert busy.get_json()['operation'] == 'denoise:nlm:balanced'
+    finish.set()
+    thread.join()
+    assert first[0].status_code == 200
+    assert controller.stats()['running'] == {} and controller.stats()['memory_bytes'] == 0
+
+
+def test_request_pixels_reads_the_header_of_a_stored_image(make_app, tmp_path):
+    from app.services.admission import request_pixels
+    from app.services.storage import InProcessObjectClient, ObjectStorage
+
+    app = make_app()
+    client = InProcessObjectClient()
+    writer = ObjectStorage(client, 'bucket', '', str(tmp_path / 'writer'))
+    writer.put('a.png', cv2.imencode('.png', np.random.randint(0, 255, (400, 500), np.uint8))[1])
+    writer.put('a.raw', b'x' * 5000)
+    # Another node, whose cache does not have the images
+    storage = app.extensions['storage'] = ObjectStorage(client, 'bucket', '', str(tmp_path / 'node'))
+    with app.test_request_context(json={'filename': 'a.png'}):
+        assert request_pixels() == 200_000
+    # Only the header was fetched, nothing was downloaded into the cache
+    assert storage.cache.stats()['entries'] == 0
+    # Without a readable header the object's size stands in
+    with app.test_request_context(json={'filename': 'a.raw'}):
+        assert request_pixels() == 5000
+    with app.test_request_context(json={'filename': 'missing.png'}):
+        assert request_pixels() == 0
+    # Approximate requests are costed at the scale the handler decodes at
+    for max_dimension, factor in ((512, 1), (200, 2), (100, 4), (10, 8)):
+        with app.test_request_context(json={'filename': 'a.png', 'approximate': True,
+                                            'max_dimension': max_dimension}):
+            assert request_pixels() == 200_000 // factor ** 2
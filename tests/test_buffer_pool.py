@@ -0,0 +1,72 @@
+import numpy as np
+import cv2
+from app.services.buffer_pool import BufferPool
+from app.services.adjustments import apply_adjustments
+from app.services.filters import band_reject_mask
+
+
+def test_pool_reuses_buffers_by_shape_and_dtype():
+    pool = BufferPool(max_bytes=1 << 20)
+    with pool.borrow((32, 32), np.float32) as first:
+        pass
+    with pool.borrow((32, 32), np.float32) as second:
+        assert second is first
+    with pool.borrow((32, 32), np.uint8) as other:
+        assert other is not first
+    stats = pool.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+
+def test_pool_respects_memory_cap_and_ignores_views():
+    pool = BufferPool(max_bytes=3000)
+    for _ in range(3):
+        pool.release(np.empty(1000, np.uint8))
+    assert pool.stats()['held_bytes'] == 3000
+    pool.release(np.empty(1000, np.uint8))
+    assert pool.stats()['held_bytes'] == 3000 and pool.stats()['evictions'] == 1
+    pool.release(np.empty(4000, np.uint8))
+    pool.release(np.empty(2000, np.uint8)[::2])
+    assert pool.stats()['idle_buffers'] == 3
+
+
+def test_idle_buffers_are_freed_when_the_last_request_leaves():
+    from app.services.buffer_pool import pool
+    from app.services.compute_budget import ComputeBudget, available_cores
+    requests = ComputeBudget(available_cores())
+    requests.enter()
+    requests.enter()
+    with pool.borrow((64, 64), np.float32):
+        pass
+    requests.leave()
+    assert pool.stats()['held_bytes'] >= 64 * 64 * 4
+    requests.leave()
+    assert pool.stats()['held_bytes'] == 0
+
+
+def test_adjustments_lut_matches_float_path():
+    image = np.random.default_rng(5).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    adjusted = cv2.convertScaleAbs(image, alpha=1.2, beta=1.1)
+    hsv = cv2.cvtColor(adjusted, cv2.COLOR_BGR2HSV).astype(np.float32)
+    hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.35, 0, 255)
+    expected = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+    out = np.empty_like(image)
+    assert apply_adjustments(image, 10, 20, 35, out=out) is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_band_reject_mask_matches_distance_grid():
+    rows, cols = 61, 80
+    y, x = np.ogrid[:rows, :cols]
+    dist = np.sqrt((x - cols // 2) ** 2 + (y - rows // 2) ** 2)
+    expected = np.ones_like(dist)
+    expected[dist < 30 - 5] = 0
+    expected[dist > 30 + 5] = 0
+    np.testing.assert_array_equal(band_reject_mask((rows, cols), 30, 10), expected)
+
+
+def test_pool_is_sized_from_the_app_config(make_app, monkeypatch):
+    from app.services.buffer_pool import init_buffer_pool, pool
+    monkeypatch.setattr(pool, 'max_bytes', pool.max_bytes)
+    app = make_app(BUFFER_POOL_MAX_BYTES=12345)
+    assert init_buffer_pool(app) is pool and pool.max_bytes == 12345
+    assert app.extensions['buffer_pool'] is pool
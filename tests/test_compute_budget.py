@@ -0,0 +1,54 @@
+import cv2
+from app.services.compute_budget import ComputeBudget, budget
+from app.services.parallel import default_workers
+
+
+def test_cores_are_shared_between_requests():
+    shared = ComputeBudget(8)
+    assert shared.threads() == 8
+    for expected in (8, 4, 2, 2, 1, 1, 1, 1, 1):
+        shared.enter()
+        assert shared.threads() == expected
+    for _ in range(9):
+        shared.leave()
+    assert shared.threads() == 8 and shared.stats()['peak_requests'] == 9
+
+
+def test_opencv_threads_follow_the_share():
+    previous = cv2.getNumThreads()
+    shared = ComputeBudget(4)
+    try:
+        shared.enter()
+        shared.enter()
+        assert cv2.getNumThreads() == 2
+        stats = shared.stats()
+        assert stats['opencv_threads'] == 2 and stats['fft_workers'] == 2 and stats['active_requests'] == 2
+        shared.leave()
+        assert cv2.getNumThreads() == 4
+        shared.leave()
+    finally:
+        cv2.setNumThreads(previous)
+
+
+def test_stripes_and_ffts_use_the_shared_budget():
+    cores = budget.cores
+    previous = cv2.getNumThreads()
+    budget.cores = 6
+    try:
+        assert default_workers() == 6
+        budget.enter()
+        budget.enter()
+        budget.enter()
+        assert default_workers() == 2
+    finally:
+        for _ in range(3):
+            budget.leave()
+        budget.cores = cores
+        cv2.setNumThreads(previous)
+
+
+def test_budget_is_sized_from_the_app_config(make_app, monkeypatch):
+    from app.services.compute_budget import init_compute_budget
+    monkeypatch.setattr(budget, 'cores', budget.cores)
+    app = make_app(COMPUTE_THREADS=3)
+    assert init_compute_budget(app) is budget and budget.cores == 3
@@ -0,0 +1,102 @@
+import io
+import zipfile
+import pytest
+from app.services.export_utils import stream_zip, match_files
+
+
+def test_stream_zip_round_trip_and_compression(tmp_path):
+    png = tmp_path / 'a.png'
+    png.write_bytes(bytes(range(256)) * 40)
+    text = tmp_path / 'notes.txt'
+    text.write_bytes(b'hello ' * 1000)
+    chunks = list(stream_zip([('a.png', str(png)), ('notes.txt', str(text)), ('b.png', lambda: b'blob'),
+                              ('c.txt', lambda: iter([b'streamed ', b'chunks'])), ('gone.png', lambda: None)],
+                             chunk_size=1000))
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    assert archive.testzip() is None
+    assert archive.read('a.png') == png.read_bytes()
+    assert archive.read('notes.txt') == text.read_bytes()
+    assert archive.read('b.png') == b'blob'
+    assert archive.read('c.txt') == b'streamed chunks'
+    assert 'gone.png' not in archive.namelist()
+    assert archive.getinfo('a.png').compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_stream_zip_yields_bounded_pieces(tmp_path):
+    path = tmp_path / 'big.png'
+    path.write_bytes(b'\0' * 100_000)
+    chunks = list(stream_zip([('big.png', str(path))], chunk_size=4096))
+    assert len(chunks) > 20
+    assert max(len(c) for c in chunks) <= 4096 + 200
+
+
+def test_match_files(tmp_path):
+    for name in ('processed_1.png', 'processed_2.png', 'upload.png'):
+        (tmp_path / name).write_bytes(b'x')
+    assert match_files(str(tmp_path), 'processed_*.png') == ['processed_1.png', 'processed_2.png']
+    assert match_files(str(tmp_path / 'missing'), '*') == []
+
+
+@pytest.fixture
+def client(make_app):
+    import base64
+    from app.models.db import db
+    from app.models.image_log import ImageLog
+    from app.routes.export import export_ns
+
+    app = make_app(export_ns)
+    storage = app.extensions['storage']
+    storage.put('processed_1.png', b'first output')
+    storage.put('upload.jpg', b'an upload')
+    with app.app_context():
+        db.session.add_all([
+            ImageLog(filename='upload.jpg', processed=False),
+            ImageLog(filename='logged.png', processed=True, image_data=base64.b64encode(b'from the db').decode()),
+            # Logged by an upload that stored no data
+            ImageLog(filename='empty.png', processed=True, image_data=''),
+        ])
+        db.session.commit()
+    return app.test_client()
+
+
+def test_export_route_selectors_and_headers(client):
+    response = client.post('/export/', json={'filenames': ['upload.jpg', 'logged.png'], 'pattern': 'processed_*',
+                                             'name': '../my export'})
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="my_export.zip"'
+    assert response.headers['X-Export-Count'] == '3'
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert sorted(archive.namelist()) == ['logged.png', 'processed_1.png', 'upload.jpg']
+    assert archive.read('logged.png') == b'from the db' and archive.read('upload.jpg') == b'an upload'
+
+    # The filter selects logged names; one with no stored copy and no data is left out
+    response = client.post('/export/', json={'filter': {'processed': True}})
+    assert zipfile.ZipFile(io.BytesIO(response.data)).namelist() == ['logged.png']
+    assert response.headers['Content-Disposition'] == 'attachment; filename="export.zip"'
+
+
+def test_export_route_reports_missing_names(client):
+    response = client.post('/export/', json={'filenames': ['upload.jpg', 'empty.png', 'nowhere.png']})
+    assert response.status_code == 404 and response.json['missing'] == ['empty.png', 'nowhere.png']
+    assert client.post('/export/', json={'pattern': 'none_*'}).status_code == 404
+    assert client.post('/export/', json={}).status_code == 400
+    assert client.post('/export/', json={'filenames': 'upload.jpg'}).status_code == 400
+    assert client.post('/export/', json={'filenames': [1]}).status_code == 400
+
+
+def test_export_route_trusts_listed_names_and_skips_deleted_ones(client, monkeypatch):
+    storage = client.application.extensions['storage']
+    storage.put('processed_2.png', b'second output')
+    looked_up = []
+    exists = storage.exists
+    monkeypatch.setattr(storage, 'exists', lambda name: looked_up.append(name) or exists(name))
+
+    response = client.post('/export/', json={'filenames': ['upload.jpg'], 'pattern': 'processed_*'})
+    assert looked_up == ['upload.jpg'] and response.headers['X-Export-Count'] == '3'
+    # Deleted after the names were resolved, before its bytes were streamed
+    storage.delete('processed_2.png')
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == ['processed_1.png', 'upload.jpg']
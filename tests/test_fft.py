@@ -1,2 +1,113 @@
+import numpy as np
+import cv2
+from app.services.fft_utils import apply_fft, smooth_spectrum, log_magnitude, find_spectral_peaks
+from app.services.filters import notch_mask, remove_periodic_noise, apply_notch_filter, apply_band_reject_filter
+from app.services.noise_utils import add_periodic_noise
+
+
 def test_fft_placeholder():
     assert True
+
+
+def test_smooth_spectrum_matches_boundary_image():
+    image = np.random.default_rng(1).integers(0, 256, (9, 12)).astype(np.float64)
+    boundary = np.zeros_like(image)
+    boundary[0] += image[-1] - image[0]
+    boundary[-1] += image[0] - image[-1]
+    boundary[:, 0] += image[:, -1] - image[:, 0]
+    boundary[:, -1] += image[:, 0] - image[:, -1]
+    # The smooth component s solves laplacian(s) = boundary with zero mean
+    smooth = np.fft.ifft2(np.fft.ifftshift(smooth_spectrum(image))).real
+    laplacian = (np.roll(smooth, 1, 0) + np.roll(smooth, -1, 0) + np.roll(smooth, 1, 1)
+                 + np.roll(smooth, -1, 1) - 4 * smooth)
+    np.testing.assert_allclose(laplacian, boundary - boundary.mean(), atol=1e-9)
+
+
+def _scene(shape=(240, 320)):
+    rng = np.random.default_rng(2)
+    image = cv2.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8), (0, 0), 3).astype(np.float32)
+    image = (image - 128) * 3 + 128 + np.linspace(-40, 40, shape[1])[None, :] + rng.normal(0, 3, shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _periodic_log_magnitude(image):
+    return log_magnitude(apply_fft(image) - smooth_spectrum(image))
+
+
+def test_peak_detector_finds_periodic_noise_only():
+    clean = _scene()
+    assert find_spectral_peaks(_periodic_log_magnitude(clean)) == []
+    noisy = add_periodic_noise(clean, 16, 30)
+    assert sorted(find_spectral_peaks(_periodic_log_magnitude(noisy))) == [(160, 104), (176, 120)]
+
+
+def test_auto_notch_restores_image_and_reports_points():
+    clean = cv2.cvtColor(_scene(), cv2.COLOR_GRAY2BGR)
+    noisy = add_periodic_noise(clean, 16, 30)
+    restored, points = remove_periodic_noise(noisy)
+    assert len(points) == 2
+    error_before = np.abs(noisy.astype(int) - clean).mean()
+    error_after = np.abs(restored.astype(int) - clean).mean()
+    assert error_after < error_before / 3
+    # The reported points drive the manual notch to the same result
+    manual = apply_notch_filter(noisy, [(p['x'], p['y']) for p in points], radius=2)
+    assert np.abs(manual.astype(int) - restored).max() <= 1
+
+
+def test_notch_mask_is_conjugate_symmetric():
+    mask = notch_mask((64, 80), [(50, 20), (3, 60)], radius=4)
+    np.testing.assert_array_equal(mask[1:, 1:], mask[1:, 1:][::-1, ::-1])
+    assert mask[20, 50] == 0 and mask[32, 40] == 1
+    assert notch_mask((64, 80))[32, 40] == 0
+
+
+def test_rgb_mode_filters_each_channel_with_one_mask():
+    rng = np.random.default_rng(3)
+    image = np.dstack([_scene(), cv2.flip(_scene(), 1), rng.integers(0, 256, (240, 320), dtype=np.uint8)])
+    points = [(0.1, 0.2), (-0.3, 0.05)]
+    notched = apply_notch_filter(image, points, color_mode='rgb')
+    for c in range(3):
+        assert np.abs(notched[:, :, c].astype(int) - apply_notch_filter(image[:, :, c], points)).max() <= 1
+    # Without DC the stretch is shared by all channels, so they stay distinct
+    banded = apply_band_reject_filter(image, 40, 20, color_mode='rgb')
+    assert not np.array_equal(banded[:, :, 0], banded[:, :, 2])
+
+
+def test_luma_mode_keeps_chroma():
+    image = np.dstack([_scene(), cv2.flip(_scene(), 0), cv2.flip(_scene(), 1)])
+    noisy = add_periodic_noise(image, 16, 30)
+    restored, points = remove_periodic_noise(noisy, color_mode='luma')
+    assert len(points) == 2
+    chroma = cv2.cvtColor(noisy, cv2.COLOR_BGR2YCrCb)[:, :, 1:].astype(int)
+    assert np.abs(cv2.cvtColor(restored, cv2.COLOR_BGR2YCrCb)[:, :, 1:] - chroma).max() <= 2
+    gray = apply_notch_filter(noisy, [(p['x'], p['y']) for p in points], radius=2, color_mode='gray')
+    assert np.array_equal(gray[:, :, 0], gray[:, :, 2])
+
+
+def test_fft_data_round_trips_without_pickle(make_app, tmp_path):
+    import io
+    import os
+    import pickle
+    from app.routes.fft import fft_ns
+
+    app = make_app(fft_ns)
+    storage = app.extensions['storage']
+    client = app.test_client()
+    png = cv2.imencode('.png', np.random.default_rng(1).integers(0, 256, (64, 80, 3), dtype=np.uint8))[1].tobytes()
+
+    def post(path, name, **form):
+        return client.post(path, data={'file': (io.BytesIO(png), name), **form}, content_type='multipart/form-data')
+
+    assert post('/fft/apply', 'a.png', color_mode='luma').status_code == 200
+    assert post('/fft/inverse', 'a.png').status_code == 200
+
+    # A pickle planted under a fft_data_* name is refused, never unpickled
+    marker = tmp_path / 'ran'
+    storage.put('fft_data_x.png', pickle.dumps(type('Payload', (), {
+        '__reduce__': lambda self: (os.mkdir, (str(marker),))})()))
+    response = post('/fft/inverse', 'x.png')
+    assert response.status_code == 400 and not marker.exists()
+
+    # Client file names are stored the way /upload/ would store them
+    assert post('/fft/magnitude', '../my photo.png').status_code == 200
+    assert storage.exists('my_photo.png')
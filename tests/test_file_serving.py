@@ -0,0 +1,60 @@
+import pytest
+from app.services import file_serving
+from app.services.file_serving import data_etag, file_etag, send_stored_file, send_stored_bytes
+
+
+@pytest.fixture
+def client(make_app, tmp_path):
+    app = make_app()
+
+    @app.route('/files/<name>')
+    def serve(name):
+        return send_stored_file(str(tmp_path / name), name)
+
+    @app.route('/blob')
+    def blob():
+        return send_stored_bytes(b'0123456789', 'blob.png', 'image/png')
+
+    return app.test_client()
+
+
+def test_file_etag_is_content_hash_and_tracks_changes(tmp_path):
+    path = tmp_path / 'a.png'
+    path.write_bytes(b'first')
+    assert file_etag(str(path)) == data_etag(b'first')
+    assert file_etag(str(path)) in [v[1] for v in file_serving._etags.values()]
+    path.write_bytes(b'second version')
+    assert file_etag(str(path)) == data_etag(b'second version')
+
+
+def test_conditional_get_and_range(client, tmp_path):
+    (tmp_path / 'upload.png').write_bytes(bytes(range(100)))
+
+    first = client.get('/files/upload.png')
+    assert first.status_code == 200
+    assert first.headers['ETag'] == f'"{data_etag(bytes(range(100)))}"'
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    again = client.get('/files/upload.png', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+
+    part = client.get('/files/upload.png', headers={'Range': 'bytes=10-19'})
+    assert part.status_code == 206
+    assert part.headers['Content-Range'] == 'bytes 10-19/100'
+    assert part.data == bytes(range(10, 20))
+
+    assert client.get('/files/upload.png', headers={'Range': 'bytes=500-'}).status_code == 416
+
+
+def test_processed_outputs_are_immutable(client, tmp_path):
+    name = 'processed_20240101_120000_0123abcd.png'
+    (tmp_path / name).write_bytes(b'png')
+    cache_control = client.get(f'/files/{name}').headers['Cache-Control']
+    assert 'immutable' in cache_control and 'max-age=31536000' in cache_control
+
+
+def test_bytes_are_served_with_etag_and_ranges(client):
+    response = client.get('/blob')
+    assert response.headers['ETag'] == f'"{data_etag(b"0123456789")}"'
+    assert client.get('/blob', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/blob', headers={'Range': 'bytes=-3'}).data == b'789'
@@ -0,0 +1,106 @@
+import numpy as np
+import cv2
+from app.services.filters import (
+    apply_bilateral_filter, apply_guided_filter, apply_sharpen_filter,
+    apply_sobel_filter, apply_canny_filter
+)
+from app.services.convolve_utils import convolve, analyze_kernel
+from app.services.blur_utils import gaussian_blur, box_blur
+
+
+def _image(shape=(200, 240, 3)):
+    rng = np.random.default_rng(2)
+    image = np.zeros(shape, np.uint8)
+    image[:, shape[1] // 2:] = 200
+    return np.clip(image + rng.normal(0, 10, shape), 0, 255).astype(np.uint8)
+
+
+def test_fast_bilateral_tracks_exact_and_keeps_edges():
+    image = _image()
+    exact = apply_bilateral_filter(image, 21, 40, 21, mode='exact')
+    fast = apply_bilateral_filter(image, 21, 40, 21, mode='fast')
+    assert cv2.PSNR(exact, fast) > 28
+    # The step edge survives: columns either side stay far apart
+    assert abs(int(fast[100, 115, 0]) - int(fast[100, 125, 0])) > 150
+
+
+def test_auto_mode_switches_on_diameter():
+    image = _image()
+    np.testing.assert_array_equal(
+        apply_bilateral_filter(image, 9, 40, 40),
+        cv2.bilateralFilter(image, 9, 40, 40)
+    )
+    np.testing.assert_array_equal(
+        apply_bilateral_filter(image, 31, 40, 40),
+        apply_guided_filter(image, 15, (40 / 255.0) ** 2)
+    )
+
+
+def test_constant_cost_gaussian_backends_match_direct():
+    image = cv2.GaussianBlur(_image(), (0, 0), 2)
+    for sigma in (3, 12):
+        k = int(round(sigma * 8 + 1)) | 1
+        direct = cv2.GaussianBlur(image, (k, k), sigma, borderType=cv2.BORDER_REPLICATE)
+        assert cv2.PSNR(gaussian_blur(image, 0, sigma, 'iir'), direct) > 45
+        direct = cv2.GaussianBlur(image, (k, k), sigma)
+        assert cv2.PSNR(gaussian_blur(image, 0, sigma, 'fft'), direct) > 45
+
+
+def test_integral_box_mean_matches_running_sums():
+    image = _image((90, 110, 3))
+    for ksize in (5, (15, 3)):
+        expected = cv2.blur(image, ksize if isinstance(ksize, tuple) else (ksize, ksize))
+        np.testing.assert_array_equal(box_blur(image, ksize, 'integral'), expected)
+
+
+def test_custom_kernel_paths_agree_with_filter2d():
+    image = _image((90, 120, 3))
+    rng = np.random.default_rng(3)
+    g = cv2.getGaussianKernel(9, 2.0)
+    kernels = [(g @ g.T).astype(np.float32), rng.random((7, 5)).astype(np.float32) / 35]
+    for kernel in kernels:
+        expected = cv2.filter2D(image, -1, kernel).astype(int)
+        for method in ('separable', 'fft'):
+            assert np.abs(convolve(image, kernel, method).astype(int) - expected).max() <= 1
+    assert analyze_kernel(kernels[0]).rank == 1
+    assert analyze_kernel(kernels[0]) is analyze_kernel(kernels[0].copy())
+
+
+def test_convolve_route_analyses_the_kernel_once(make_app, monkeypatch):
+    import io
+    import json
+    from app.routes.filters import filters_ns
+    from app.services import convolve_utils
+
+    calls = []
+    analyze = convolve_utils.analyze_kernel
+    monkeypatch.setattr(convolve_utils, 'analyze_kernel', lambda kernel: calls.append(kernel) or analyze(kernel))
+    client = make_app(filters_ns).test_client()
+    png = cv2.imencode('.png', _image((40, 50, 3)))[1].tobytes()
+    response = client.post('/filters/convolve', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(png), 'a.png'), 'kernel': json.dumps([[1, 2, 1], [2, 4, 2], [1, 2, 1]]),
+        'normalize': 'true'})
+    assert response.status_code == 200 and response.json['kernel_rank'] == 1
+    assert len(calls) == 1 and np.isclose(np.sum(calls[0]), 1)
+
+
+def test_sharpen_honours_kernel_size():
+    image = _image((60, 60, 3))
+    np.testing.assert_array_equal(
+        apply_sharpen_filter(image, 3),
+        cv2.filter2D(image, -1, np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], np.float32))
+    )
+    assert not np.array_equal(apply_sharpen_filter(image, 3), apply_sharpen_filter(image, 7))
+
+
+def test_edge_filters_match_float64_reference_and_stay_single_channel():
+    image = _image((80, 90, 3))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    sx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sy = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    reference = cv2.normalize(np.sqrt(sx ** 2 + sy ** 2), None, 0, 255, cv2.NORM_MINMAX)
+    edges = apply_sobel_filter(image, output='gray')
+    assert edges.shape == gray.shape
+    assert np.abs(edges.astype(float) - reference).max() <= 1
+    assert apply_sobel_filter(image).shape == image.shape
+    assert apply_canny_filter(image, output='gray').shape == gray.shape
@@ -0,0 +1,43 @@
+import numpy as np
+from app.services.frequency_utils import (
+    FILTER_TYPES, frequency_filter, transfer_function, image_spectrum
+)
+
+
+def _image(shape=(64, 90, 3)):
+    return np.random.default_rng(8).integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_transfer_functions_are_complementary_and_cached():
+    shape = (64, 90)
+    for filter_type in FILTER_TYPES:
+        low = transfer_function(shape, filter_type, 'lowpass', 12)
+        high = transfer_function(shape, filter_type, 'highpass', 12)
+        np.testing.assert_allclose(low + high, 1, atol=1e-6)
+        reject = transfer_function(shape, filter_type, 'bandreject', 20, 6)
+        np.testing.assert_allclose(reject + transfer_function(shape, filter_type, 'bandpass', 20, 6), 1, atol=1e-6)
+        # Row 0 of the rfft grid: column 20 lies on the reject ring
+        assert reject[0, 20] < 1e-6 and reject[0, 0] > 0.99
+    assert transfer_function(shape, 'gaussian', 'lowpass', 12) is transfer_function(shape, 'gaussian', 'lowpass', 12)
+
+
+def test_gaussian_lowpass_matches_centred_fft_reference():
+    image = _image()
+    rows, cols = image.shape[:2]
+    y, x = np.ogrid[:rows, :cols]
+    mask = np.exp(-((x - cols // 2) ** 2 + (y - rows // 2) ** 2) / (2 * 9.0 ** 2))
+    expected = np.empty(image.shape)
+    for c in range(3):
+        spectrum = np.fft.fftshift(np.fft.fft2(image[:, :, c])) * mask
+        expected[:, :, c] = np.fft.ifft2(np.fft.ifftshift(spectrum)).real
+    expected = np.clip(np.rint(expected), 0, 255)
+    result = frequency_filter(image, 'gaussian', 'lowpass', 9)
+    assert np.abs(result - expected).max() <= 1
+
+
+def test_spectrum_is_reused_across_a_sweep():
+    image = _image((50, 70))
+    assert image_spectrum(image) is image_spectrum(image.copy())
+    wide = frequency_filter(image, 'ideal', 'lowpass', 200)
+    np.testing.assert_array_equal(wide, image)
+    assert frequency_filter(image, 'butterworth', 'highpass', 5, order=3).shape == image.shape
@@ -1,2 +1,112 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+from app.services.histogram_utils import clahe, equalize, equalization_lut, working_channel
+from app.services.image_io import decode_image, image_size, reduction_factor
+
+
 def test_histogram_placeholder():
     assert True
+
+
+def _image(shape=(96, 128, 3)):
+    # Low-contrast colour image
+    return np.random.default_rng(5).integers(90, 150, shape, dtype=np.uint8)
+
+
+def test_clahe_matches_opencv_and_is_cached_per_thread():
+    image = _image()
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    expected = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(4, 4)).apply(gray)
+    np.testing.assert_array_equal(equalize(image, 'clahe', 'gray', 3.0, 4), expected)
+    assert clahe(3.0, 4) is clahe(3, 4)
+    assert clahe(3.0, 4) is not clahe(2.0, 4)
+    other = []
+    thread = threading.Thread(target=lambda: other.append(clahe(3.0, 4)))
+    thread.start()
+    thread.join()
+    assert other[0] is not clahe(3.0, 4)
+
+
+def test_global_lut_matches_equalize_hist():
+    gray = cv2.cvtColor(_image(), cv2.COLOR_BGR2GRAY)
+    np.testing.assert_array_equal(cv2.LUT(gray, equalization_lut(gray)), cv2.equalizeHist(gray))
+    flat = np.full((16, 16), 9, np.uint8)
+    np.testing.assert_array_equal(equalize(flat, 'global'), cv2.equalizeHist(flat))
+
+
+@pytest.mark.parametrize('color_mode', ['lab', 'ycrcb'])
+def test_colour_modes_only_change_lightness(color_mode):
+    image = _image()
+    result = equalize(image, 'global', color_mode)
+    assert result.shape == image.shape
+    # Lightness is stretched to the full range, chroma only moves by rounding
+    channel = working_channel(result, color_mode)
+    assert channel.min() < 10 and channel.max() > 245
+    conversion = cv2.COLOR_BGR2LAB if color_mode == 'lab' else cv2.COLOR_BGR2YCrCb
+    before = cv2.cvtColor(image, conversion)[:, :, 1:].astype(int)
+    after = cv2.cvtColor(result, conversion)[:, :, 1:].astype(int)
+    assert np.abs(after - before).mean() < 3
+
+
+def test_equalize_validation():
+    with pytest.raises(ValueError):
+        equalize(_image(), 'adaptive')
+    with pytest.raises(ValueError):
+        equalize(_image(), 'clahe', 'hsv')
+    with pytest.raises(ValueError):
+        equalize(_image(), 'clahe', 'gray', clip_limit=0)
+
+
+def _photo(rows=1200, cols=1600):
+    rng = np.random.default_rng(3)
+    return cv2.GaussianBlur(rng.integers(0, 256, (rows, cols, 3), dtype=np.uint8), (0, 0), 4)
+
+
+def test_image_size_reads_headers_without_decoding():
+    image = _photo(120, 160)
+    for ext in ('.jpg', '.png'):
+        assert image_size(cv2.imencode(ext, image)[1].tobytes()) == (160, 120)
+    assert image_size(b'not an image') is None
+
+
+def test_reduction_factor():
+    assert reduction_factor((1600, 1200), None) == 1
+    assert reduction_factor((1600, 1200), 400) == 4
+    assert reduction_factor((1600, 1200), 200) == 8
+    assert reduction_factor((1600, 1200), 1000) == 1
+    assert reduction_factor(None, 100) == 1
+
+
+def test_reduced_decode_keeps_histogram_shape():
+    image = _photo()
+    data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+    full, factor = decode_image(data, grayscale=True)
+    assert factor == 1 and full.shape == (1200, 1600)
+    reduced, factor = decode_image(data, 300, grayscale=True)
+    assert factor == 4 and reduced.shape == (300, 400)
+
+    # Rescaled counts track the full-resolution histogram
+    full_hist = cv2.calcHist([full], [0], None, [32], [0, 256]).ravel()
+    reduced_hist = cv2.calcHist([reduced], [0], None, [32], [0, 256]).ravel() * factor ** 2
+    assert np.abs(full_hist - reduced_hist).sum() / full_hist.sum() < 0.05
+
+    colour, _ = decode_image(data, 300)
+    assert colour.shape == (300, 400, 3)
+
+
+def test_approximate_size_validates_max_dimension(make_app):
+    from app.routes.histogram import APPROXIMATE_MAX_DIMENSION, approximate_size, hist_ns
+
+    assert approximate_size({'max_dimension': 'x'}) is None
+    assert approximate_size({'approximate': True}) == APPROXIMATE_MAX_DIMENSION
+    assert approximate_size({'approximate': True, 'max_dimension': '300'}) == 300
+    for bad in (0, -5, 2.5, 'big', None, True):
+        with pytest.raises(ValueError):
+            approximate_size({'approximate': True, 'max_dimension': bad})
+
+    client = make_app(hist_ns).test_client()
+    for path in ('/histogram/get', '/histogram/equalize'):
+        response = client.post(path, json={'filename': 'a.png', 'approximate': True, 'max_dimension': -5})
+        assert response.status_code == 400
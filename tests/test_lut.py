@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from app.services import lut_utils
+from app.services.lut_utils import apply_lut, list_presets, load_cube, load_preset, parse_cube
+
+
+def _cube(size=9, grade=None, header=''):
+    # Rows run red fastest, then green, then blue
+    axis = np.linspace(0, 1, size)
+    b, g, r = np.meshgrid(axis, axis, axis, indexing='ij')
+    rgb = np.stack([r, g, b], axis=-1) if grade is None else grade(r, g, b)
+    rows = '\n'.join('%.6f %.6f %.6f' % tuple(v) for v in rgb.reshape(-1, 3))
+    return f'TITLE "test"\n# comment\n{header}LUT_3D_SIZE {size}\n{rows}\n'
+
+
+def _warm(r, g, b):
+    # Smooth grade with channel crosstalk: S-curve, warmer reds, cooler blues
+    def s(x):
+        return x * x * (3 - 2 * x)
+    return np.stack([s(np.clip(0.9 * r + 0.1 * g + 0.05, 0, 1)), s(g), s(np.clip(0.8 * b + 0.1 * r, 0, 1))], axis=-1)
+
+
+def _image(shape=(64, 80, 3)):
+    return np.random.default_rng(4).integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_identity_cube():
+    image = _image()
+    lut = parse_cube(_cube())
+    assert lut.title == 'test' and lut.size == 9
+    for method in ('tetrahedral', 'trilinear'):
+        np.testing.assert_array_equal(apply_lut(image, lut, method), image)
+    assert np.abs(apply_lut(image, lut).astype(int) - image).max() <= 1
+
+
+def test_interpolation_matches_grade():
+    image = _image()
+    lut = parse_cube(_cube(33, _warm))
+    x = image[..., ::-1] / 255.0
+    expected = _warm(x[..., 0], x[..., 1], x[..., 2])[..., ::-1] * 255
+    for method in ('tetrahedral', 'trilinear'):
+        assert np.abs(apply_lut(image, lut, method) - expected).max() <= 1.5
+    exact = apply_lut(image, lut, 'tetrahedral').astype(int)
+    assert np.abs(apply_lut(image, lut, 'baked') - exact).max() <= 2
+
+
+def test_domain_strength_and_gray():
+    image = _image()
+    # An identity over [0, 0.5] saturates everything above half scale
+    lut = parse_cube(_cube(header='DOMAIN_MIN 0 0 0\nDOMAIN_MAX 0.5 0.5 0.5\n'))
+    expected = np.clip(image.astype(int) * 2, 0, 255)
+    assert np.abs(apply_lut(image, lut, 'tetrahedral') - expected).max() <= 1
+    half = apply_lut(image, parse_cube(_cube(grade=lambda r, g, b: np.zeros(r.shape + (3,)))), 'tetrahedral', 0.5)
+    assert np.abs(half - image / 2).max() <= 1
+    assert apply_lut(image[..., 0], parse_cube(_cube())).shape == image.shape
+
+
+def test_cache_and_validation():
+    data = _cube().encode()
+    assert load_cube(data) is load_cube(bytes(data))
+    with pytest.raises(ValueError):
+        parse_cube('LUT_1D_SIZE 4\n0 0 0\n')
+    with pytest.raises(ValueError):
+        parse_cube(_cube().rsplit('\n', 2)[0])
+    with pytest.raises(ValueError):
+        apply_lut(_image(), parse_cube(_cube()), 'nearest')
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    one = lut_utils._cached_bytes(parse_cube(_cube()))
+    monkeypatch.setattr(lut_utils, 'LUT_CACHE_BYTES', one * 2)
+    monkeypatch.setattr(lut_utils, '_luts', lut_utils.OrderedDict())
+    monkeypatch.setattr(lut_utils, '_luts_held', 0)
+    cubes = [_cube(header=f'# {i}\n').encode() for i in range(3)]
+    first = load_cube(cubes[0])
+    load_cube(cubes[1])
+    load_cube(cubes[2])
+    assert lut_utils._luts_held == one * 2 and load_cube(cubes[0]) is not first
+    # A LUT bigger than the whole cache is parsed but not kept
+    monkeypatch.setattr(lut_utils, 'LUT_CACHE_BYTES', one - 1)
+    assert load_cube(b'#\n' + cubes[0]) is not load_cube(b'#\n' + cubes[0])
+
+
+def test_shipped_presets():
+    assert {'mono', 'warm'} <= set(list_presets())
+    image = _image()
+    mono = apply_lut(image, load_preset('mono'), 'tetrahedral')
+    gray = np.rint(image[..., 0] * 0.114 + image[..., 1] * 0.587 + image[..., 2] * 0.299)
+    assert np.abs(mono[..., 0] - gray).max() <= 1 and (mono[..., 0] == mono[..., 2]).all()
+    assert load_preset('warm').title == 'Warm'
+
+
+def test_presets_come_from_the_app_config(make_app, tmp_path):
+    (tmp_path / 'teal.cube').write_text(_cube())
+    app = make_app(LUT_PRESET_DIR=str(tmp_path))
+    with app.app_context():
+        assert list_presets() == ['teal']
+        assert load_preset('teal').size == 9
+    assert 'teal' not in list_presets()
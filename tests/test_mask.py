@@ -0,0 +1,47 @@
+import numpy as np
+from app.services.filters import apply_gaussian_filter
+from app.services.mask_utils import rasterize_mask, resolve_operation, apply_masked_operation
+
+
+def _image():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+
+
+def test_rectangle_mask_matches_full_frame_inside_and_keeps_outside():
+    image = _image()
+    spec = {'type': 'rectangle', 'x': 40, 'y': 30, 'width': 50, 'height': 40}
+    run, halo = resolve_operation('gaussian', {'kernel_size': 9})
+    alpha, box = rasterize_mask(image.shape, spec)
+    result = apply_masked_operation(image, alpha, box, run, halo)
+
+    full = apply_gaussian_filter(image, 9)
+    assert box == (40, 30, 90, 70)
+    np.testing.assert_array_equal(result[32:68, 42:88], full[32:68, 42:88])
+    np.testing.assert_array_equal(result[:, :35], image[:, :35])
+    np.testing.assert_array_equal(result[80:], image[80:])
+
+
+def test_feathered_ellipse_grows_box_and_blends_softly():
+    image = _image()
+    spec = {'type': 'ellipse', 'center': [80, 60], 'axes': [20, 10], 'feather': 4}
+    alpha, box = rasterize_mask(image.shape, spec)
+    x0, y0, x1, y1 = box
+    assert alpha.shape == (y1 - y0, x1 - x0)
+    assert x0 <= 60 - 12 and x1 >= 100 + 12
+    assert alpha.min() >= 0.0 and alpha.max() <= 1.0
+    assert np.any((alpha > 0.05) & (alpha < 0.95))
+
+
+def test_bitmap_mask_is_resized_and_empty_mask_is_a_no_op():
+    image = _image()
+    bitmap = np.zeros((60, 80), np.uint8)
+    bitmap[10:20, 10:30] = 255
+    alpha, box = rasterize_mask(image.shape, {'type': 'bitmap'}, bitmap)
+    x0, y0, x1, y1 = box
+    assert abs(x0 - 20) <= 1 and abs(y0 - 20) <= 1 and abs(x1 - 60) <= 1 and abs(y1 - 40) <= 1
+    assert alpha[5, 5] == 1.0
+
+    alpha, box = rasterize_mask(image.shape, {'type': 'bitmap'}, np.zeros((60, 80), np.uint8))
+    run, halo = resolve_operation('adjust', {'brightness': 50})
+    np.testing.assert_array_equal(apply_masked_operation(image, alpha, box, run, halo), image)
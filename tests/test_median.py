@@ -0,0 +1,48 @@
+import numpy as np
+import cv2
+from scipy import ndimage
+from app.services.median_utils import median_filter, _rank_median
+
+
+def _image(shape=(150, 130, 3)):
+    return np.random.default_rng(1).integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_rank_median_matches_opencv_on_square_windows():
+    image = _image()
+    for k in (3, 7, 15):
+        np.testing.assert_array_equal(_rank_median(image, ksize=(k, k)), cv2.medianBlur(image, k))
+
+
+def test_rectangular_median_matches_reference():
+    image = _image((120, 90))
+    expected = ndimage.median_filter(image, size=(3, 9), mode='nearest')
+    np.testing.assert_array_equal(median_filter(image, 9, 3), expected)
+
+
+def test_weighted_median_with_uniform_weights_is_plain_median():
+    image = _image()
+    np.testing.assert_array_equal(median_filter(image, weights=np.ones((5, 5))), cv2.medianBlur(image, 5))
+
+
+def test_striped_run_is_identical_to_single_pass():
+    image = _image((600, 200, 3))
+    for kernel in (5, 21):
+        np.testing.assert_array_equal(
+            median_filter(image, kernel, workers=4),
+            median_filter(image, kernel, workers=1)
+        )
+    np.testing.assert_array_equal(
+        median_filter(image, 7, 11, workers=4),
+        median_filter(image, 7, 11, workers=1)
+    )
+
+
+def test_centre_weighted_median_matches_explicit_weights():
+    image = _image((80, 70))
+    weights = np.ones((5, 5), np.float32)
+    weights[2, 2] = 5
+    np.testing.assert_array_equal(
+        median_filter(image, 5, center_weight=5),
+        median_filter(image, weights=weights)
+    )
@@ -0,0 +1,38 @@
+import numpy as np
+import cv2
+from app.services.morphology_utils import (
+    OPERATIONS, apply_morphology, structuring_element, decompose
+)
+
+
+def _image(shape=(140, 170)):
+    return np.random.default_rng(4).integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_decomposition_covers_element_exactly():
+    for shape, size in (('ellipse', 41), ('cross', 15), ('line', 21)):
+        element = structuring_element(shape, size, angle=30)
+        rows, cols = element.shape
+        rebuilt = np.zeros_like(element)
+        for y0, y1, x0, x1 in decompose(element):
+            rebuilt[y0 + rows // 2:y1 + rows // 2 + 1, x0 + cols // 2:x1 + cols // 2 + 1] = 1
+        np.testing.assert_array_equal(rebuilt, element)
+    assert len(decompose(structuring_element('rect', 99, 51))) == 1
+
+
+def test_decomposed_operations_match_opencv():
+    image = _image()
+    for op in OPERATIONS:
+        for shape in ('ellipse', 'cross'):
+            expected = apply_morphology(image, op, shape, 23, 17, method='opencv', workers=1)
+            np.testing.assert_array_equal(
+                apply_morphology(image, op, shape, 23, 17, method='decompose', workers=1), expected)
+
+
+def test_striped_run_matches_single_pass():
+    image = _image((700, 120, 3))
+    element = structuring_element('ellipse', 31)
+    np.testing.assert_array_equal(
+        apply_morphology(image, 'close', 'ellipse', 31, workers=4),
+        cv2.morphologyEx(image, cv2.MORPH_CLOSE, element)
+    )
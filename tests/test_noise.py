@@ -0,0 +1,50 @@
+import numpy as np
+from app.services.noise_utils import (
+    add_salt_pepper_noise, add_gaussian_noise, add_periodic_noise, periodic_pattern
+)
+
+
+def _image(shape=(90, 120, 3)):
+    return np.random.default_rng(6).integers(40, 216, shape, dtype=np.uint8)
+
+
+def test_seeded_noise_is_reproducible():
+    image = _image()
+    np.testing.assert_array_equal(add_salt_pepper_noise(image, 0.1, seed=3), add_salt_pepper_noise(image, 0.1, seed=3))
+    np.testing.assert_array_equal(add_gaussian_noise(image, 0, 20, seed=3), add_gaussian_noise(image, 0, 20, seed=3))
+    assert not np.array_equal(add_gaussian_noise(image, 0, 20, seed=3), add_gaussian_noise(image, 0, 20, seed=4))
+
+
+def test_gaussian_noise_does_not_wrap():
+    image = np.full((64, 64), 128, np.uint8)
+    noisy = add_gaussian_noise(image, 0, 25, seed=1).astype(float) - 128
+    assert abs(noisy.mean()) < 1
+    assert 23 < noisy.std() < 27
+
+
+def test_periodic_noise_matches_meshgrid_reference():
+    image = _image()
+    rows, cols = image.shape[:2]
+    X, Y = np.meshgrid(np.arange(cols), np.arange(rows))
+    noise = (np.cos(2 * np.pi * 7 * X / cols) + np.cos(2 * np.pi * 7 * Y / rows)) / 2
+    noise = noise / np.abs(noise).max() * 60
+    expected = np.clip(np.rint(image + noise[:, :, None]), 0, 255)
+    result = add_periodic_noise(image, 7, 60, 'cosine')
+    assert np.abs(result - expected).max() <= 1
+    assert periodic_pattern(image.shape, 7, 'cosine') is periodic_pattern(image.shape, 7, 'cosine')
+    assert add_periodic_noise(image[:, :, 0], 7, 60, 'cosine').shape == (rows, cols)
+
+
+def test_pattern_cache_holds_one_plane_within_its_cap(monkeypatch):
+    from app.services import noise_utils
+    noise_utils.clear_pattern_cache()
+    plane = periodic_pattern((50, 40, 3), 5)
+    assert plane.shape == (50, 40) and periodic_pattern((50, 40), 5) is plane
+    assert noise_utils._pattern_held == plane.nbytes
+
+    monkeypatch.setattr(noise_utils, 'PATTERN_CACHE_BYTES', plane.nbytes * 2)
+    assert periodic_pattern((200, 200), 5) is not periodic_pattern((200, 200), 5)
+    periodic_pattern((50, 40), 6)
+    periodic_pattern((50, 40), 7)
+    assert noise_utils._pattern_held <= plane.nbytes * 2 and len(noise_utils._pattern_cache) == 2
+    noise_utils.clear_pattern_cache()
@@ -0,0 +1,87 @@
+import io
+import cv2
+import numpy as np
+from app.models.db import db
+from app.models.rendition import Rendition
+from app.routes.upload import upload_ns
+from app.services import renditions
+from app.services.renditions import build_pyramid
+
+
+def _photo(width, height):
+    rng = np.random.default_rng(0)
+    base = cv2.resize(rng.integers(0, 256, (height // 50, width // 50, 3), dtype=np.uint8), (width, height))
+    return cv2.GaussianBlur(base, (0, 0), 3)
+
+
+def test_pyramid_sizes_and_quality():
+    photo = _photo(3000, 2000)
+    levels = build_pyramid(cv2.imencode('.jpg', photo)[1], (256, 1024, 2048))
+    assert {size: level.shape[:2] for size, level in levels.items()} == {
+        2048: (1365, 2048), 1024: (683, 1024), 256: (171, 256)}
+    # Close to area-averaging the full-resolution original directly
+    direct = cv2.resize(photo, (256, 171), interpolation=cv2.INTER_AREA)
+    assert np.abs(levels[256].astype(int) - direct).mean() < 3
+
+    small = build_pyramid(cv2.imencode('.png', photo[:200, :300])[1], (256, 1024))
+    assert small[256].shape[:2] == (171, 256) and small[1024].shape[:2] == (200, 300)
+
+
+def test_upload_generates_renditions_served_with_caching(make_app):
+    app = make_app(upload_ns)
+    client = app.test_client()
+    data = cv2.imencode('.jpg', _photo(1600, 1200))[1].tobytes()
+    assert client.post('/upload/', data={'file': (io.BytesIO(data), 'photo.jpg')},
+                       content_type='multipart/form-data').status_code == 201
+    # The background job is the single worker's only task; wait for it
+    renditions._executor.submit(lambda: None).result()
+    with app.app_context():
+        assert sorted((r.size, r.format) for r in Rendition.query) == [
+            (256, 'jpeg'), (256, 'webp'), (1024, 'jpeg'), (1024, 'webp'), (2048, 'jpeg'), (2048, 'webp')]
+
+    webp = client.get('/upload/rendition/photo.jpg/256', headers={'Accept': 'image/webp,image/*'})
+    assert webp.status_code == 200 and webp.mimetype == 'image/webp' and 'Accept' in webp.vary
+    assert webp.cache_control.max_age == 3600 and webp.cache_control.public and not webp.cache_control.no_cache
+    assert cv2.imdecode(np.frombuffer(webp.data, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (192, 256)
+    assert len(webp.data) < len(data) / 20
+
+    jpeg = client.get('/upload/rendition/photo.jpg/256', headers={'Accept': 'image/*'})
+    assert jpeg.mimetype == 'image/jpeg'
+    assert client.get('/upload/rendition/photo.jpg/256', headers={'Accept': 'image/*',
+                      'If-None-Match': jpeg.headers['ETag']}).status_code == 304
+    assert client.get('/upload/rendition/photo.jpg/300').status_code == 404
+    assert client.get('/upload/rendition/missing.jpg/256').status_code == 404
+
+
+def test_concurrent_requests_build_missing_renditions_once(make_app, monkeypatch):
+    import threading
+    from app.models.image_log import ImageLog
+    from app.services.storage import get_storage
+
+    app = make_app(upload_ns)
+    with app.app_context():
+        # An upload from before renditions: stored and logged, never scheduled
+        get_storage().put('old.jpg', cv2.imencode('.jpg', _photo(1600, 1200))[1])
+        db.session.add(ImageLog(filename='old.jpg'))
+        db.session.commit()
+
+    built = []
+    monkeypatch.setattr(renditions, 'build_pyramid',
+                        lambda data, sizes: built.append(sizes) or build_pyramid(data, sizes))
+    found = []
+
+    def request():
+        with app.app_context():
+            found.append(sorted(renditions.find_rendition('old.jpg', 256)))
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert found == [['jpeg', 'webp']] * 3 and built == [[256]]
+
+    # The background job then only adds the other sizes
+    with app.app_context():
+        renditions.generate_renditions('old.jpg')
+        assert built == [[256], [1024, 2048]]
+        assert Rendition.query.count() == 6
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import numpy as np
+import pytest
+from app.services.shared_store import SharedImageStore, content_key
+
+
+@pytest.fixture
+def store(request):
+    shared = SharedImageStore(f'test_store_{os.getpid()}_{request.node.name[:20]}', 4_000_000)
+    yield shared
+    shared.destroy()
+
+
+def _read(name, handle):
+    # Runs in a worker process: attach by handle, no array is pickled
+    array = SharedImageStore(name, 4_000_000).get(handle)
+    return None if array is None else (array.shape, array.dtype.str, float(array.sum()), array.flags.writeable)
+
+
+def _publish(name):
+    SharedImageStore(name, 4_000_000).put(('child',), np.full((50, 50), 7, np.uint8))
+
+
+def test_put_and_get_round_trip(store):
+    image = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    spectrum = np.fft.rfft2(image[..., 0]).astype(np.complex64)
+    shared = store.put('image', image)
+    assert np.array_equal(shared, image) and not shared.flags.writeable
+    assert store.put('image', image) is shared and store.get('image') is shared
+    assert np.array_equal(store.put(('spectrum', 1), spectrum), spectrum)
+    assert store.get('missing') is None
+    assert store.stats()['entries'] == 2
+
+
+def test_handles_cross_process_boundaries(store):
+    image = np.arange(60000, dtype=np.float32).reshape(200, 300)
+    context = multiprocessing.get_context('fork')
+    with store.share(image) as handle:
+        assert handle == content_key(image)
+        with context.Pool(2) as workers:
+            results = workers.starmap(_read, [(store.name, handle)] * 2)
+    assert results == [((200, 300), '<f4', float(image.sum()), False)] * 2
+
+    process = context.Process(target=_publish, args=(store.name,))
+    process.start()
+    process.join()
+    assert store.get(('child',)).sum() == 7 * 2500
+
+
+def test_unheld_entries_are_evicted_oldest_first(store):
+    blocks = [np.full(1_500_000, i, np.uint8) for i in range(3)]
+    first = store.put('a', blocks[0])
+    store.put('b', blocks[1])
+    # 'a' is still referenced here, so making room for 'c' evicts 'b'
+    shared = store.put('c', blocks[2])
+    assert not shared.flags.writeable
+    assert store.get('a') is first and store.stats()['evictions'] == 1
+    del shared
+    # Nothing fits past the budget while 'a' is held; the array comes back unshared
+    assert store.put('d', np.zeros(3_000_000, np.uint8)).flags.writeable
+
+
+def test_holders_that_died_do_not_pin_entries(store):
+    context = multiprocessing.get_context('fork')
+    process = context.Process(target=_read, args=(store.name, 'x'))
+    store.put('x', np.zeros(3_000_000, np.uint8))
+    store._drop_idle(0)
+    process.start()
+    process.join()
+    # The dead worker attached 'x' and never detached
+    assert store.put('y', np.ones(3_000_000, np.uint8)).sum() == 3_000_000
+    assert store.get('x') is None
+
+
+def test_fft_inverse_reads_the_spectrum_once(make_app, monkeypatch):
+    import io
+    import cv2
+    from app.routes.fft import fft_ns
+    from app.services import shared_store
+    from app.services.storage import LocalStorage
+
+    monkeypatch.setattr(shared_store, '_store', None)
+    app = make_app(fft_ns, SHARED_STORE=True, SHARED_STORE_NAME=f'test_fft_{os.getpid()}')
+    storage = app.extensions['storage']
+    client = app.test_client()
+    png = cv2.imencode('.png', np.random.default_rng(1).integers(0, 256, (64, 80, 3), dtype=np.uint8))[1].tobytes()
+
+    def post(path, **form):
+        return client.post(path, data={'file': (io.BytesIO(png), 'a.png'), **form}, content_type='multipart/form-data')
+
+    try:
+        assert post('/fft/apply', color_mode='luma').status_code == 200
+        reads = []
+        monkeypatch.setattr(storage, 'get', lambda name: reads.append(name) or LocalStorage.get(storage, name))
+        for _ in range(2):
+            assert post('/fft/inverse').status_code == 200
+        assert reads == ['fft_data_a.png']
+        with app.app_context():
+            assert shared_store.get_store().stats()['entries'] == 1
+    finally:
+        with app.app_context():
+            shared_store.get_store().destroy()
+    # Off by default, whatever the previous app set
+    assert shared_store.get_store() is None
+
+
+def test_app_imports_without_fcntl():
+    # Hosts without fcntl can still run with SHARED_STORE off
+    import subprocess
+    import sys
+    code = (
+        "import sys; sys.modules['fcntl'] = None\n"
+        "import app.services.image_io, app.services.frequency_utils\n"
+        "from app.services.shared_store import get_store\n"
+        "assert get_store() is None\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {k: v for k, v in os.environ.items() if k != 'SHARED_STORE'}
+    subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True)
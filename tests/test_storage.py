@@ -0,0 +1,112 @@
+import io
+import os
+import pytest
+from app.services.storage import InProcessObjectClient, LocalStorage, ObjectStorage
+
+
+def _object_storage(tmp_path, client=None, **kwargs):
+    return ObjectStorage(client or InProcessObjectClient(), 'bucket', 'uploads/', str(tmp_path / 'cache'), **kwargs)
+
+
+@pytest.fixture(params=['local', 'object'])
+def storage(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path / 'uploads'))
+    return _object_storage(tmp_path)
+
+
+def test_interface_round_trip(storage):
+    storage.put('a.png', b'first')
+    storage.put('b.txt', io.BytesIO(b'from a stream'))
+    assert storage.get('a.png') == b'first'
+    assert storage.read('a.png', 3) == b'fir' and storage.read('a.png', 100) == b'first'
+    assert storage.size('a.png') == 5 and storage.read('c.png', 3) is None and storage.size('c.png') is None
+    assert b''.join(storage.stream('b.txt', chunk_size=4)) == b'from a stream'
+    with storage.local_path('a.png') as path:
+        assert open(path, 'rb').read() == b'first'
+    assert storage.exists('a.png') and not storage.exists('c.png')
+    assert storage.get('c.png') is None and storage.stream('c.png') is None
+    with storage.local_path('c.png') as path:
+        assert path is None
+    assert storage.names('*.png') == ['a.png'] and storage.names() == ['a.png', 'b.txt']
+    storage.put('a.png', b'second')
+    assert storage.get('a.png') == b'second'
+    assert storage.delete('a.png') and not storage.delete('a.png')
+    assert not storage.exists('a.png')
+
+
+@pytest.mark.parametrize('name', ['../a.png', 'sub/a.png', '.hidden', ''])
+def test_rejects_names_outside_the_store(storage, name):
+    with pytest.raises(ValueError):
+        storage.put(name, b'x')
+
+
+def test_large_writes_upload_in_parallel_parts(tmp_path):
+    client = InProcessObjectClient()
+    storage = _object_storage(tmp_path, client, part_size=1000, multipart_threshold=2500, upload_workers=3)
+    data = bytes(range(256)) * 40
+    storage.put('big.png', io.BytesIO(data))
+    assert client.calls.count('upload_part') == 11 and 'put_object' not in client.calls
+    assert storage.get('big.png') == data
+
+    class Failing(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() >= 5000:
+                raise OSError('connection reset')
+            return super().read(size)
+
+    with pytest.raises(OSError):
+        storage.put('broken.png', Failing(data))
+    assert 'abort_multipart_upload' in client.calls and not client.uploads
+    assert not storage.exists('broken.png')
+
+
+def test_reads_go_through_the_local_cache(tmp_path):
+    client = InProcessObjectClient()
+    writer = _object_storage(tmp_path / 'writer', client)
+    reader = _object_storage(tmp_path / 'reader', client)
+    writer.put('processed_20240101_120000_0123abcd.png', b'output')
+    writer.put('upload.png', b'v1')
+
+    # Write-once outputs are fetched once and then read locally without asking the bucket
+    assert reader.get('processed_20240101_120000_0123abcd.png') == b'output'
+    client.calls.clear()
+    assert reader.get('processed_20240101_120000_0123abcd.png') == b'output'
+    assert client.calls == []
+
+    # Other names are revalidated, so a rewrite from another node is seen
+    assert reader.get('upload.png') == b'v1'
+    client.calls.clear()
+    assert reader.get('upload.png') == b'v1'
+    assert client.calls == ['head_object']
+    writer.put('upload.png', b'v2')
+    assert reader.get('upload.png') == b'v2'
+
+
+def test_cache_is_bounded(tmp_path):
+    storage = _object_storage(tmp_path, cache_bytes=250)
+    for i in range(5):
+        storage.put(f'{i}.png', bytes(100))
+    stats = storage.cache.stats()
+    assert stats['entries'] == 2 and stats['held_bytes'] == 200
+    assert storage.get('0.png') == bytes(100)
+
+
+def test_held_copies_are_not_evicted(tmp_path):
+    writer = _object_storage(tmp_path / 'writer')
+    reader = _object_storage(tmp_path / 'reader', writer.client, cache_bytes=150)
+    for name in ('a.png', 'b.png'):
+        writer.put(name, bytes(100))
+
+    with reader.local_path('a.png') as path:
+        assert reader.get('b.png') == bytes(100)
+        assert open(path, 'rb').read() == bytes(100)
+    # Released, it is the least recently used copy over the cap
+    assert not os.path.exists(path) and reader.cache.stats()['held_bytes'] == 100
+
+    # An object larger than the cache is only kept while it is held
+    writer.put('big.png', bytes(200))
+    with reader.local_path('big.png') as path:
+        assert os.path.getsize(path) == 200
+    assert not os.path.exists(path) and reader.cache.stats()['held_bytes'] == 100
+    assert reader.get('big.png') == bytes(200) and reader.cache.stats()['entries'] == 1
@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import pytest
+from app.services.file_serving import data_etag
+from app.services.upload_sessions import OffsetMismatch, SessionBusy, UploadSessions
+
+
+class Interrupted(io.BytesIO):
+    """A request body whose connection drops after `limit` bytes."""
+
+    def __init__(self, data, limit):
+        super().__init__(data)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() >= self.limit:
+            raise ConnectionResetError('client went away')
+        return super().read(min(size, self.limit - self.tell()))
+
+
+def _saved():
+    saved = {}
+
+    def save(filename, data):
+        saved[filename] = data.read()
+    return saved, save
+
+
+def test_chunks_resume_after_an_interruption_in_another_worker(tmp_path):
+    data = os.urandom(300_000)
+    sessions = UploadSessions(str(tmp_path))
+    status = sessions.create('scan.png', len(data))
+    upload_id = status['upload_id']
+    assert status['offset'] == 0
+
+    assert sessions.append(upload_id, 0, io.BytesIO(data[:100_000]), chunk_size=4096)['offset'] == 100_000
+    with pytest.raises(ConnectionResetError):
+        sessions.append(upload_id, 100_000, Interrupted(data[100_000:], 50_000), chunk_size=4096)
+    # What arrived before the drop is kept
+    assert sessions.status(upload_id)['offset'] == 150_000
+
+    # A worker that did not see the first chunks continues and re-hashes from disk
+    other = UploadSessions(str(tmp_path))
+    with pytest.raises(OffsetMismatch) as mismatch:
+        other.append(upload_id, 100_000, io.BytesIO(data[100_000:]))
+    assert mismatch.value.offset == 150_000
+    other.append(upload_id, 150_000, io.BytesIO(data[150_000:]))
+
+    saved, save = _saved()
+    result = other.finish(upload_id, save, checksum=data_etag(data))
+    assert result == {'filename': 'scan.png', 'size': len(data), 'etag': data_etag(data)}
+    assert saved['scan.png'] == data
+    assert other.status(upload_id) is None and os.listdir(tmp_path) == []
+
+
+def test_finish_checks_size_and_checksum(tmp_path):
+    sessions = UploadSessions(str(tmp_path))
+    upload_id = sessions.create('a.png', 10)['upload_id']
+    with pytest.raises(ValueError):
+        sessions.append(upload_id, 0, io.BytesIO(b'x' * 11))
+    sessions.append(upload_id, 0, io.BytesIO(b'x' * 4))
+
+    saved, save = _saved()
+    with pytest.raises(OffsetMismatch):
+        sessions.finish(upload_id, save)
+    sessions.append(upload_id, 4, io.BytesIO(b'y' * 6))
+    with pytest.raises(ValueError):
+        sessions.finish(upload_id, save, checksum=data_etag(b'wrong'))
+    assert saved == {} and sessions.status(upload_id)['offset'] == 10
+    assert sessions.finish(upload_id, save, checksum=data_etag(b'xxxxyyyyyy'))['size'] == 10
+
+
+def test_unknown_and_expired_sessions(tmp_path):
+    sessions = UploadSessions(str(tmp_path), ttl=60)
+    assert sessions.status('../../etc/passwd') is None
+    assert sessions.append('0' * 32, 0, io.BytesIO(b'x')) is None
+    upload_id = sessions.create('old.png')['upload_id']
+    os.utime(tmp_path / f'{upload_id}.json', (0, 0))
+    sessions.create('new.png')
+    assert sessions.status(upload_id) is None
+
+
+@pytest.mark.parametrize('has_fcntl', [True, False])
+def test_one_writer_per_session(tmp_path, monkeypatch, has_fcntl):
+    if not has_fcntl:
+        monkeypatch.setitem(sys.modules, 'fcntl', None)
+    sessions = UploadSessions(str(tmp_path))
+    upload_id = sessions.create('a.png')['upload_id']
+
+    class Overlapping(io.BytesIO):
+        """A body during which a second request appends to the same upload."""
+
+        def read(self, size=-1):
+            with pytest.raises(SessionBusy):
+                sessions.append(upload_id, 0, io.BytesIO(b'y'))
+            return super().read(size)
+
+    assert sessions.append(upload_id, 0, Overlapping(b'xx'))['offset'] == 2
+    assert sessions.append(upload_id, 2, io.BytesIO(b'z'))['offset'] == 3